@@ -255,10 +255,58 @@ CUSTOM_MESSAGING_API_URL = config('CUSTOM_MESSAGING_API_URL', default='http://lo
 CUSTOM_MESSAGING_USE_MOCK = config('CUSTOM_MESSAGING_USE_MOCK', default=True, cast=bool)
 MESSAGING_RATE_LIMIT = config('MESSAGING_RATE_LIMIT', default=60, cast=int)  # messages per minute
 MAX_MESSAGES_PER_BATCH = config('MAX_MESSAGES_PER_BATCH', default=100, cast=int)
+CONTACT_IMPORT_CHUNK_SIZE = config('CONTACT_IMPORT_CHUNK_SIZE', default=2000, cast=int)  # uploaded rows validated and inserted per step
+CONTACT_IMPORT_DEDUP_ACROSS_LISTS = config('CONTACT_IMPORT_DEDUP_ACROSS_LISTS', default=False, cast=bool)  # skip numbers already in the uploader's other lists
+MESSAGING_DEFAULT_CALLING_CODE = config('MESSAGING_DEFAULT_CALLING_CODE', default='91')  # assumed for 10-digit numbers without a country code
+CAMPAIGN_BUILD_CHUNK_SIZE = config('CAMPAIGN_BUILD_CHUNK_SIZE', default=2000, cast=int)  # campaign messages rendered and inserted per step
+# Rate limit buckets live in the cache; configure a shared CACHES backend (e.g. Redis) to pace across workers
+MESSAGING_RATE_BURST = config('MESSAGING_RATE_BURST', default=10, cast=int)  # sends allowed back to back before the rate limit applies
+MESSAGING_MAX_IN_FLIGHT = config('MESSAGING_MAX_IN_FLIGHT', default=8, cast=int)  # concurrent provider calls per campaign dispatch
+MESSAGING_MAX_TOKEN_WAIT = config('MESSAGING_MAX_TOKEN_WAIT', default=5, cast=float)  # longer waits reschedule the task instead of blocking
+MESSAGING_DISPATCH_TIME_BUDGET = config('MESSAGING_DISPATCH_TIME_BUDGET', default=240, cast=int)  # seconds per campaign task run
 
 # AI Agent Settings (OpenRouter API)
 OPENROUTER_API_KEY = config('OPENROUTER_API_KEY', default='')
 OPENROUTER_BASE_URL = config('OPENROUTER_BASE_URL', default='https://openrouter.ai/api/v1')
+AI_HTTP_TIMEOUT = config('AI_HTTP_TIMEOUT', default=60.0, cast=float)  # seconds per LLM API request
+AI_HTTP_MAX_CONNECTIONS = config('AI_HTTP_MAX_CONNECTIONS', default=20, cast=int)  # connections shared by all LLM clients
+AI_HTTP_MAX_KEEPALIVE = config('AI_HTTP_MAX_KEEPALIVE', default=10, cast=int)  # idle connections kept open for reuse
+AGENT_INDEX_DIR = config('AGENT_INDEX_DIR', default=os.path.join(BASE_DIR, 'agent_indexes'))  # saved FAISS stores shared by all workers; loading unpickles them, so keep it app-writable only
+AGENT_ROUTER_MIN_SCORE = config('AGENT_ROUTER_MIN_SCORE', default=2, cast=float)  # keyword score needed to skip the LLM classifier
+AGENT_ROUTER_MIN_CONFIDENCE = config('AGENT_ROUTER_MIN_CONFIDENCE', default=0.4, cast=float)  # winning margin share needed to skip it
+AI_HISTORY_MAX_TOKENS = config('AI_HISTORY_MAX_TOKENS', default=2000, cast=int)  # recent chat turns sent verbatim per prompt
+AI_HISTORY_RECENT_TOKENS = config('AI_HISTORY_RECENT_TOKENS', default=800, cast=int)  # turns kept verbatim after folding into the summary
+AI_HISTORY_MAX_MESSAGES = config('AI_HISTORY_MAX_MESSAGES', default=40, cast=int)  # most unsummarised messages read per prompt
+AI_SUMMARY_MAX_TOKENS = config('AI_SUMMARY_MAX_TOKENS', default=300, cast=int)  # length cap for a conversation's running summary
+AGENT_HISTORY_MAX_TOKENS = config('AGENT_HISTORY_MAX_TOKENS', default=600, cast=int)  # client-sent history included in agent prompts
+AI_SENTIMENT_BATCH_SIZE = config('AI_SENTIMENT_BATCH_SIZE', default=20, cast=int)  # messages packed into one sentiment prompt
+AI_SENTIMENT_BATCH_MAX_TOKENS = config('AI_SENTIMENT_BATCH_MAX_TOKENS', default=3000, cast=int)  # message tokens per sentiment prompt
+AI_SENTIMENT_CONCURRENCY = config('AI_SENTIMENT_CONCURRENCY', default=4, cast=int)  # sentiment prompts in flight at once
+
+# RAG Settings
+RAG_EMBEDDING_DTYPE = config('RAG_EMBEDDING_DTYPE', default='float32')  # float32 or float16 packed embeddings
+RAG_EMBEDDING_BATCH_SIZE = config('RAG_EMBEDDING_BATCH_SIZE', default=64, cast=int)  # chunks per embed_documents call
+RAG_WRITE_BATCH_SIZE = config('RAG_WRITE_BATCH_SIZE', default=500, cast=int)  # rows per bulk_create batch
+RAG_INDEX_REFRESH_SECONDS = config('RAG_INDEX_REFRESH_SECONDS', default=5, cast=float)  # how often the vector index checks the DB for changes
+RAG_INDEX_SYNC_MARGIN_SECONDS = config('RAG_INDEX_SYNC_MARGIN_SECONDS', default=60, cast=float)  # window re-read behind the newest synced updated_at, for late commits
+RAG_QUERY_CACHE_SIZE = config('RAG_QUERY_CACHE_SIZE', default=1024, cast=int)  # query embeddings kept in the per-process LRU
+RAG_QUERY_CACHE_TTL = config('RAG_QUERY_CACHE_TTL', default=3600, cast=int)  # seconds before a local entry expires
+RAG_QUERY_CACHE_SHARED = config('RAG_QUERY_CACHE_SHARED', default=True, cast=bool)  # also share embeddings through the Django cache
+RAG_QUERY_CACHE_SHARED_TTL = config('RAG_QUERY_CACHE_SHARED_TTL', default=86400, cast=int)  # seconds before a shared entry expires
+RAG_RESPONSE_CACHE_ENABLED = config('RAG_RESPONSE_CACHE_ENABLED', default=True, cast=bool)  # reuse answers to near-identical questions
+RAG_RESPONSE_CACHE_THRESHOLD = config('RAG_RESPONSE_CACHE_THRESHOLD', default=0.95, cast=float)  # minimum cosine similarity between queries
+RAG_RESPONSE_CACHE_SIZE = config('RAG_RESPONSE_CACHE_SIZE', default=512, cast=int)  # answers kept per process
+RAG_RESPONSE_CACHE_TTL = config('RAG_RESPONSE_CACHE_TTL', default=3600, cast=int)  # seconds before a cached answer expires
+RAG_BM25_K1 = config('RAG_BM25_K1', default=1.2, cast=float)  # BM25 term-frequency saturation
+RAG_BM25_B = config('RAG_BM25_B', default=0.75, cast=float)  # BM25 document-length normalisation
+RAG_HYBRID_SEARCH = config('RAG_HYBRID_SEARCH', default=True, cast=bool)  # fuse vector and BM25 results
+RAG_HYBRID_CANDIDATE_MULTIPLIER = config('RAG_HYBRID_CANDIDATE_MULTIPLIER', default=3, cast=int)  # candidates per retriever = top_k * multiplier
+RAG_RRF_K = config('RAG_RRF_K', default=60, cast=int)  # reciprocal rank fusion damping constant
+RAG_RETRIEVAL_WORKERS = config('RAG_RETRIEVAL_WORKERS', default=4, cast=int)  # threads for concurrent retrieval
+RAG_CHUNK_MAX_TOKENS = config('RAG_CHUNK_MAX_TOKENS', default=300, cast=int)  # token budget per indexed chunk
+RAG_CHUNK_OVERLAP_TOKENS = config('RAG_CHUNK_OVERLAP_TOKENS', default=50, cast=int)  # tokens repeated between consecutive chunks
+RAG_TOKENIZER_ENCODING = config('RAG_TOKENIZER_ENCODING', default='cl100k_base')  # tiktoken encoding used for token counts
+RAG_CONTEXT_MAX_TOKENS = config('RAG_CONTEXT_MAX_TOKENS', default=1500, cast=int)  # retrieved-context budget per RAG prompt
 
 # Celery Settings (using in-memory broker for development)
 CELERY_BROKER_URL = 'memory://'
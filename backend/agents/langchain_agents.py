@@ -5,19 +5,57 @@ from langchain.agents import AgentType, initialize_agent, Tool
 from langchain.memory import ConversationBufferWindowMemory
 from langchain_community.vectorstores import FAISS
 from langchain_community.embeddings import OpenAIEmbeddings
-from langchain.text_splitter import CharacterTextSplitter
 from langchain_community.document_loaders import TextLoader
 from langchain.tools import tool
 from typing import List, Dict, Any, Optional
 import os
 import json
+import time
+import hashlib
+import shutil
+import tempfile
+import threading
 from datetime import datetime
+from pathlib import Path
+from django.conf import settings
+from ai_agent.embedding_cache import CachedEmbeddings
+from ai_agent.chunking import chunk_text
+from ai_agent.conversation_memory import select_recent
+from .query_router import classify_by_rules, record_route
+
+EMBEDDING_MODEL = "text-embedding-ada-002"
+
+# Models, knowledge bases and agents are built on first use, not at import time.
+# Each resource is built once per process; the per-key locks let different
+# resources build concurrently while a second caller waits for the first.
+_resources: Dict[str, Any] = {}
+_build_times: Dict[str, float] = {}
+_build_locks: Dict[str, threading.Lock] = {}
+_build_locks_guard = threading.Lock()
+
+
+def _build_once(key: str, factory):
+    """Return the cached resource for key, building it with factory on first use"""
+    if key in _resources:
+        return _resources[key]
+
+    with _build_locks_guard:
+        lock = _build_locks.setdefault(key, threading.Lock())
+
+    with lock:
+        if key not in _resources:
+            started = time.time()
+            _resources[key] = factory()
+            _build_times[key] = time.time() - started
+    return _resources[key]
+
+
+def _create_models():
+    """Create the LLM and embeddings (only if API key is available)"""
+    if not os.getenv("OPENROUTER_API_KEY"):
+        print("Warning: OPENROUTER_API_KEY not found. AI agents will not be available.")
+        return None, None
 
-# Initialize the LLM (only if API key is available)
-llm = None
-embeddings = None
-
-if os.getenv("OPENROUTER_API_KEY"):
     try:
         llm = ChatOpenAI(
             temperature=0.7,
@@ -25,16 +63,28 @@ if os.getenv("OPENROUTER_API_KEY"):
             openai_api_key=os.getenv("OPENROUTER_API_KEY"),
             openai_api_base="https://openrouter.ai/api/v1"
         )
-        embeddings = OpenAIEmbeddings(
-            openai_api_key=os.getenv("OPENROUTER_API_KEY"),
-            openai_api_base="https://openrouter.ai/api/v1"
+        # Repeated tool queries reuse cached embeddings instead of calling the API
+        embeddings = CachedEmbeddings(
+            OpenAIEmbeddings(
+                openai_api_key=os.getenv("OPENROUTER_API_KEY"),
+                openai_api_base="https://openrouter.ai/api/v1"
+            ),
+            EMBEDDING_MODEL
         )
+        return llm, embeddings
     except Exception as e:
         print(f"Warning: Could not initialize OpenRouter models: {e}")
-        llm = None
-        embeddings = None
-else:
-    print("Warning: OPENROUTER_API_KEY not found. AI agents will not be available.")
+        return None, None
+
+
+def get_llm():
+    """Shared chat model, or None without an API key"""
+    return _build_once('models', _create_models)[0]
+
+
+def get_embeddings():
+    """Shared embeddings model, or None without an API key"""
+    return _build_once('models', _create_models)[1]
 
 # Knowledge base for RAG
 TRIP_KNOWLEDGE_BASE = """
@@ -125,25 +175,102 @@ A: Limited WiFi at hotels. We recommend carrying portable WiFi devices.
 """
 
 # Create vector stores for RAG
+def knowledge_base_key(text: str, name: str) -> str:
+    """Directory name for a knowledge base: changes whenever the text, model or chunking does"""
+    fingerprint = json.dumps([
+        text,
+        EMBEDDING_MODEL,
+        getattr(settings, 'RAG_CHUNK_MAX_TOKENS', 300),
+        getattr(settings, 'RAG_CHUNK_OVERLAP_TOKENS', 50),
+    ])
+    return f"{name}-{hashlib.sha256(fingerprint.encode()).hexdigest()[:16]}"
+
+
+def _knowledge_base_dir() -> Path:
+    """
+    Where saved knowledge bases live. Loading one unpickles its docstore,
+    so this must be a trusted directory that only this app writes to.
+    """
+    return Path(getattr(settings, 'AGENT_INDEX_DIR', os.path.join(settings.BASE_DIR, 'agent_indexes')))
+
+
+def _load_knowledge_base(path: Path, embeddings):
+    """Load a FAISS store saved by _save_knowledge_base from the trusted index directory"""
+    # The docstore is a pickle; we only ever read stores this app wrote itself
+    return FAISS.load_local(str(path), embeddings, allow_dangerous_deserialization=True)
+
+
+def _save_knowledge_base(vectorstore, path: Path):
+    """
+    Save into a temporary directory and rename it into place, so other
+    processes only ever see a complete store. If another process finished
+    first, its copy is kept. Stores for older versions of the text are removed.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(prefix=f".{path.name}-", dir=path.parent))
+    try:
+        vectorstore.save_local(str(tmp_dir))
+        os.rename(tmp_dir, path)
+    except OSError:
+        if not path.exists():
+            raise
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    name = path.name.rsplit('-', 1)[0]
+    for stale in path.parent.glob(f"{name}-*"):
+        if stale != path and stale.is_dir():
+            shutil.rmtree(stale, ignore_errors=True)
+
+
 def create_knowledge_base(text: str, name: str):
-    """Create a FAISS vector store from text"""
+    """
+    Load the FAISS vector store for text from disk, or embed it and save
+    it there so the other worker processes can load it instead
+    """
+    embeddings = get_embeddings()
     if not embeddings:
         print(f"Warning: Cannot create knowledge base {name} - embeddings not available")
         return None
 
+    path = _knowledge_base_dir() / knowledge_base_key(text, name)
+    if path.exists():
+        try:
+            return _load_knowledge_base(path, embeddings)
+        except Exception as e:
+            print(f"Warning: Could not load knowledge base {name} from {path}, rebuilding: {e}")
+            shutil.rmtree(path, ignore_errors=True)
+
     try:
-        documents = [text]
-        text_splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-        docs = text_splitter.create_documents(documents)
-        vectorstore = FAISS.from_documents(docs, embeddings)
-        return vectorstore
+        chunks = chunk_text(text)
+        vectorstore = FAISS.from_texts(
+            [chunk['text'] for chunk in chunks],
+            embeddings,
+            metadatas=[
+                {'source': name, 'chunk_index': i, 'token_count': chunk['token_count']}
+                for i, chunk in enumerate(chunks)
+            ]
+        )
     except Exception as e:
         print(f"Error creating knowledge base {name}: {e}")
         return None
 
-# Initialize knowledge bases
-trip_vectorstore = create_knowledge_base(TRIP_KNOWLEDGE_BASE, "trips")
-faq_vectorstore = create_knowledge_base(FAQ_KNOWLEDGE_BASE, "faq")
+    try:
+        _save_knowledge_base(vectorstore, path)
+    except Exception as e:
+        print(f"Warning: Could not save knowledge base {name} to {path}: {e}")
+    return vectorstore
+
+
+def get_trip_vectorstore():
+    """Trip knowledge base, embedded on first use"""
+    return _build_once('vectorstore:trips', lambda: create_knowledge_base(TRIP_KNOWLEDGE_BASE, "trips"))
+
+
+def get_faq_vectorstore():
+    """FAQ knowledge base, embedded on first use"""
+    return _build_once('vectorstore:faq', lambda: create_knowledge_base(FAQ_KNOWLEDGE_BASE, "faq"))
+
 
 # Tool Functions
 @tool("get_trip_info", return_direct=False)
@@ -152,6 +279,7 @@ def get_trip_info(trip_id: str = "", query: str = "") -> str:
     Get information about trips using RAG.
     Use this for trip-related queries.
     """
+    trip_vectorstore = get_trip_vectorstore()
     if trip_vectorstore:
         if query:
             docs = trip_vectorstore.similarity_search(query, k=3)
@@ -168,6 +296,7 @@ def get_faq_answer(question: str) -> str:
     Get answers from FAQ knowledge base using RAG.
     Use this for frequently asked questions.
     """
+    faq_vectorstore = get_faq_vectorstore()
     if faq_vectorstore:
         docs = faq_vectorstore.similarity_search(question, k=2)
         return "\n".join([doc.page_content for doc in docs])
@@ -245,6 +374,7 @@ def check_trip_availability(trip_name: str, date: str = "") -> str:
 # Agent Creation Functions
 def create_trip_guidance_agent():
     """Create RAG-enabled trip guidance agent"""
+    llm = get_llm()
     if not llm:
         return {
             'agent': None,
@@ -286,6 +416,7 @@ def create_trip_guidance_agent():
 
 def create_faq_agent():
     """Create FAQ agent"""
+    llm = get_llm()
     if not llm:
         return {
             'agent': None,
@@ -321,6 +452,7 @@ def create_faq_agent():
 
 def create_payment_agent():
     """Create payment and booking agent"""
+    llm = get_llm()
     if not llm:
         return {
             'agent': None,
@@ -361,6 +493,7 @@ def create_payment_agent():
 
 def create_customer_care_agent():
     """Create customer care agent"""
+    llm = get_llm()
     if not llm:
         return {
             'agent': None,
@@ -402,6 +535,7 @@ def create_customer_care_agent():
 
 def create_lead_qualification_agent():
     """Create lead qualification agent"""
+    llm = get_llm()
     if not llm:
         return {
             'agent': None,
@@ -443,6 +577,7 @@ def create_lead_qualification_agent():
 
 def create_whatsapp_agent():
     """Create WhatsApp communication agent"""
+    llm = get_llm()
     if not llm:
         return {
             'agent': None,
@@ -484,6 +619,7 @@ def create_whatsapp_agent():
 
 def create_payment_policy_agent():
     """Create payment policy agent"""
+    llm = get_llm()
     if not llm:
         return {
             'agent': None,
@@ -521,21 +657,90 @@ def create_payment_policy_agent():
 class ChainPromptingOrchestrator:
     """Orchestrate multiple agents using chain prompting"""
 
-    def __init__(self):
-        self.agents = {
-            'trip_guidance': create_trip_guidance_agent(),
-            'faq': create_faq_agent(),
-            'payment': create_payment_agent(),
-            'customer_care': create_customer_care_agent(),
-            'lead_qualification': create_lead_qualification_agent(),
-            'whatsapp': create_whatsapp_agent(),
-            'payment_policy': create_payment_policy_agent()
+    agent_factories = {
+        'trip_guidance': create_trip_guidance_agent,
+        'faq': create_faq_agent,
+        'payment': create_payment_agent,
+        'customer_care': create_customer_care_agent,
+        'lead_qualification': create_lead_qualification_agent,
+        'whatsapp': create_whatsapp_agent,
+        'payment_policy': create_payment_policy_agent
+    }
+
+    def get_agent(self, agent_type: str) -> Dict[str, Any]:
+        """Agent config for agent_type, built on first use"""
+        if agent_type not in self.agent_factories:
+            agent_type = 'customer_care'
+        return _build_once(f"agent:{agent_type}", self.agent_factories[agent_type])
+
+    def warm_up(self, agent_types: Optional[List[str]] = None, include_knowledge_bases: bool = True) -> Dict[str, Any]:
+        """Build models, knowledge bases and agents ahead of the first query"""
+        if include_knowledge_bases:
+            get_trip_vectorstore()
+            get_faq_vectorstore()
+        for agent_type in agent_types or self.agent_factories:
+            self.get_agent(agent_type)
+        return self.startup_report()
+
+    def startup_report(self) -> Dict[str, Any]:
+        """What has been built so far and how long each build took"""
+        resources = ['models', 'vectorstore:trips', 'vectorstore:faq']
+        resources += [f"agent:{agent_type}" for agent_type in self.agent_factories]
+
+        report = {}
+        for key in resources:
+            value = _resources.get(key)
+            if key == 'models':
+                available = bool(value and value[0])
+            elif key.startswith('agent:'):
+                available = bool(value and value.get('agent'))
+            else:
+                available = value is not None
+            report[key] = {
+                'built': key in _resources,
+                'available': available,
+                'build_seconds': _build_times.get(key)
+            }
+
+        return {
+            'build_seconds': sum(_build_times.values()),
+            'resources': report
+        }
+
+    def route_query(self, query: str, context: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Pick the agent for a query. Keyword rules answer confident cases
+        locally; only ambiguous queries cost an LLM round trip. The path
+        taken ('rules', 'llm' or 'default') is returned and counted.
+        """
+        started = time.time()
+        rules = classify_by_rules(query, context)
+
+        if rules['confident']:
+            agent_type, path = rules['agent_type'], 'rules'
+        else:
+            agent_type, path = self._classify_with_llm(query, context)
+            if path == 'default' and rules['agent_type']:
+                # No usable LLM answer: the rules' best guess beats the blanket default
+                agent_type = rules['agent_type']
+
+        record_route(path)
+        return {
+            'agent_type': agent_type,
+            'path': path,
+            'rule_confidence': rules['confidence'],
+            'seconds': time.time() - started
         }
 
     def classify_query(self, query: str, context: Dict[str, Any]) -> str:
         """Classify the user query to determine which agent to use"""
+        return self.route_query(query, context)['agent_type']
+
+    def _classify_with_llm(self, query: str, context: Dict[str, Any]):
+        """Ask the LLM for the agent; returns (agent_type, 'llm') or ('customer_care', 'default')"""
+        llm = get_llm()
         if not llm:
-            return 'customer_care'  # Default fallback when no AI available
+            return 'customer_care', 'default'  # Default fallback when no AI available
 
         classification_prompt = f"""
         Classify this user query into one of these categories:
@@ -555,28 +760,31 @@ class ChainPromptingOrchestrator:
 
         try:
             response = llm.predict(classification_prompt).strip().lower()
-            if response in self.agents:
-                return response
+            if response in self.agent_factories:
+                return response, 'llm'
             else:
-                return 'customer_care'  # Default fallback
+                return 'customer_care', 'default'  # Default fallback
         except Exception as e:
             print(f"Classification error: {e}")
-            return 'customer_care'
+            return 'customer_care', 'default'
 
     def process_query(self, query: str, context: Dict[str, Any], conversation_history: List[Dict] = None) -> Dict[str, Any]:
         """Process a query using the appropriate agent via chain prompting"""
 
         # Classify the query
-        agent_type = self.classify_query(query, context)
+        route = self.route_query(query, context)
+        agent_type = route['agent_type']
+        routing = {'path': route['path'], 'seconds': route['seconds']}
 
         # Get the appropriate agent
-        agent_config = self.agents.get(agent_type, self.agents['customer_care'])
+        agent_config = self.get_agent(agent_type)
         agent = agent_config['agent']
 
         # Prepare conversation context
         conversation_context = ""
         if conversation_history:
-            recent_messages = conversation_history[-3:]  # Last 3 messages
+            # Most recent messages that fit the history token budget
+            recent_messages = select_recent(conversation_history, getattr(settings, 'AGENT_HISTORY_MAX_TOKENS', 600))
             conversation_context = "\n".join([
                 f"{'User' if msg['type'] == 'user' else 'Assistant'}: {msg['content']}"
                 for msg in recent_messages
@@ -604,20 +812,22 @@ class ChainPromptingOrchestrator:
                 'content': response,
                 'agentType': agent_type,
                 'confidence': 0.9,  # Could be improved with actual confidence scoring
-                'context': context
+                'context': context,
+                'routing': routing
             }
 
         except Exception as e:
             print(f"Agent processing error: {e}")
             # Fallback to customer care
-            fallback_agent = self.agents['customer_care']['agent']
+            fallback_agent = self.get_agent('customer_care')['agent']
             try:
                 response = fallback_agent.run(f"I need help with: {query}")
                 return {
                     'content': response,
                     'agentType': 'customer_care',
                     'confidence': 0.5,
-                    'context': context
+                    'context': context,
+                    'routing': routing
                 }
             except Exception as e2:
                 print(f"Fallback agent error: {e2}")
@@ -625,7 +835,8 @@ class ChainPromptingOrchestrator:
                     'content': "I apologize, but I'm experiencing some technical difficulties. Please contact our support team at support@adventurebuddha.com or call +91-9876543210.",
                     'agentType': 'error',
                     'confidence': 0.0,
-                    'context': context
+                    'context': context,
+                    'routing': routing
                 }
 
 # Global orchestrator instance
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Build the chat agents and their knowledge bases ahead of the first query'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--agents',
+            nargs='+',
+            default=None,
+            help='Agent types to build (default: all)'
+        )
+        parser.add_argument(
+            '--skip-knowledge-bases',
+            action='store_true',
+            help='Do not embed the trip and FAQ knowledge bases'
+        )
+        parser.add_argument(
+            '--report-only',
+            action='store_true',
+            help='Print the startup timing report without building anything'
+        )
+
+    def handle(self, *args, **options):
+        from agents.langchain_agents import orchestrator
+
+        try:
+            if options['report_only']:
+                report = orchestrator.startup_report()
+            else:
+                self.stdout.write('Warming up agents...')
+                report = orchestrator.warm_up(
+                    agent_types=options['agents'],
+                    include_knowledge_bases=not options['skip_knowledge_bases']
+                )
+        except Exception as e:
+            logger.error(f'Error warming up agents: {str(e)}')
+            self.stdout.write(self.style.ERROR(f'Failed to warm up agents: {str(e)}'))
+            return
+
+        self.stdout.write(f'  Total build time: {report["build_seconds"]:.2f}s')
+        for key, state in report['resources'].items():
+            if not state['built']:
+                self.stdout.write(f'  {key}: not built')
+                continue
+            availability = 'ready' if state['available'] else 'unavailable'
+            self.stdout.write(f'  {key}: {availability} ({state["build_seconds"]:.2f}s)')
+
+        self.stdout.write(self.style.SUCCESS('Agent warm-up command completed'))
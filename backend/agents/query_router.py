@@ -0,0 +1,109 @@
+import re
+import threading
+from collections import Counter
+from typing import List, Dict, Any, Optional, Tuple
+
+from django.conf import settings
+
+# (agent type, pattern, weight). Strong, unambiguous phrases weigh more than
+# words that show up across several intents ("trip", "booking", "price").
+ROUTING_RULES: List[Tuple[str, str, float]] = [
+    ('payment_policy', r'\brefund', 3),
+    ('payment_policy', r'\bcancel', 3),
+    ('payment_policy', r'\bpolic(y|ies)\b', 2),
+    ('payment_policy', r'\bmoney back\b', 3),
+    ('payment_policy', r'\b(reschedul\w*|change (my |the )?(booking |travel )?dates?)\b', 2),
+    ('payment', r'\bpay(ing|ment|ments)?\b', 3),
+    ('payment', r'\b(upi|razorpay|gpay|google pay|phonepe|paytm|emi|neft|rtgs|imps)\b', 3),
+    ('payment', r'\b(credit|debit) card|\bnet banking\b|\bbank transfer\b', 3),
+    ('payment', r'\b(invoice|receipt|transaction)s?\b', 2),
+    ('customer_care', r'\b(help|support|assist\w*)\b', 2),
+    ('customer_care', r'\b(issue|problem|complaint|complain|wrong|not working|error)s?\b', 3),
+    ('customer_care', r'\b(emergency|urgent|contact|phone number|call (me|you)|speak to|talk to)\b', 3),
+    ('customer_care', r'\b(booking (id|status)|my booking)\b', 1),
+    ('whatsapp', r'\bwhats ?app\b', 3),
+    ('whatsapp', r'\b(notification|updates?|sms|unsubscribe|stop (sending|messag\w*)|opt.?out)\b', 2),
+    ('lead_qualification', r'\b(available|availability|slots?|seats? left|vacanc\w*)\b', 3),
+    ('lead_qualification', r'\b(recommend|suggest|which trip|best trip|interested)\w*', 2),
+    ('lead_qualification', r'\b(book|reserve)\b(?! id)', 2),
+    ('lead_qualification', r'\b(group of|for \d+ (people|persons|adults|of us)|next (week|month)|budget)\b', 2),
+    ('trip_guidance', r'\b(itinerary|itineraries|destination|highlights?|sightseeing|places to visit)\b', 3),
+    ('trip_guidance', r'\b(ladakh|leh|kashmir|srinagar|gulmarg|rajasthan|jaipur|udaipur|jaisalmer|goa|pangong|nubra)\b', 2),
+    ('trip_guidance', r'\b(tell me about|best time|how many days|duration|weather|altitude|difficulty|trek\w*)\b', 2),
+    ('trip_guidance', r'\btrips?\b', 1),
+    ('faq', r'\b(minimum age|age limit|children|kids?|infant)\b', 3),
+    ('faq', r'\b(meals?|food|pack|packing|luggage|insurance|wifi|internet|languages?|solo|vegetarian)\b', 2),
+    ('faq', r'\b(included|inclusions?|exclusions?)\b', 2),
+]
+
+COMPILED_RULES = [(agent_type, re.compile(pattern, re.IGNORECASE), weight) for agent_type, pattern, weight in ROUTING_RULES]
+
+# Page the user is on -> agent that gets a small tie-breaking bonus
+PAGE_HINTS = {
+    'payment': 'payment',
+    'checkout': 'payment',
+    'booking': 'payment',
+    'trip': 'trip_guidance',
+    'trips': 'trip_guidance',
+    'trip_detail': 'trip_guidance',
+    'faq': 'faq',
+    'support': 'customer_care',
+}
+PAGE_HINT_WEIGHT = 0.5
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def score_query(query: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, float]:
+    """Sum the weights of the rules each agent matches, plus the page hint"""
+    scores: Dict[str, float] = {}
+    for agent_type, pattern, weight in COMPILED_RULES:
+        if pattern.search(query or ''):
+            scores[agent_type] = scores.get(agent_type, 0.0) + weight
+
+    page_agent = PAGE_HINTS.get(str((context or {}).get('page', '')).lower())
+    if page_agent and scores:
+        scores[page_agent] = scores.get(page_agent, 0.0) + PAGE_HINT_WEIGHT
+    return scores
+
+
+def classify_by_rules(query: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Pick an agent from the keyword rules.
+
+    Confidence is the winner's share of the winning margin: 1.0 when only
+    one agent matched, 0.0 on a tie. 'confident' is set when the winner
+    scored at least AGENT_ROUTER_MIN_SCORE and its confidence reaches
+    AGENT_ROUTER_MIN_CONFIDENCE; anything else should go to the LLM.
+    """
+    scores = score_query(query, context)
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    if not ranked:
+        return {'agent_type': None, 'confidence': 0.0, 'confident': False, 'scores': scores}
+
+    agent_type, best = ranked[0]
+    runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+    confidence = (best - runner_up) / best
+
+    confident = (
+        best >= getattr(settings, 'AGENT_ROUTER_MIN_SCORE', 2)
+        and confidence >= getattr(settings, 'AGENT_ROUTER_MIN_CONFIDENCE', 0.4)
+    )
+    return {'agent_type': agent_type, 'confidence': confidence, 'confident': confident, 'scores': scores}
+
+
+def record_route(path: str):
+    """Count how queries were routed: 'rules', 'llm' or 'default'"""
+    with _stats_lock:
+        _stats[path] += 1
+
+
+def routing_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        total = sum(_stats.values())
+        return {
+            'total': total,
+            'paths': dict(_stats),
+            'rules_share': _stats['rules'] / total if total else 0.0,
+        }
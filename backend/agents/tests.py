@@ -0,0 +1,264 @@
+import importlib
+import shutil
+import tempfile
+import threading
+import time
+import zlib
+from pathlib import Path
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from langchain_core.embeddings import Embeddings
+from rest_framework import status
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from agents import langchain_agents, query_router
+from agents.query_router import classify_by_rules, routing_stats
+from agents.views import AgentViewSet
+
+
+class LazyAgentBuildTestCase(TestCase):
+    def setUp(self):
+        """Start every test with nothing built"""
+        patcher = patch.dict(langchain_agents._resources, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_import_builds_nothing(self):
+        """Importing the module creates no models, knowledge bases or agents"""
+        with patch.dict('os.environ', {'OPENROUTER_API_KEY': 'test-key'}):
+            module = importlib.reload(langchain_agents)
+
+        self.assertEqual(module._resources, {})
+        report = module.orchestrator.startup_report()
+        self.assertFalse(any(state['built'] for state in report['resources'].values()))
+        self.assertEqual(report['build_seconds'], 0)
+
+    def test_concurrent_first_calls_build_the_agent_once(self):
+        """Callers racing for an unbuilt agent wait for a single build and share it"""
+        calls = []
+
+        def build():
+            calls.append(threading.get_ident())
+            time.sleep(0.05)
+            return {'agent': object(), 'type': 'faq', 'description': 'FAQ agent'}
+
+        results = []
+        with patch.dict(langchain_agents.ChainPromptingOrchestrator.agent_factories, {'faq': build}):
+            threads = [
+                threading.Thread(target=lambda: results.append(langchain_agents.orchestrator.get_agent('faq')))
+                for _ in range(8)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(results), 8)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertTrue(langchain_agents.orchestrator.startup_report()['resources']['agent:faq']['built'])
+
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic embeddings that count the texts they embed"""
+
+    def __init__(self, dimension=8):
+        self.dimension = dimension
+        self.embedded = 0
+
+    def _embed(self, text):
+        vector = [0.0] * self.dimension
+        for word in text.lower().split():
+            vector[zlib.crc32(word.encode()) % self.dimension] += 1.0
+        return vector
+
+    def embed_documents(self, texts):
+        self.embedded += len(texts)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+class KnowledgeBaseStoreTestCase(TestCase):
+    def setUp(self):
+        """Save knowledge bases into a temporary directory with fake embeddings"""
+        self.index_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.index_dir, ignore_errors=True)
+        settings_patcher = override_settings(AGENT_INDEX_DIR=self.index_dir)
+        settings_patcher.enable()
+        self.addCleanup(settings_patcher.disable)
+
+        self.embeddings = FakeEmbeddings()
+        patcher = patch.object(langchain_agents, 'get_embeddings', return_value=self.embeddings)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_key_changes_with_text_and_chunking(self):
+        """The store directory changes whenever the text or chunking settings do"""
+        key = langchain_agents.knowledge_base_key('Ladakh in July', 'trips')
+
+        self.assertEqual(langchain_agents.knowledge_base_key('Ladakh in July', 'trips'), key)
+        self.assertTrue(key.startswith('trips-'))
+        self.assertNotEqual(langchain_agents.knowledge_base_key('Ladakh in June', 'trips'), key)
+        with override_settings(RAG_CHUNK_MAX_TOKENS=120):
+            self.assertNotEqual(langchain_agents.knowledge_base_key('Ladakh in July', 'trips'), key)
+        with override_settings(RAG_CHUNK_OVERLAP_TOKENS=10):
+            self.assertNotEqual(langchain_agents.knowledge_base_key('Ladakh in July', 'trips'), key)
+
+    def test_saved_store_is_loaded_instead_of_re_embedded(self):
+        """A second build loads the saved store from disk and answers the same way"""
+        text = 'Ladakh trek over high passes.\n\nGoa beach shacks and seafood.'
+
+        built = langchain_agents.create_knowledge_base(text, 'trips')
+        embedded = self.embeddings.embedded
+        loaded = langchain_agents.create_knowledge_base(text, 'trips')
+
+        self.assertGreater(embedded, 0)
+        self.assertEqual(self.embeddings.embedded, embedded)
+        self.assertEqual(
+            [doc.page_content for doc in loaded.similarity_search('goa seafood', k=1)],
+            [doc.page_content for doc in built.similarity_search('goa seafood', k=1)]
+        )
+        # Only the finished store is left behind, no temporary directories
+        self.assertEqual(
+            [path.name for path in Path(self.index_dir).iterdir()],
+            [langchain_agents.knowledge_base_key(text, 'trips')]
+        )
+
+    def test_new_text_replaces_the_stale_store(self):
+        """Saving a store for changed text removes the store for the old text"""
+        langchain_agents.create_knowledge_base('Ladakh trek over high passes.', 'trips')
+        langchain_agents.create_knowledge_base('Kashmir houseboats on Dal Lake.', 'trips')
+
+        self.assertEqual(
+            [path.name for path in Path(self.index_dir).iterdir()],
+            [langchain_agents.knowledge_base_key('Kashmir houseboats on Dal Lake.', 'trips')]
+        )
+
+    def test_unreadable_store_is_rebuilt(self):
+        """A corrupt saved store is discarded and rebuilt from the text"""
+        text = 'Ladakh trek over high passes.'
+        path = Path(self.index_dir) / langchain_agents.knowledge_base_key(text, 'trips')
+        path.mkdir()
+        (path / 'index.faiss').write_bytes(b'not an index')
+
+        store = langchain_agents.create_knowledge_base(text, 'trips')
+
+        self.assertIsNotNone(store)
+        self.assertGreater(self.embeddings.embedded, 0)
+        self.assertEqual(len(store.similarity_search('ladakh', k=1)), 1)
+
+
+class QueryRoutingTestCase(TestCase):
+    # (query, context, expected agent) that the keyword rules settle on their own
+    CONFIDENT_CASES = [
+        ('How do I pay with UPI?', {}, 'payment'),
+        ('What is your refund policy?', {}, 'payment_policy'),
+        ('Tell me about the Ladakh itinerary', {}, 'trip_guidance'),
+        ('Is there a minimum age for kids?', {}, 'faq'),
+        ('Stop sending me WhatsApp updates', {}, 'whatsapp'),
+        ('Are there seats left for a group of 6 next month?', {}, 'lead_qualification'),
+        ('I want to talk to someone urgently', {}, 'customer_care'),
+        ('What about meals on the trip?', {}, 'faq'),
+        ('Need help with payment', {'page': 'checkout'}, 'payment'),
+    ]
+
+    # (query, context, rules' best guess) that must go to the LLM
+    AMBIGUOUS_CASES = [
+        ('I have a problem, my payment failed', {}, 'payment'),  # tie
+        ('Can I pay and get a refund?', {}, 'payment_policy'),  # tie
+        ('Need help with payment', {}, 'payment'),  # margin too small without the page hint
+        ('trip', {}, 'trip_guidance'),  # below the minimum score
+        ('hello', {}, None),  # no rule matches
+    ]
+
+    def setUp(self):
+        """Count routes from zero and keep the LLM out of the loop"""
+        patcher = patch.dict(query_router._stats, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.orchestrator = langchain_agents.ChainPromptingOrchestrator()
+
+    def test_confident_rule_matches(self):
+        """Clear queries are classified by the rules alone"""
+        for query, context, expected in self.CONFIDENT_CASES:
+            with self.subTest(query=query, context=context):
+                result = classify_by_rules(query, context)
+                self.assertTrue(result['confident'])
+                self.assertEqual(result['agent_type'], expected)
+
+    def test_ties_and_weak_matches_are_not_confident(self):
+        """Ties, small margins and low scores are left to the LLM"""
+        for query, context, best_guess in self.AMBIGUOUS_CASES:
+            with self.subTest(query=query, context=context):
+                result = classify_by_rules(query, context)
+                self.assertFalse(result['confident'])
+                self.assertEqual(result['agent_type'], best_guess)
+
+    def test_route_query_only_asks_the_llm_when_unsure(self):
+        """Confident queries skip the LLM; ambiguous ones take its answer"""
+        with patch.object(self.orchestrator, '_classify_with_llm', return_value=('faq', 'llm')) as classify:
+            for query, context, expected in self.CONFIDENT_CASES:
+                route = self.orchestrator.route_query(query, context)
+                self.assertEqual((route['agent_type'], route['path']), (expected, 'rules'))
+            classify.assert_not_called()
+
+            for query, context, _ in self.AMBIGUOUS_CASES:
+                route = self.orchestrator.route_query(query, context)
+                self.assertEqual((route['agent_type'], route['path']), ('faq', 'llm'))
+            self.assertEqual(classify.call_count, len(self.AMBIGUOUS_CASES))
+
+    def test_route_query_falls_back_to_the_rules_guess(self):
+        """Without a usable LLM answer the rules' best guess wins, then customer care"""
+        with patch.object(self.orchestrator, '_classify_with_llm', return_value=('customer_care', 'default')):
+            for query, context, best_guess in self.AMBIGUOUS_CASES:
+                with self.subTest(query=query):
+                    route = self.orchestrator.route_query(query, context)
+                    self.assertEqual(route['path'], 'default')
+                    self.assertEqual(route['agent_type'], best_guess or 'customer_care')
+
+    def test_routing_stats_count_each_path(self):
+        """Every routed query is counted under the path it took"""
+        with patch.object(self.orchestrator, '_classify_with_llm', side_effect=[('faq', 'llm'), ('customer_care', 'default')]):
+            self.orchestrator.route_query('How do I pay with UPI?', {})
+            self.orchestrator.route_query('What is your refund policy?', {})
+            self.orchestrator.route_query('trip', {})
+            self.orchestrator.route_query('hello', {})
+
+        self.assertEqual(routing_stats(), {
+            'total': 4,
+            'paths': {'rules': 2, 'llm': 1, 'default': 1},
+            'rules_share': 0.5,
+        })
+
+
+class AgentStatusPermissionTestCase(TestCase):
+    def setUp(self):
+        self.view = AgentViewSet.as_view({'get': 'agent_status'})
+        self.factory = APIRequestFactory()
+
+    def _get(self, user=None):
+        request = self.factory.get('/api/agents/status/')
+        if user:
+            force_authenticate(request, user=user)
+        return self.view(request)
+
+    def test_status_requires_staff(self):
+        """Anonymous and regular users cannot read the agent status report"""
+        user = User.objects.create_user(username='traveller', password='testpass123')
+
+        self.assertIn(self._get().status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+        self.assertEqual(self._get(user).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_staff_can_read_status(self):
+        """Admins get the build and routing report"""
+        admin = User.objects.create_superuser(username='admin', email='admin@example.com', password='admin123')
+
+        response = self._get(admin)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('resources', response.data)
+        self.assertIn('routing', response.data)
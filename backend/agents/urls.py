@@ -5,4 +5,5 @@ urlpatterns = [
     path('discovery/query/', AgentViewSet.as_view({'post': 'discovery_query'}), name='agent-discovery-query'),
     path('chat/message/', AgentViewSet.as_view({'post': 'chat_message'}), name='agent-chat-message'),
     path('chat/', AgentViewSet.as_view({'post': 'chat'}), name='agent-chat'),
+    path('status/', AgentViewSet.as_view({'get': 'agent_status'}), name='agent-status'),
 ]
\ No newline at end of file
@@ -2,16 +2,23 @@ from django.shortcuts import render
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 import uuid
 import json
 from .models import ChatSession, ChatMessage, SupportAgent
 from .serializers import ChatMessageSerializer
-from .langchain_agents import chat_with_agent
+from .langchain_agents import chat_with_agent, orchestrator
+from .query_router import routing_stats
 
 class AgentViewSet(viewsets.ViewSet):
     permission_classes = [AllowAny]  # Allow unauthenticated access for demo
 
+    def get_permissions(self):
+        # The status report exposes internals, so only staff may read it
+        if self.action == 'agent_status':
+            return [IsAdminUser()]
+        return super().get_permissions()
+
     @action(detail=False, methods=['post'])
     def chat(self, request):
         """Handle chat messages with chain prompting orchestrator"""
@@ -56,7 +63,8 @@ class AgentViewSet(viewsets.ViewSet):
                 content=query,
                 metadata=json.dumps({
                     'agent_type': result['agentType'],
-                    'page': context.get('page', 'general')
+                    'page': context.get('page', 'general'),
+                    'routing_path': result.get('routing', {}).get('path')
                 })
             )
 
@@ -98,4 +106,9 @@ class AgentViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['post'])
     def chat_message(self, request):
         """Handle chat messages - legacy endpoint"""
-        return self.chat(request)
\ No newline at end of file
+        return self.chat(request)
+
+    @action(detail=False, methods=['get'])
+    def agent_status(self, request):
+        """Report which agents and knowledge bases are built, their build times and how queries were routed"""
+        return Response(dict(orchestrator.startup_report(), routing=routing_stats()))
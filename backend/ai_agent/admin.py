@@ -1,6 +1,6 @@
 from django.contrib import admin
 from .models import (
-    AIAgent, AIConversation, AIMessageTemplate, AISentimentAnalysis,
+    AIAgent, AIConversation, AIConversationMessage, AIMessageTemplate, AISentimentAnalysis,
     AIContentGeneration, AIProcessingLog
 )
 
@@ -28,12 +28,21 @@ class AIAgentAdmin(admin.ModelAdmin):
     )
 
 
+class AIConversationMessageInline(admin.TabularInline):
+    model = AIConversationMessage
+    fields = ['role', 'content', 'created_at']
+    readonly_fields = ['role', 'content', 'created_at']
+    extra = 0
+    can_delete = False
+
+
 @admin.register(AIConversation)
 class AIConversationAdmin(admin.ModelAdmin):
     list_display = ['agent', 'user', 'session_id', 'message_count', 'last_message_at']
     list_filter = ['agent', 'created_at', 'last_message_at']
     search_fields = ['session_id', 'user__username']
     readonly_fields = ['id', 'created_at', 'last_message_at']
+    inlines = [AIConversationMessageInline]
 
 
 @admin.register(AIMessageTemplate)
@@ -0,0 +1,148 @@
+import json
+import logging
+import re
+from typing import Dict, Any, Optional, List, Tuple
+
+from django.conf import settings
+
+from .chunking import count_tokens
+
+logger = logging.getLogger(__name__)
+
+SENTIMENTS = ('positive', 'negative', 'neutral', 'mixed')
+
+JSON_ARRAY_RE = re.compile(r'\[.*\]', re.DOTALL)
+
+# Completion tokens budgeted per message in a batch reply
+OUTPUT_TOKENS_PER_MESSAGE = 60
+OUTPUT_TOKENS_PER_LIST = 40
+
+
+def batch_messages(
+    items: List[Tuple[int, str]],
+    batch_size: Optional[int] = None,
+    max_tokens: Optional[int] = None
+) -> List[List[Tuple[int, str]]]:
+    """
+    Pack (index, content) pairs into batches of at most batch_size messages
+    and max_tokens message tokens. A message over the token budget gets a
+    batch of its own.
+    """
+    batch_size = batch_size or getattr(settings, 'AI_SENTIMENT_BATCH_SIZE', 20)
+    max_tokens = max_tokens or getattr(settings, 'AI_SENTIMENT_BATCH_MAX_TOKENS', 3000)
+
+    batches = []
+    current = []
+    current_tokens = 0
+    for index, content in items:
+        tokens = count_tokens(content)
+        if current and (len(current) >= batch_size or current_tokens + tokens > max_tokens):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append((index, content))
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def output_token_budget(batch_size: int, include_keywords: bool, include_entities: bool) -> int:
+    """Completion tokens needed for a reply covering batch_size messages"""
+    per_message = OUTPUT_TOKENS_PER_MESSAGE
+    per_message += OUTPUT_TOKENS_PER_LIST * (int(include_keywords) + int(include_entities))
+    return 50 + batch_size * per_message
+
+
+def build_batch_prompt(batch: List[Tuple[int, str]], include_keywords: bool, include_entities: bool) -> str:
+    """Ask for one JSON object per message, keyed by the message's index"""
+    fields = [
+        '"i": <the message index>',
+        '"sentiment": "positive" | "negative" | "neutral" | "mixed"',
+        '"confidence": <0.0-1.0>',
+        '"positive": <0.0-1.0>',
+        '"negative": <0.0-1.0>',
+        '"neutral": <0.0-1.0>',
+    ]
+    if include_keywords:
+        fields.append('"keywords": [key words/phrases]')
+    if include_entities:
+        fields.append('"entities": [named entities]')
+
+    payload = json.dumps([{'i': index, 'text': content} for index, content in batch], ensure_ascii=False)
+    return (
+        "Analyze the sentiment of each message in the JSON array below.\n\n"
+        f"Messages: {payload}\n\n"
+        "Return only a JSON array with exactly one object per message, in the same order, "
+        "each with these fields:\n"
+        + "\n".join(f"- {field}" for field in fields)
+    )
+
+
+def _score(value: Any, default: float) -> float:
+    try:
+        return min(max(float(value), 0.0), 1.0)
+    except (TypeError, ValueError):
+        return default
+
+
+def _string_list(value: Any) -> List[str]:
+    if isinstance(value, str):
+        value = value.split(',')
+    if not isinstance(value, list):
+        return []
+    return [str(item).strip() for item in value if str(item).strip()]
+
+
+def normalize_analysis(item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Map one reply object onto the analysis fields; None if it has no usable sentiment"""
+    sentiment = str(item.get('sentiment', '')).strip().lower()
+    if sentiment not in SENTIMENTS:
+        return None
+
+    return {
+        'sentiment': sentiment,
+        'confidence_score': _score(item.get('confidence'), 0.5),
+        'positive_score': _score(item.get('positive'), 0.0),
+        'negative_score': _score(item.get('negative'), 0.0),
+        'neutral_score': _score(item.get('neutral'), 0.0),
+        'keywords': _string_list(item.get('keywords')),
+        'entities': _string_list(item.get('entities')),
+    }
+
+
+def parse_batch_response(response: str, expected: List[int]) -> Dict[int, Dict[str, Any]]:
+    """
+    Parse a batch reply into {message index: analysis}.
+
+    Tolerates code fences and text around the array. Objects without a
+    known index fall back to their position in the array; indexes missing
+    from the result should be retried.
+    """
+    match = JSON_ARRAY_RE.search(response or '')
+    if not match:
+        logger.warning("Sentiment batch reply contained no JSON array")
+        return {}
+
+    try:
+        items = json.loads(match.group(0))
+    except ValueError as e:
+        logger.warning(f"Failed to parse sentiment batch reply: {str(e)}")
+        return {}
+
+    expected_set = set(expected)
+    analyses = {}
+    for position, item in enumerate(items if isinstance(items, list) else []):
+        if not isinstance(item, dict):
+            continue
+        index = item.get('i')
+        if isinstance(index, str) and index.isdigit():
+            index = int(index)
+        if index not in expected_set:
+            index = expected[position] if position < len(expected) else None
+        if index is None or index in analyses:
+            continue
+        analysis = normalize_analysis(item)
+        if analysis is not None:
+            analyses[index] = analysis
+    return analyses
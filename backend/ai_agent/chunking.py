@@ -0,0 +1,147 @@
+import logging
+import math
+import re
+import threading
+from typing import Dict, Any, Optional, List, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+SENTENCE_END_RE = re.compile(r'(?<=[.!?])\s+(?=[A-Z0-9"\'(₹])')
+
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    """Load the tiktoken encoding once; None if tiktoken or its data is unavailable"""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        with _encoding_lock:
+            if not _encoding_loaded:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding(getattr(settings, 'RAG_TOKENIZER_ENCODING', 'cl100k_base'))
+                except Exception as e:
+                    logger.warning(f"Tokenizer unavailable, estimating token counts: {str(e)}")
+                    _encoding = None
+                _encoding_loaded = True
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens with the embedding model's tokenizer, or estimate ~4 characters per token"""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return math.ceil(len(text) / 4)
+
+
+def _split_units(text: str, max_tokens: int) -> List[Tuple[str, str, int]]:
+    """
+    Break text into (separator, text, tokens) units no larger than max_tokens.
+
+    Paragraphs are kept whole when they fit, then lines (so each itinerary
+    day stays together), then sentences, and only then word windows.
+    """
+    units = []
+
+    def add(piece: str, separator: str, level: int):
+        piece = piece.strip()
+        if not piece:
+            return
+        tokens = count_tokens(piece)
+        if tokens <= max_tokens:
+            units.append((separator, piece, tokens))
+        elif level == 0:
+            for i, line in enumerate(piece.split('\n')):
+                add(line, separator if i == 0 else '\n', 1)
+        elif level == 1:
+            for i, sentence in enumerate(SENTENCE_END_RE.split(piece)):
+                add(sentence, separator if i == 0 else ' ', 2)
+        else:
+            _add_word_windows(piece, separator, max_tokens, units)
+
+    for i, paragraph in enumerate(re.split(r'\n\s*\n', text)):
+        add(paragraph, '\n\n' if i else '', 0)
+    return units
+
+
+def _add_word_windows(text: str, separator: str, max_tokens: int, units: List[Tuple[str, str, int]]):
+    """Split an oversized sentence into consecutive word windows"""
+    window = []
+    window_tokens = 0
+    for word in text.split():
+        tokens = count_tokens(' ' + word)
+        if window and window_tokens + tokens > max_tokens:
+            units.append((separator, ' '.join(window), window_tokens))
+            separator = ' '
+            window = []
+            window_tokens = 0
+        window.append(word)
+        window_tokens += tokens
+    if window:
+        units.append((separator, ' '.join(window), window_tokens))
+
+
+def chunk_text(
+    text: str,
+    max_tokens: Optional[int] = None,
+    overlap_tokens: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Split text into chunks of at most max_tokens tokens.
+
+    Chunks break on paragraph, line and sentence boundaries, and each chunk
+    after the first repeats up to overlap_tokens of trailing units from the
+    previous one. Every unit is tokenised once, so the work is linear in the
+    length of the text. Returns dicts with 'text' and 'token_count'.
+    """
+    max_tokens = max_tokens or getattr(settings, 'RAG_CHUNK_MAX_TOKENS', 300)
+    overlap_tokens = overlap_tokens if overlap_tokens is not None else getattr(settings, 'RAG_CHUNK_OVERLAP_TOKENS', 50)
+    overlap_tokens = min(overlap_tokens, max_tokens // 2)
+
+    units = _split_units(text or '', max_tokens)
+    if not units:
+        return []
+
+    chunks = []
+    current: List[Tuple[str, str, int]] = []
+    current_tokens = 0
+    fresh = 0  # units in current that did not come from the overlap
+
+    def emit():
+        parts = [current[0][1]]
+        for separator, piece, _ in current[1:]:
+            parts.append((separator or ' ') + piece)
+        content = ''.join(parts)
+        chunks.append({'text': content, 'token_count': count_tokens(content)})
+
+    # Budget one extra token for each separator joining two units
+    for unit in units:
+        if current and current_tokens + unit[2] + 1 > max_tokens:
+            emit()
+            # Carry trailing units forward as overlap, as long as they fit
+            carried = []
+            carried_tokens = 0
+            for previous in reversed(current):
+                cost = previous[2] + 1
+                if carried_tokens + cost > overlap_tokens or carried_tokens + cost + unit[2] > max_tokens:
+                    break
+                carried.insert(0, previous)
+                carried_tokens += cost
+            current = carried
+            current_tokens = carried_tokens
+            fresh = 0
+
+        current_tokens += unit[2] + (1 if current else 0)
+        current.append(unit)
+        fresh += 1
+
+    if fresh:
+        emit()
+    return chunks
@@ -0,0 +1,132 @@
+import logging
+import re
+from typing import Dict, Any, Optional, List
+
+from django.conf import settings
+
+from .chunking import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Metadata fields rendered into the context when the query mentions them
+METADATA_KEYWORDS = {
+    'price': ('price', 'cost', 'budget', 'cheap', 'expensive', 'afford', 'rupee', 'inr', '₹', 'fee', 'pay'),
+    'duration': ('day', 'days', 'duration', 'long', 'week', 'weekend', 'night', 'nights'),
+    'difficulty': ('difficult', 'difficulty', 'easy', 'hard', 'moderate', 'challenging', 'fitness', 'beginner', 'tough'),
+    'tags': ('tag', 'type', 'kind', 'theme', 'category', 'style'),
+}
+
+PART_SUFFIX_RE = re.compile(r'\s*\(Part \d+\)$')
+
+
+def relevant_metadata_fields(query: str) -> List[str]:
+    """Metadata fields the query asks about, in display order"""
+    query_lower = (query or '').lower()
+    words = set(re.findall(r'[a-z]+|₹', query_lower))
+    return [
+        field for field, keywords in METADATA_KEYWORDS.items()
+        if any(keyword in words for keyword in keywords)
+    ]
+
+
+def render_metadata(metadata: Dict[str, Any], fields: List[str]) -> str:
+    """Render the selected metadata fields as one compact line"""
+    parts = []
+    for field in fields:
+        value = metadata.get(field)
+        if value in (None, '', [], 0):
+            continue
+        if field == 'price':
+            parts.append(f"₹{float(value):,.0f}")
+        elif field == 'duration':
+            parts.append(f"{value} days")
+        elif field == 'tags':
+            parts.append(', '.join(str(tag) for tag in value) if isinstance(value, list) else str(value))
+        else:
+            parts.append(str(value))
+    return ' | '.join(parts)
+
+
+def _score(document: Dict[str, Any]) -> float:
+    return document.get('rrf_score', document.get('similarity', 0.0))
+
+
+def pack_context(
+    query: str,
+    documents: List[Dict[str, Any]],
+    max_tokens: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Build the LLM context from retrieved chunks within a token budget.
+
+    Chunks are taken in score order and grouped under one heading per
+    source. Lines already included from the same source (e.g. chunk
+    overlap) are dropped, and chunks that no longer fit are skipped so a
+    smaller, lower-ranked chunk can still use the remaining budget.
+    Returns the context text, the documents used and the tokens spent.
+    """
+    max_tokens = max_tokens or getattr(settings, 'RAG_CONTEXT_MAX_TOKENS', 1500)
+    fields = relevant_metadata_fields(query)
+
+    sources: Dict[str, Dict[str, Any]] = {}
+    order: List[str] = []
+    used_documents = []
+    token_count = 0
+    skipped_count = 0
+
+    for document in sorted(documents, key=_score, reverse=True):
+        source_key = f"{document.get('source_type')}:{document.get('source_id')}"
+        source = sources.get(source_key)
+
+        header_tokens = 0
+        if source is None:
+            title = PART_SUFFIX_RE.sub('', document.get('title') or '')
+            metadata_line = render_metadata(document.get('metadata') or {}, fields)
+            header = [f"## {title}"] + ([metadata_line] if metadata_line else [])
+            header_tokens = sum(count_tokens(line) + 1 for line in header)
+            source = {'header': header, 'lines': [], 'seen': set()}
+
+        new_lines = []
+        for line in document.get('content', '').split('\n'):
+            key = line.strip()
+            if key and key not in source['seen']:
+                new_lines.append(key)
+        new_lines = list(dict.fromkeys(new_lines))
+        if not new_lines:
+            # Fully covered by chunks already in the context
+            skipped_count += 1
+            continue
+
+        line_tokens = [count_tokens(line) + 1 for line in new_lines]
+        remaining = max_tokens - token_count - header_tokens
+
+        if sum(line_tokens) > remaining:
+            if used_documents:
+                skipped_count += 1
+                continue
+            # Even the best chunk is over budget: keep as many lines as fit
+            kept = 0
+            spent = 0
+            while kept < len(new_lines) and spent + line_tokens[kept] <= remaining:
+                spent += line_tokens[kept]
+                kept += 1
+            new_lines, line_tokens = new_lines[:kept], line_tokens[:kept]
+            if not new_lines:
+                break
+
+        if source_key not in sources:
+            sources[source_key] = source
+            order.append(source_key)
+        source['lines'].extend(new_lines)
+        source['seen'].update(new_lines)
+        token_count += header_tokens + sum(line_tokens)
+        used_documents.append(document)
+
+    blocks = ['\n'.join(sources[key]['header'] + sources[key]['lines']) for key in order]
+
+    return {
+        'context': '\n\n'.join(blocks),
+        'documents': used_documents,
+        'token_count': token_count,
+        'skipped_count': skipped_count,
+    }
@@ -0,0 +1,134 @@
+import logging
+from typing import Dict, Any, Optional, List
+
+from django.conf import settings
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+
+from .chunking import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Role label and per-message framing overhead in the chat format
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# A summary folds in at most this many max_messages windows of messages;
+# anything older (e.g. a long backlog from before summaries existed) is dropped
+SUMMARY_BACKLOG_WINDOWS = 4
+
+SUMMARY_PROMPT = """Update the running summary of a conversation between a traveller and the Adventure Buddha assistant.
+Keep everything the assistant may need later: the traveller's name, trips and dates discussed, group size,
+budget, booking or payment details, preferences, promises made and open questions. Drop greetings and small talk.
+Write at most {max_words} words of plain prose.
+
+Current summary:
+{summary}
+
+New turns to fold in:
+{turns}
+
+Updated summary:"""
+
+
+def turn_tokens(turn: Dict[str, Any]) -> int:
+    return count_tokens(turn.get('content', '')) + MESSAGE_OVERHEAD_TOKENS
+
+
+def select_recent(turns: List[Dict[str, Any]], max_tokens: int) -> List[Dict[str, Any]]:
+    """The longest run of most recent turns that fits in max_tokens"""
+    selected = []
+    spent = 0
+    for turn in reversed(turns):
+        tokens = turn_tokens(turn)
+        if spent + tokens > max_tokens:
+            break
+        selected.append(turn)
+        spent += tokens
+    selected.reverse()
+    return selected
+
+
+class ConversationMemory:
+    """
+    Token-budgeted chat history for an AIConversation.
+
+    Turns after the summary point are sent verbatim while they fit in
+    history_tokens, reading at most max_messages rows. Once they outgrow
+    it, update_summary folds the oldest turns into the conversation's
+    stored running summary until only recent_tokens worth remain. That
+    runs after a reply has been sent (see needs_summary), so a prompt uses
+    the previous summary and never waits on the summarisation call. A
+    prompt's history never exceeds summary_tokens plus history_tokens,
+    however long the conversation gets.
+    """
+
+    def __init__(
+        self,
+        history_tokens: Optional[int] = None,
+        recent_tokens: Optional[int] = None,
+        summary_tokens: Optional[int] = None,
+        max_messages: Optional[int] = None
+    ):
+        self.history_tokens = history_tokens or getattr(settings, 'AI_HISTORY_MAX_TOKENS', 2000)
+        self.recent_tokens = min(
+            recent_tokens or getattr(settings, 'AI_HISTORY_RECENT_TOKENS', 800), self.history_tokens
+        )
+        self.summary_tokens = summary_tokens or getattr(settings, 'AI_SUMMARY_MAX_TOKENS', 300)
+        self.max_messages = max_messages or getattr(settings, 'AI_HISTORY_MAX_MESSAGES', 40)
+
+    def _pending(self, conversation) -> int:
+        return max(conversation.message_count - conversation.summarized_count, 0)
+
+    def _recent_turns(self, conversation) -> List[Dict[str, Any]]:
+        return conversation.recent_messages(min(self._pending(conversation), self.max_messages))
+
+    def build_messages(self, conversation) -> List[Any]:
+        """
+        LangChain messages for the conversation's history: the stored
+        running summary (if any) followed by the recent turns that fit
+        """
+        messages = []
+        if conversation.summary:
+            messages.append(SystemMessage(content=f"Summary of the earlier conversation:\n{conversation.summary}"))
+
+        for turn in select_recent(self._recent_turns(conversation), self.history_tokens):
+            if turn['role'] == 'user':
+                messages.append(HumanMessage(content=turn['content']))
+            elif turn['role'] == 'assistant':
+                messages.append(AIMessage(content=turn['content']))
+        return messages
+
+    def needs_summary(self, conversation) -> bool:
+        """Whether the unsummarised turns have outgrown the history budget"""
+        if self._pending(conversation) > self.max_messages:
+            return True
+        return sum(turn_tokens(turn) for turn in self._recent_turns(conversation)) > self.history_tokens
+
+    def update_summary(self, conversation, llm):
+        """Fold the older unsummarised turns into the stored summary"""
+        pending = self._pending(conversation)
+        backlog = conversation.recent_messages(min(pending, self.max_messages * SUMMARY_BACKLOG_WINDOWS))
+        self.summarize(conversation, backlog, llm)
+
+    def summarize(self, conversation, turns: List[Dict[str, Any]], llm):
+        """Fold all but the most recent of the given turns, the conversation's latest, into the stored summary"""
+        keep = len(select_recent(turns, self.recent_tokens))
+        folded = turns[:len(turns) - keep]
+        if not folded:
+            return
+
+        transcript = '\n'.join(
+            f"{'User' if turn['role'] == 'user' else 'Assistant'}: {turn['content']}" for turn in folded
+        )
+        response = llm.invoke([HumanMessage(content=SUMMARY_PROMPT.format(
+            max_words=int(self.summary_tokens * 0.75),
+            summary=conversation.summary or '(none yet)',
+            turns=transcript
+        ))])
+
+        conversation.summary = response.content.strip()
+        conversation.summarized_count = conversation.message_count - keep
+        conversation.save(update_fields=['summary', 'summarized_count'])
+        logger.info(
+            f"Folded {len(folded)} turns into the summary of conversation {conversation.session_id} "
+            f"({count_tokens(conversation.summary)} tokens)"
+        )
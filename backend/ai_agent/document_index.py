@@ -0,0 +1,206 @@
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import timedelta
+from typing import Dict, Any, Optional, List, Iterable
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Max, Count, Q
+
+from .models import VectorDocument
+
+logger = logging.getLogger(__name__)
+
+# Structured filters accepted by the document indexes
+FILTER_KEYS = (
+    'source_type', 'min_price', 'max_price', 'difficulty',
+    'min_duration', 'max_duration', 'tags'
+)
+
+
+def _as_list(value) -> List[str]:
+    values = value if isinstance(value, (list, tuple, set)) else [value]
+    return [str(v).lower() for v in values if v not in (None, '')]
+
+
+def _as_number(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def document_matches(document: Dict[str, Any], filters: Optional[Dict[str, Any]]) -> bool:
+    """Check a single search result against structured filters"""
+    if not filters:
+        return True
+
+    metadata = document.get('metadata') or {}
+    price = _as_number(metadata.get('price'))
+    duration = _as_number(metadata.get('duration'))
+
+    if filters.get('source_type') and str(document.get('source_type')).lower() not in _as_list(filters['source_type']):
+        return False
+    if filters.get('difficulty') and str(metadata.get('difficulty', '')).lower() not in _as_list(filters['difficulty']):
+        return False
+    if filters.get('min_price') is not None and not price >= filters['min_price']:
+        return False
+    if filters.get('max_price') is not None and not price <= filters['max_price']:
+        return False
+    if filters.get('min_duration') is not None and not duration >= filters['min_duration']:
+        return False
+    if filters.get('max_duration') is not None and not duration <= filters['max_duration']:
+        return False
+    if filters.get('tags'):
+        tags = set(_as_list(metadata.get('tags') or []))
+        if not tags & set(_as_list(filters['tags'])):
+            return False
+    return True
+
+
+class SyncedDocumentIndex(ABC):
+    """
+    Base class for process-local indexes over active VectorDocuments.
+
+    The index keeps itself in sync with the database by tracking the newest
+    ``updated_at`` it has seen and the number of active rows, reloading only
+    the rows that changed. Each refresh re-reads a ``sync_margin`` window
+    behind that watermark, so a row committed late with an earlier
+    ``updated_at`` is still picked up; rows already applied at the same
+    ``updated_at`` are skipped. Subclasses decide how a row is indexed
+    through ``_prepare`` and apply each batch of changes in ``_update``.
+    """
+
+    LOAD_FIELDS = (
+        'id', 'content', 'title', 'source_type', 'source_id',
+        'metadata', 'is_active', 'updated_at'
+    )
+
+    def __init__(self, refresh_interval: Optional[float] = None, sync_margin: Optional[float] = None):
+        self._lock = threading.RLock()
+        self.refresh_interval = refresh_interval if refresh_interval is not None else getattr(
+            settings, 'RAG_INDEX_REFRESH_SECONDS', 5
+        )
+        self.sync_margin = timedelta(seconds=sync_margin if sync_margin is not None else getattr(
+            settings, 'RAG_INDEX_SYNC_MARGIN_SECONDS', 60
+        ))
+
+        self._skipped = set()
+        # updated_at of every applied row that is still indexed or skipped
+        self._versions: Dict[str, Any] = {}
+        self._loaded = False
+        self._synced_until = None
+        self._last_check = 0.0
+        self.version = 0
+        self._reset()
+
+    @abstractmethod
+    def __len__(self):
+        """Number of indexed documents"""
+
+    @abstractmethod
+    def _reset(self):
+        """Drop all indexed documents"""
+
+    @abstractmethod
+    def _prepare(self, row: Dict[str, Any]):
+        """Return the index payload for a row, or None if it cannot be indexed"""
+
+    @abstractmethod
+    def _update(self, upserts: Dict[str, tuple], removals: set, unindexed: set):
+        """Apply one batch of upserts and removals"""
+
+    def rebuild(self):
+        """Reload every active document from the database"""
+        start_time = time.time()
+        rows = VectorDocument.objects.filter(is_active=True).values(*self.LOAD_FIELDS)
+
+        with self._lock:
+            self._reset()
+            self._skipped = set()
+            self._versions = {}
+            self._synced_until = None
+            self._apply_rows(rows)
+            self._loaded = True
+            self._last_check = time.time()
+
+        logger.info(
+            f"{self.__class__.__name__} rebuilt with {len(self)} documents in {time.time() - start_time:.3f}s"
+        )
+
+    def refresh(self, force: bool = False):
+        """Bring the index up to date with the database if anything changed"""
+        now = time.time()
+        if not force and self._loaded and now - self._last_check < self.refresh_interval:
+            return
+
+        with self._lock:
+            if not self._loaded:
+                self.rebuild()
+                return
+
+            self._last_check = now
+            state = VectorDocument.objects.aggregate(
+                latest=Max('updated_at'),
+                active=Count('id', filter=Q(is_active=True))
+            )
+
+            if state['latest']:
+                changed = VectorDocument.objects.filter(
+                    updated_at__gte=self._synced_until - self.sync_margin
+                ) if self._synced_until else VectorDocument.objects.all()
+                self._apply_rows(
+                    row for row in changed.values(*self.LOAD_FIELDS) if not self._is_applied(row)
+                )
+
+            if state['active'] != len(self) + len(self._skipped):
+                # Rows were hard-deleted, so the watermark cannot tell us which ones
+                self.rebuild()
+
+    def _is_applied(self, row: Dict[str, Any]) -> bool:
+        """Whether the index already reflects this version of the row"""
+        version = self._versions.get(str(row['id']))
+        if not row['is_active']:
+            return version is None
+        return version == row['updated_at']
+
+    def _apply_rows(self, rows: Iterable[Dict[str, Any]]):
+        """Upsert active rows and drop inactive ones in a single update"""
+        upserts = {}
+        removals = set()
+        unindexed = set()
+
+        for row in rows:
+            doc_id = str(row['id'])
+            if self._synced_until is None or row['updated_at'] > self._synced_until:
+                self._synced_until = row['updated_at']
+
+            if not row['is_active']:
+                removals.add(doc_id)
+                continue
+            self._versions[doc_id] = row['updated_at']
+
+            payload = self._prepare(row)
+            if payload is None:
+                unindexed.add(doc_id)
+                continue
+
+            upserts[doc_id] = (payload, {
+                'id': row['id'],
+                'content': row['content'],
+                'title': row['title'],
+                'source_type': row['source_type'],
+                'source_id': row['source_id'],
+                'metadata': row['metadata'] or {},
+                'updated_at': row['updated_at'],
+            })
+
+        if upserts or removals or unindexed:
+            # Active rows we cannot index still count towards the active total
+            self._skipped = (self._skipped - removals - set(upserts)) | unindexed
+            self._update(upserts, removals, unindexed)
+            for doc_id in removals:
+                self._versions.pop(doc_id, None)
+            self.version += 1
@@ -0,0 +1,162 @@
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Callable
+
+from django.conf import settings
+from django.core.cache import cache
+from langchain_core.embeddings import Embeddings
+
+from .models import pack_embedding, unpack_embedding
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(text: str) -> str:
+    """Normalise query text so trivially different spellings share a cache entry"""
+    return re.sub(r'\s+', ' ', text or '').strip().lower()
+
+
+class EmbeddingCache:
+    """
+    Two-level cache for query embeddings keyed by normalised text and model.
+
+    The first level is an in-process LRU; the optional second level is the
+    Django cache, so processes sharing a cache backend (e.g. Redis) also
+    share embeddings. Both levels expire entries after their TTL.
+    """
+
+    def __init__(
+        self,
+        max_size: Optional[int] = None,
+        ttl: Optional[float] = None,
+        use_shared: Optional[bool] = None,
+        shared_ttl: Optional[int] = None
+    ):
+        self.max_size = max_size if max_size is not None else getattr(settings, 'RAG_QUERY_CACHE_SIZE', 1024)
+        self.ttl = ttl if ttl is not None else getattr(settings, 'RAG_QUERY_CACHE_TTL', 3600)
+        self.use_shared = use_shared if use_shared is not None else getattr(settings, 'RAG_QUERY_CACHE_SHARED', True)
+        self.shared_ttl = shared_ttl if shared_ttl is not None else getattr(settings, 'RAG_QUERY_CACHE_SHARED_TTL', 86400)
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def _key(self, text: str, model: str) -> str:
+        digest = hashlib.sha1(normalize_query(text).encode('utf-8')).hexdigest()
+        return f"embedding:{model}:{digest}"
+
+    def get(self, text: str, model: str) -> Optional[List[float]]:
+        """Look up a cached embedding, checking the local LRU then the shared cache"""
+        key = self._key(text, model)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                expires_at, embedding = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.local_hits += 1
+                    return embedding
+                del self._entries[key]
+
+        if self.use_shared:
+            try:
+                packed = cache.get(key)
+            except Exception as e:
+                logger.warning(f"Shared embedding cache lookup failed: {str(e)}")
+                packed = None
+            if packed:
+                embedding = unpack_embedding(packed).tolist()
+                self._store_local(key, embedding)
+                with self._lock:
+                    self.shared_hits += 1
+                return embedding
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, text: str, model: str, embedding: List[float]):
+        """Store an embedding in both cache levels"""
+        key = self._key(text, model)
+        self._store_local(key, list(embedding))
+
+        if self.use_shared:
+            try:
+                cache.set(key, pack_embedding(embedding), self.shared_ttl)
+            except Exception as e:
+                logger.warning(f"Shared embedding cache store failed: {str(e)}")
+
+    def _store_local(self, key: str, embedding: List[float]):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, embedding)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get_or_embed(self, text: str, model: str, embed: Callable[[str], List[float]]) -> List[float]:
+        """Return the cached embedding for text, computing and storing it on a miss"""
+        embedding = self.get(text, model)
+        if embedding is None:
+            embedding = embed(text)
+            self.set(text, model, embedding)
+        return embedding
+
+    def clear(self):
+        """Drop all local entries and reset counters"""
+        with self._lock:
+            self._entries.clear()
+            self.local_hits = 0
+            self.shared_hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for monitoring"""
+        with self._lock:
+            lookups = self.local_hits + self.shared_hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'local_hits': self.local_hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'hit_rate': (self.local_hits + self.shared_hits) / lookups if lookups else 0.0
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that serves embed_query from the embedding cache.
+
+    Document embeddings pass straight through; they are computed once at
+    indexing time and never repeat.
+    """
+
+    def __init__(self, embeddings: Embeddings, model_name: str, cache_instance: Optional[EmbeddingCache] = None):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache = cache_instance or embedding_cache
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.cache.get_or_embed(text, self.model_name, self.embeddings.embed_query)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        embedding = self.cache.get(text, self.model_name)
+        if embedding is None:
+            embedding = await self.embeddings.aembed_query(text)
+            self.cache.set(text, self.model_name, embedding)
+        return embedding
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+
+# Global instance
+embedding_cache = EmbeddingCache()
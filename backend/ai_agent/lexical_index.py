@@ -0,0 +1,191 @@
+import heapq
+import logging
+import math
+import re
+from collections import Counter
+from typing import Dict, Any, Optional, List
+
+from django.conf import settings
+
+from .document_index import SyncedDocumentIndex, document_matches
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOP_WORDS = frozenset("""
+a about above after again all also am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has
+have having he her here hers herself him himself his how i if in into is it its itself just me
+more most my myself no nor not now of off on once only or other our ours ourselves out over own
+same she should so some such than that the their theirs them themselves then there these they
+this those through to too under until up very was we were what when where which while who whom
+why will with would you your yours yourself yourselves
+""".split())
+
+# Longest suffix first; each entry is (suffix, replacement, minimum stem length)
+SUFFIX_RULES = (
+    ('ational', 'ate', 3), ('ization', 'ize', 3), ('fulness', 'ful', 3), ('ousness', 'ous', 3),
+    ('iveness', 'ive', 3), ('ements', '', 4), ('ement', '', 4), ('ments', '', 4), ('ment', '', 4),
+    ('ities', '', 3), ('ity', '', 3), ('ingly', '', 3), ('edly', '', 3), ('ness', '', 3),
+    ('ings', '', 3), ('ing', '', 3), ('ies', 'y', 2), ('ied', 'y', 2), ('ers', '', 3), ('er', '', 3),
+    ('ed', '', 3), ('ly', '', 3), ('es', '', 3), ('s', '', 3),
+)
+
+
+def stem(word: str) -> str:
+    """
+    Light suffix-stripping stemmer for English travel text.
+
+    Maps inflections such as trek/treks/trekking/trekked or
+    stay/stays/staying to a common stem without an external dependency.
+    """
+    if len(word) <= 3 or word.isdigit():
+        return word
+    if word.endswith('ss') or word.endswith('us') or word.endswith('is'):
+        return word
+
+    for suffix, replacement, min_stem in SUFFIX_RULES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= min_stem:
+            word = word[:-len(suffix)] + replacement
+            # trekking -> trekk -> trek
+            if len(word) > 3 and word[-1] == word[-2] and word[-1] not in 'lsz':
+                word = word[:-1]
+            break
+
+    # hike/hikes/hiking all end up as hik
+    if len(word) > 3 and word.endswith('e'):
+        word = word[:-1]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, split on non-alphanumerics, drop stop words and stem"""
+    return [stem(token) for token in TOKEN_RE.findall((text or '').lower()) if token not in STOP_WORDS]
+
+
+class LexicalIndex(SyncedDocumentIndex):
+    """
+    BM25 inverted index over active VectorDocuments.
+
+    Postings map each stemmed term to the documents containing it, so a
+    query only touches documents that share at least one term with it.
+    Title terms are counted TITLE_WEIGHT times, which gives title matches
+    their extra weight inside BM25 instead of as a separate bonus.
+    """
+
+    TITLE_WEIGHT = 2
+
+    def __init__(self, refresh_interval: Optional[float] = None, k1: Optional[float] = None, b: Optional[float] = None):
+        self.k1 = k1 if k1 is not None else getattr(settings, 'RAG_BM25_K1', 1.2)
+        self.b = b if b is not None else getattr(settings, 'RAG_BM25_B', 0.75)
+        super().__init__(refresh_interval=refresh_interval)
+
+    def __len__(self):
+        return len(self._documents)
+
+    def _reset(self):
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._term_counts: Dict[str, Counter] = {}
+        self._lengths: Dict[str, int] = {}
+        self._documents: Dict[str, Dict[str, Any]] = {}
+        self._total_length = 0
+
+    def _prepare(self, row: Dict[str, Any]) -> Counter:
+        counts = Counter(tokenize(row['content']))
+        for term in tokenize(row['title']):
+            counts[term] += self.TITLE_WEIGHT
+        return counts
+
+    def _update(self, upserts: Dict[str, tuple], removals: set, unindexed: set):
+        """Apply changes copy-on-write so searches can score a snapshot without the lock"""
+        postings = dict(self._postings)
+        term_counts = dict(self._term_counts)
+        lengths = dict(self._lengths)
+        documents = dict(self._documents)
+        total_length = self._total_length
+        # Posting lists are copied the first time a change touches them
+        copied = {}
+
+        def writable(term: str) -> Dict[str, int]:
+            if term not in copied:
+                copied[term] = postings[term] = dict(postings.get(term, {}))
+            return copied[term]
+
+        for doc_id in removals | unindexed | set(upserts):
+            counts = term_counts.pop(doc_id, None)
+            if counts is None:
+                continue
+            for term in counts:
+                writable(term).pop(doc_id, None)
+            total_length -= lengths.pop(doc_id)
+            del documents[doc_id]
+
+        for doc_id, (counts, document) in upserts.items():
+            for term, frequency in counts.items():
+                writable(term)[doc_id] = frequency
+            term_counts[doc_id] = counts
+            lengths[doc_id] = sum(counts.values())
+            total_length += lengths[doc_id]
+            documents[doc_id] = document
+
+        for term, term_postings in copied.items():
+            if not term_postings:
+                del postings[term]
+
+        self._postings = postings
+        self._term_counts = term_counts
+        self._lengths = lengths
+        self._documents = documents
+        self._total_length = total_length
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 5,
+        filters: Optional[Dict[str, Any]] = None,
+        sync: bool = True
+    ) -> List[Dict[str, Any]]:
+        """Return the top_k documents by BM25 score matching the optional filters"""
+        if sync:
+            self.refresh()
+        terms = set(tokenize(query))
+        if not terms or top_k <= 0:
+            return []
+
+        with self._lock:
+            postings = self._postings
+            lengths = self._lengths
+            documents = self._documents
+            total_length = self._total_length
+
+        total = len(documents)
+        if not total:
+            return []
+        average_length = total_length / total
+
+        scores: Dict[str, float] = {}
+        for term in terms:
+            term_postings = postings.get(term)
+            if not term_postings:
+                continue
+            idf = math.log(1 + (total - len(term_postings) + 0.5) / (len(term_postings) + 0.5))
+            for doc_id, frequency in term_postings.items():
+                norm = self.k1 * (1 - self.b + self.b * lengths[doc_id] / average_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+        candidates = scores.items()
+        if filters:
+            candidates = [(doc_id, score) for doc_id, score in candidates if document_matches(documents[doc_id], filters)]
+        top = heapq.nlargest(top_k, candidates, key=lambda item: item[1])
+        ranked = [(documents[doc_id], score) for doc_id, score in top]
+
+        if not ranked:
+            return []
+
+        best = ranked[0][1]
+        return [dict(document, score=score, similarity=score / best) for document, score in ranked]
+
+
+# Global instance
+lexical_index = LexicalIndex()
@@ -0,0 +1,105 @@
+import os
+import logging
+import threading
+from typing import Dict, Any, Optional, Tuple
+
+import httpx
+from django.conf import settings
+from langchain_openai import ChatOpenAI
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "xai/grok-beta"
+
+
+class LLMClientRegistry:
+    """
+    Process-wide cache of chat model clients.
+
+    Clients are keyed by (model, temperature, max_tokens) and never
+    reconfigured after creation, so one client can serve concurrent
+    requests from any thread. All clients send their sync requests through
+    one shared httpx.Client, so keep-alive connections to the API are
+    reused across models, tasks and requests instead of each AIService
+    opening its own. Async calls use each ChatOpenAI's own async client:
+    async views run on a fresh event loop per request under WSGI, and a
+    process-wide httpx.AsyncClient would keep connections bound to a loop
+    that has already been closed.
+    """
+
+    def __init__(self):
+        self._clients: Dict[Tuple[str, float, int], ChatOpenAI] = {}
+        self._http_client: Optional[httpx.Client] = None
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def _get_http_client(self) -> httpx.Client:
+        if self._http_client is None:
+            self._http_client = httpx.Client(
+                timeout=getattr(settings, 'AI_HTTP_TIMEOUT', 60.0),
+                limits=httpx.Limits(
+                    max_connections=getattr(settings, 'AI_HTTP_MAX_CONNECTIONS', 20),
+                    max_keepalive_connections=getattr(settings, 'AI_HTTP_MAX_KEEPALIVE', 10),
+                ),
+            )
+        return self._http_client
+
+    def get(
+        self,
+        model_name: str = DEFAULT_MODEL,
+        temperature: float = 0.7,
+        max_tokens: int = 2000
+    ) -> Optional[ChatOpenAI]:
+        """Return the shared client for these settings; None if the API key is not configured"""
+        api_key = getattr(settings, 'OPENROUTER_API_KEY', os.getenv('OPENROUTER_API_KEY'))
+        if not api_key:
+            return None
+
+        key = (model_name, float(temperature), int(max_tokens))
+        client = self._clients.get(key)
+        if client is not None:
+            with self._lock:
+                self.reused += 1
+            return client
+
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                try:
+                    client = ChatOpenAI(
+                        model=model_name,
+                        temperature=key[1],
+                        max_tokens=key[2],
+                        api_key=api_key,
+                        base_url=getattr(settings, 'OPENROUTER_BASE_URL', 'https://openrouter.ai/api/v1'),
+                        http_client=self._get_http_client(),
+                    )
+                except Exception as e:
+                    logger.error(f"Failed to initialize LLM: {str(e)}")
+                    return None
+                self._clients[key] = client
+                self.created += 1
+                logger.info(f"Created LLM client for {model_name} (temperature={key[1]}, max_tokens={key[2]})")
+            else:
+                self.reused += 1
+        return client
+
+    def clear(self):
+        """Drop all clients and close the shared connection pool"""
+        with self._lock:
+            self._clients.clear()
+            if self._http_client is not None:
+                self._http_client.close()
+                self._http_client = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'clients': len(self._clients),
+            'created': self.created,
+            'reused': self.reused,
+        }
+
+
+# Global instance
+llm_clients = LLMClientRegistry()
@@ -21,6 +21,22 @@ class Command(BaseCommand):
             action='store_true',
             help='Clear existing vector documents before populating'
         )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Re-embed every chunk even if its content hash is unchanged'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Number of chunks sent per embedding request'
+        )
+        parser.add_argument(
+            '--pack-legacy',
+            action='store_true',
+            help='Convert documents still holding JSON embeddings to the packed binary format'
+        )
 
     def handle(self, *args, **options):
         source_type = options['source_type']
@@ -38,20 +54,37 @@ class Command(BaseCommand):
                 self.style.WARNING(f'Deleted {deleted_count} existing vector documents')
             )
 
+        if options['pack_legacy']:
+            packed_count = self._pack_legacy_embeddings()
+            self.stdout.write(f'Packed {packed_count} legacy JSON embeddings')
+
         try:
             rag_service = RAGService()
-            result = rag_service.populate_vector_store(source_type=source_type)
+            result = rag_service.populate_vector_store(
+                source_type=source_type,
+                embedding_batch_size=options['batch_size'],
+                force=options['force']
+            )
 
             self.stdout.write(
                 self.style.SUCCESS(
                     f'Vector store population completed:\n'
                     f'  Total items processed: {result.get("total_trips", result.get("total_items", 0))}\n'
                     f'  Successfully indexed: {result["success_count"]}\n'
+                    f'  Unchanged (skipped): {result.get("skipped_count", 0)}\n'
+                    f'  Chunks embedded: {result.get("chunk_count", 0)}\n'
+                    f'  Chunks deactivated: {result.get("deactivated_count", 0)}\n'
                     f'  Errors: {result["error_count"]}\n'
                     f'  Message: {result["message"]}'
                 )
             )
 
+            timings = result.get('timings')
+            if timings:
+                self.stdout.write(
+                    '  Timings: ' + ', '.join(f'{stage} {seconds:.2f}s' for stage, seconds in timings.items())
+                )
+
         except Exception as e:
             logger.error(f'Error populating vector store: {str(e)}')
             self.stdout.write(
@@ -61,4 +94,33 @@ class Command(BaseCommand):
 
         self.stdout.write(
             self.style.SUCCESS('Vector store population command completed successfully')
-        )
\ No newline at end of file
+        )
+
+    def _pack_legacy_embeddings(self, batch_size=500):
+        """Move JSON embeddings into the packed binary column"""
+        from django.conf import settings
+        from ai_agent.models import VectorDocument
+
+        dtype = getattr(settings, 'RAG_EMBEDDING_DTYPE', 'float32')
+        fields = ['embedding_vector', 'embedding_dimension', 'embedding_dtype', 'embedding']
+        documents = VectorDocument.objects.filter(
+            embedding__isnull=False, embedding_vector__isnull=True
+        ).only('id', 'embedding')
+
+        batch = []
+        packed_count = 0
+        for document in documents.iterator(chunk_size=batch_size):
+            if not document.embedding:
+                continue
+            document.set_embedding(document.embedding, dtype=dtype)
+            batch.append(document)
+            if len(batch) >= batch_size:
+                VectorDocument.objects.bulk_update(batch, fields)
+                packed_count += len(batch)
+                batch = []
+
+        if batch:
+            VectorDocument.objects.bulk_update(batch, fields)
+            packed_count += len(batch)
+
+        return packed_count
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_agent', '0004_alter_aiprocessinglog_operation_type_vectordocument_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vectordocument',
+            name='embedding_dimension',
+            field=models.IntegerField(default=0, help_text='Number of components in the packed embedding'),
+        ),
+        migrations.AddField(
+            model_name='vectordocument',
+            name='embedding_dtype',
+            field=models.CharField(choices=[('float32', 'Float32'), ('float16', 'Float16')], default='float32', help_text='Storage precision of the packed embedding', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='vectordocument',
+            name='embedding_vector',
+            field=models.BinaryField(blank=True, help_text='Packed embedding bytes for similarity search', null=True),
+        ),
+        migrations.AlterField(
+            model_name='vectordocument',
+            name='embedding',
+            field=models.JSONField(blank=True, help_text='Legacy JSON vector embedding (superseded by embedding_vector)', null=True),
+        ),
+    ]
@@ -0,0 +1,66 @@
+from django.db import migrations
+import numpy as np
+
+
+def pack_json_embeddings(apps, schema_editor):
+    """Move JSON embeddings into the packed float32 column"""
+    VectorDocument = apps.get_model('ai_agent', 'VectorDocument')
+    dtype = np.dtype('float32').newbyteorder('<')
+
+    batch = []
+    documents = VectorDocument.objects.filter(
+        embedding__isnull=False, embedding_vector__isnull=True
+    ).only('id', 'embedding')
+
+    for document in documents.iterator(chunk_size=500):
+        if not document.embedding:
+            continue
+        document.embedding_vector = np.asarray(document.embedding, dtype=dtype).tobytes()
+        document.embedding_dimension = len(document.embedding)
+        document.embedding_dtype = 'float32'
+        document.embedding = None
+        batch.append(document)
+
+        if len(batch) >= 500:
+            VectorDocument.objects.bulk_update(
+                batch, ['embedding_vector', 'embedding_dimension', 'embedding_dtype', 'embedding']
+            )
+            batch = []
+
+    if batch:
+        VectorDocument.objects.bulk_update(
+            batch, ['embedding_vector', 'embedding_dimension', 'embedding_dtype', 'embedding']
+        )
+
+
+def unpack_json_embeddings(apps, schema_editor):
+    """Restore JSON embeddings from the packed column"""
+    VectorDocument = apps.get_model('ai_agent', 'VectorDocument')
+
+    batch = []
+    documents = VectorDocument.objects.filter(
+        embedding_vector__isnull=False
+    ).only('id', 'embedding_vector', 'embedding_dtype')
+
+    for document in documents.iterator(chunk_size=500):
+        dtype = np.dtype(document.embedding_dtype).newbyteorder('<')
+        document.embedding = np.frombuffer(document.embedding_vector, dtype=dtype).astype(float).tolist()
+        batch.append(document)
+
+        if len(batch) >= 500:
+            VectorDocument.objects.bulk_update(batch, ['embedding'])
+            batch = []
+
+    if batch:
+        VectorDocument.objects.bulk_update(batch, ['embedding'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_agent', '0005_vectordocument_binary_embedding'),
+    ]
+
+    operations = [
+        migrations.RunPython(pack_json_embeddings, unpack_json_embeddings),
+    ]
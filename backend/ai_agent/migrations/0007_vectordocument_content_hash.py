@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:55
+
+from django.db import migrations, models
+import hashlib
+
+
+def fill_content_hashes(apps, schema_editor):
+    """Hash existing chunks so the next re-index can reuse them"""
+    VectorDocument = apps.get_model('ai_agent', 'VectorDocument')
+
+    batch = []
+    for document in VectorDocument.objects.only('id', 'content', 'embedding_model').iterator(chunk_size=500):
+        document.content_hash = hashlib.sha256(
+            f"{document.embedding_model}\n{document.content}".encode('utf-8')
+        ).hexdigest()
+        batch.append(document)
+
+        if len(batch) >= 500:
+            VectorDocument.objects.bulk_update(batch, ['content_hash'])
+            batch = []
+
+    if batch:
+        VectorDocument.objects.bulk_update(batch, ['content_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_agent', '0006_convert_json_embeddings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vectordocument',
+            name='content_hash',
+            field=models.CharField(blank=True, help_text='SHA-256 of the content and embedding model, used to skip re-embedding', max_length=64),
+        ),
+        migrations.RunPython(fill_content_hashes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_agent', '0007_vectordocument_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ragquery',
+            name='cache_hit',
+            field=models.BooleanField(default=False, help_text='Whether the response was reused from a semantically similar query'),
+        ),
+    ]
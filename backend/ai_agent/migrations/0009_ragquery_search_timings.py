@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_agent', '0008_ragquery_cache_hit'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ragquery',
+            name='search_timings',
+            field=models.JSONField(blank=True, default=dict, help_text='Per-stage retrieval latencies (seconds)'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_agent', '0009_ragquery_search_timings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vectordocument',
+            name='token_count',
+            field=models.IntegerField(default=0, help_text='Number of tokens in the content'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_agent', '0010_vectordocument_token_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ragquery',
+            name='context_tokens',
+            field=models.IntegerField(default=0, help_text='Tokens of retrieved context packed into the prompt'),
+        ),
+        migrations.AddField(
+            model_name='ragquery',
+            name='prompt_tokens',
+            field=models.IntegerField(default=0, help_text='Total prompt tokens sent to the LLM'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_agent', '0011_ragquery_token_usage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ragquery',
+            name='time_to_first_token',
+            field=models.FloatField(blank=True, help_text='Time until the first streamed token was sent (seconds)', null=True),
+        ),
+    ]
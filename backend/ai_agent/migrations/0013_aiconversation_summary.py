@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_agent', '0012_ragquery_time_to_first_token'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aiconversation',
+            name='summarized_count',
+            field=models.IntegerField(default=0, help_text='Number of leading messages folded into the summary'),
+        ),
+        migrations.AddField(
+            model_name='aiconversation',
+            name='summary',
+            field=models.TextField(blank=True, help_text='Running summary of the older messages'),
+        ),
+    ]
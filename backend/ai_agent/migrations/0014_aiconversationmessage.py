@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_agent', '0013_aiconversation_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AIConversationMessage',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('role', models.CharField(choices=[('user', 'User'), ('assistant', 'Assistant'), ('system', 'System')], max_length=20)),
+                ('content', models.TextField()),
+                ('metadata', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='turns', to='ai_agent.aiconversation')),
+            ],
+            options={
+                'verbose_name': 'AI Conversation Message',
+                'verbose_name_plural': 'AI Conversation Messages',
+                'ordering': ['created_at', 'id'],
+                'indexes': [models.Index(fields=['conversation', 'created_at'], name='ai_agent_ai_convers_4c59cd_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,62 @@
+from django.db import migrations
+from django.utils.dateparse import parse_datetime
+
+
+def split_message_blobs(apps, schema_editor):
+    """Copy each conversation's JSON message list into AIConversationMessage rows"""
+    AIConversation = apps.get_model('ai_agent', 'AIConversation')
+    AIConversationMessage = apps.get_model('ai_agent', 'AIConversationMessage')
+
+    batch = []
+    conversations = AIConversation.objects.only('id', 'messages', 'last_message_at')
+    for conversation in conversations.iterator(chunk_size=200):
+        messages = conversation.messages or []
+        for message in messages:
+            created_at = parse_datetime(message.get('timestamp') or '') or conversation.last_message_at
+            batch.append(AIConversationMessage(
+                conversation_id=conversation.id,
+                role=message.get('role', 'user'),
+                content=message.get('content', ''),
+                metadata=message.get('metadata') or {},
+                created_at=created_at
+            ))
+        AIConversation.objects.filter(id=conversation.id).update(message_count=len(messages))
+
+        if len(batch) >= 500:
+            AIConversationMessage.objects.bulk_create(batch)
+            batch = []
+
+    if batch:
+        AIConversationMessage.objects.bulk_create(batch)
+
+
+def join_message_rows(apps, schema_editor):
+    """Rebuild the JSON message lists from the rows"""
+    AIConversation = apps.get_model('ai_agent', 'AIConversation')
+    AIConversationMessage = apps.get_model('ai_agent', 'AIConversationMessage')
+
+    for conversation in AIConversation.objects.only('id').iterator(chunk_size=200):
+        rows = AIConversationMessage.objects.filter(conversation_id=conversation.id).order_by('created_at', 'id')
+        conversation.messages = [
+            {
+                'role': row.role,
+                'content': row.content,
+                'timestamp': row.created_at.isoformat(),
+                'metadata': row.metadata
+            }
+            for row in rows
+        ]
+        conversation.save(update_fields=['messages'])
+
+    AIConversationMessage.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_agent', '0014_aiconversationmessage'),
+    ]
+
+    operations = [
+        migrations.RunPython(split_message_blobs, join_message_rows),
+    ]
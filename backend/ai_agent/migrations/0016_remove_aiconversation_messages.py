@@ -0,0 +1,15 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_agent', '0015_move_conversation_messages'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='aiconversation',
+            name='messages',
+        ),
+    ]
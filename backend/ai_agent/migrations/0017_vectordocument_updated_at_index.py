@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_agent', '0016_remove_aiconversation_messages'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='vectordocument',
+            index=models.Index(fields=['updated_at'], name='ai_agent_ve_updated_7db48f_idx'),
+        ),
+    ]
@@ -1,9 +1,34 @@
 from django.db import models
+from django.db.models import F
 from django.contrib.auth.models import User
+from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
+import hashlib
+import numpy as np
 import uuid
 
 
+EMBEDDING_DTYPES = [
+    ('float32', 'Float32'),
+    ('float16', 'Float16'),
+]
+
+
+def pack_embedding(embedding, dtype: str = 'float32') -> bytes:
+    """Pack an embedding into little-endian float bytes"""
+    return np.asarray(embedding, dtype=np.dtype(dtype).newbyteorder('<')).tobytes()
+
+
+def unpack_embedding(data, dtype: str = 'float32') -> np.ndarray:
+    """Read packed embedding bytes without copying them"""
+    return np.frombuffer(data, dtype=np.dtype(dtype).newbyteorder('<'))
+
+
+def compute_content_hash(content: str, embedding_model: str) -> str:
+    """Hash a chunk together with the model that embeds it"""
+    return hashlib.sha256(f"{embedding_model}\n{content}".encode('utf-8')).hexdigest()
+
+
 class AIAgent(models.Model):
     """
     AI Agent configuration for different purposes
@@ -73,10 +98,11 @@ class AIConversation(models.Model):
         help_text="Additional context data for the conversation"
     )
 
-    # Message History
-    messages = models.JSONField(
-        default=list,
-        help_text="List of messages in the conversation"
+    # Running summary of turns that no longer fit in the prompt
+    summary = models.TextField(blank=True, help_text="Running summary of the older messages")
+    summarized_count = models.IntegerField(
+        default=0,
+        help_text="Number of leading messages folded into the summary"
     )
 
     # Metadata
@@ -93,17 +119,77 @@ class AIConversation(models.Model):
     def __str__(self):
         return f"Conversation with {self.agent.name} - {self.session_id}"
 
+    @property
+    def messages(self) -> list:
+        """Full history as message dicts (uses prefetched turns when available)"""
+        return [turn.as_dict() for turn in self.turns.all()]
+
+    def recent_messages(self, limit: int) -> list:
+        """The last `limit` messages, oldest first, read with a LIMIT query"""
+        if limit <= 0:
+            return []
+        turns = list(self.turns.order_by('-created_at', '-id')[:limit])
+        return [turn.as_dict() for turn in reversed(turns)]
+
     def add_message(self, role: str, content: str, metadata: dict = None):
-        """Add a message to the conversation"""
-        message = {
-            'role': role,
-            'content': content,
-            'timestamp': self.last_message_at.isoformat(),
-            'metadata': metadata or {}
-        }
-        self.messages.append(message)
+        """Add a message to the conversation with one INSERT and an in-place counter update"""
+        turn = self.turns.create(role=role, content=content, metadata=metadata or {})
+        AIConversation.objects.filter(pk=self.pk).update(
+            message_count=F('message_count') + 1,
+            last_message_at=turn.created_at
+        )
         self.message_count += 1
-        self.save(update_fields=['messages', 'message_count', 'last_message_at'])
+        self.last_message_at = turn.created_at
+        getattr(self, '_prefetched_objects_cache', {}).pop('turns', None)
+        return turn
+
+    def clear_messages(self):
+        """Delete the history and its summary"""
+        self.turns.all().delete()
+        self.message_count = 0
+        self.summary = ''
+        self.summarized_count = 0
+        self.save(update_fields=['message_count', 'summary', 'summarized_count', 'last_message_at'])
+
+
+class AIConversationMessage(models.Model):
+    """
+    A single message in an AIConversation
+    """
+    # Sequential key: keeps messages with equal timestamps in insertion order
+    id = models.BigAutoField(primary_key=True)
+    conversation = models.ForeignKey(AIConversation, on_delete=models.CASCADE, related_name='turns')
+    role = models.CharField(
+        max_length=20,
+        choices=[
+            ('user', 'User'),
+            ('assistant', 'Assistant'),
+            ('system', 'System'),
+        ]
+    )
+    content = models.TextField()
+    metadata = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['created_at', 'id']
+        indexes = [
+            models.Index(fields=['conversation', 'created_at']),
+        ]
+        verbose_name = 'AI Conversation Message'
+        verbose_name_plural = 'AI Conversation Messages'
+
+    def __str__(self):
+        return f"{self.role}: {self.content[:50]}"
+
+    def as_dict(self) -> dict:
+        """The message in the shape the JSON history used"""
+        return {
+            'role': self.role,
+            'content': self.content,
+            'timestamp': self.created_at.isoformat(),
+            'metadata': self.metadata
+        }
 
 
 class AIMessageTemplate(models.Model):
@@ -372,15 +458,35 @@ class VectorDocument(models.Model):
 
     # Vector Embeddings
     embedding = models.JSONField(
-        help_text="Vector embedding for similarity search",
+        help_text="Legacy JSON vector embedding (superseded by embedding_vector)",
         null=True,
         blank=True
     )
+    embedding_vector = models.BinaryField(
+        null=True,
+        blank=True,
+        help_text="Packed embedding bytes for similarity search"
+    )
+    embedding_dimension = models.IntegerField(
+        default=0,
+        help_text="Number of components in the packed embedding"
+    )
+    embedding_dtype = models.CharField(
+        max_length=10,
+        choices=EMBEDDING_DTYPES,
+        default='float32',
+        help_text="Storage precision of the packed embedding"
+    )
     embedding_model = models.CharField(
         max_length=100,
         default='text-embedding-ada-002',
         help_text="Model used to generate the embedding"
     )
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        help_text="SHA-256 of the content and embedding model, used to skip re-embedding"
+    )
 
     # Metadata
     metadata = models.JSONField(
@@ -395,6 +501,10 @@ class VectorDocument(models.Model):
         default=1,
         help_text="Total number of chunks for this source document"
     )
+    token_count = models.IntegerField(
+        default=0,
+        help_text="Number of tokens in the content"
+    )
 
     # Status
     is_active = models.BooleanField(default=True, help_text="Whether this document is active for search")
@@ -406,6 +516,7 @@ class VectorDocument(models.Model):
         indexes = [
             models.Index(fields=['source_type', 'source_id']),
             models.Index(fields=['is_active', 'source_type']),
+            models.Index(fields=['updated_at']),
         ]
         verbose_name = 'Vector Document'
         verbose_name_plural = 'Vector Documents'
@@ -413,6 +524,21 @@ class VectorDocument(models.Model):
     def __str__(self):
         return f"{self.title} ({self.source_type})"
 
+    def set_embedding(self, embedding, dtype: str = 'float32'):
+        """Store an embedding in the packed binary format"""
+        self.embedding_vector = pack_embedding(embedding, dtype)
+        self.embedding_dimension = len(embedding)
+        self.embedding_dtype = dtype
+        self.embedding = None
+
+    def get_embedding(self):
+        """Return the embedding as a numpy array (None if not set)"""
+        if self.embedding_vector:
+            return unpack_embedding(self.embedding_vector, self.embedding_dtype)
+        if self.embedding:
+            return np.asarray(self.embedding, dtype=np.float32)
+        return None
+
 
 class RAGQuery(models.Model):
     """
@@ -436,6 +562,14 @@ class RAGQuery(models.Model):
         blank=True,
         help_text="Context provided to the LLM"
     )
+    context_tokens = models.IntegerField(
+        default=0,
+        help_text="Tokens of retrieved context packed into the prompt"
+    )
+    prompt_tokens = models.IntegerField(
+        default=0,
+        help_text="Total prompt tokens sent to the LLM"
+    )
 
     # Response
     response = models.TextField(help_text="AI-generated response")
@@ -448,8 +582,22 @@ class RAGQuery(models.Model):
 
     # Performance
     search_time = models.FloatField(help_text="Time taken for vector search (seconds)")
+    search_timings = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Per-stage retrieval latencies (seconds)"
+    )
     generation_time = models.FloatField(help_text="Time taken for response generation (seconds)")
+    time_to_first_token = models.FloatField(
+        null=True,
+        blank=True,
+        help_text="Time until the first streamed token was sent (seconds)"
+    )
     total_time = models.FloatField(help_text="Total processing time (seconds)")
+    cache_hit = models.BooleanField(
+        default=False,
+        help_text="Whether the response was reused from a semantically similar query"
+    )
 
     # Feedback
     user_rating = models.IntegerField(
@@ -0,0 +1,148 @@
+import logging
+import threading
+import time
+from typing import Dict, Any, Optional, List
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def document_signature(documents: List[Dict[str, Any]]) -> frozenset:
+    """Identify a retrieved document set by id and last update time"""
+    return frozenset((str(doc['id']), str(doc.get('updated_at'))) for doc in documents)
+
+
+class SemanticResponseCache:
+    """
+    Cache of RAG answers keyed by query embedding.
+
+    A cached answer is reused when a new query's embedding is within the
+    cosine threshold of a cached query AND retrieval returned exactly the
+    same documents, unchanged since the answer was generated. Because the
+    signature includes each document's ``updated_at``, re-indexing a trip
+    invalidates every answer that was built from it.
+    """
+
+    def __init__(
+        self,
+        max_size: Optional[int] = None,
+        ttl: Optional[float] = None,
+        threshold: Optional[float] = None,
+        enabled: Optional[bool] = None
+    ):
+        self.max_size = max_size if max_size is not None else getattr(settings, 'RAG_RESPONSE_CACHE_SIZE', 512)
+        self.ttl = ttl if ttl is not None else getattr(settings, 'RAG_RESPONSE_CACHE_TTL', 3600)
+        self.threshold = threshold if threshold is not None else getattr(settings, 'RAG_RESPONSE_CACHE_THRESHOLD', 0.95)
+        self.enabled = enabled if enabled is not None else getattr(settings, 'RAG_RESPONSE_CACHE_ENABLED', True)
+
+        self._lock = threading.Lock()
+        self._embeddings = np.zeros((0, 0), dtype=np.float32)
+        self._entries: List[Dict[str, Any]] = []
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _normalise(self, embedding) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def lookup(self, query_embedding, documents: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Return the cached entry for a near-identical query over the same documents"""
+        if not self.enabled:
+            return None
+
+        query = self._normalise(query_embedding)
+        signature = document_signature(documents)
+
+        with self._lock:
+            self._evict_expired()
+            if query is None or not self._entries or query.shape[0] != self._embeddings.shape[1]:
+                self.misses += 1
+                return None
+
+            scores = self._embeddings @ query
+            for i in np.argsort(-scores):
+                if scores[i] < self.threshold:
+                    break
+                entry = self._entries[i]
+                if entry['signature'] == signature:
+                    entry['hits'] += 1
+                    self.hits += 1
+                    return dict(entry, similarity=float(scores[i]))
+
+            self.misses += 1
+            return None
+
+    def store(self, query_embedding, documents: List[Dict[str, Any]], response: str, query_id: str):
+        """Remember the answer generated for a query and its retrieved documents"""
+        if not self.enabled:
+            return
+
+        query = self._normalise(query_embedding)
+        if query is None:
+            return
+
+        entry = {
+            'query_id': query_id,
+            'response': response,
+            'signature': document_signature(documents),
+            'expires_at': time.time() + self.ttl,
+            'hits': 0,
+        }
+
+        with self._lock:
+            if self._entries and query.shape[0] != self._embeddings.shape[1]:
+                # Embedding model changed; old entries can no longer be compared
+                self._reset()
+
+            entries = self._entries + [entry]
+            rows = [self._embeddings, query[np.newaxis, :]] if self._entries else [query[np.newaxis, :]]
+            embeddings = np.vstack(rows)
+
+            if len(entries) > self.max_size:
+                # Entries are kept in insertion order, so the oldest go first
+                entries = entries[-self.max_size:]
+                embeddings = embeddings[-self.max_size:]
+
+            self._entries = entries
+            self._embeddings = embeddings
+
+    def _evict_expired(self):
+        now = time.time()
+        keep = [i for i, entry in enumerate(self._entries) if entry['expires_at'] > now]
+        if len(keep) != len(self._entries):
+            self._entries = [self._entries[i] for i in keep]
+            self._embeddings = self._embeddings[keep]
+
+    def _reset(self):
+        self._entries = []
+        self._embeddings = np.zeros((0, 0), dtype=np.float32)
+
+    def clear(self):
+        """Drop every cached answer"""
+        with self._lock:
+            self._reset()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'threshold': self.threshold,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+
+# Global instance
+response_cache = SemanticResponseCache()
@@ -0,0 +1,117 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List, Callable
+
+from django.conf import settings
+
+from .lexical_index import lexical_index
+from .vector_index import vector_index
+
+logger = logging.getLogger(__name__)
+
+# Shared by all requests; vector search (including the query embedding call)
+# runs here while the lexical search runs on the calling thread
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'RAG_RETRIEVAL_WORKERS', 4),
+    thread_name_prefix='rag-retrieval'
+)
+
+
+def reciprocal_rank_fusion(
+    result_lists: Dict[str, List[Dict[str, Any]]],
+    top_k: int,
+    k: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Merge ranked result lists with reciprocal rank fusion.
+
+    Each document scores sum(1 / (k + rank)) over the lists it appears in,
+    so agreement between retrievers outweighs a high rank in only one.
+    Scores from different retrievers are not comparable, so fused
+    documents carry the RRF score plus each retriever's own rank and
+    score under separate keys (e.g. vector_rank and vector_score, the
+    cosine similarity; lexical_score is the raw BM25 score) instead of a
+    single 'similarity'.
+    """
+    k = k if k is not None else getattr(settings, 'RAG_RRF_K', 60)
+    fused: Dict[str, Dict[str, Any]] = {}
+
+    for name, results in result_lists.items():
+        for rank, document in enumerate(results, start=1):
+            doc_id = str(document['id'])
+            entry = fused.get(doc_id)
+            if entry is None:
+                entry = fused[doc_id] = {
+                    key: value for key, value in document.items() if key not in ('score', 'similarity')
+                }
+                entry.update(rrf_score=0.0, retrievers=[])
+            entry['rrf_score'] += 1.0 / (k + rank)
+            entry['retrievers'].append(name)
+            entry[f"{name}_rank"] = rank
+            entry[f"{name}_score"] = document.get('score', document.get('similarity'))
+
+    return sorted(fused.values(), key=lambda doc: doc['rrf_score'], reverse=True)[:top_k]
+
+
+def hybrid_search(
+    query: str,
+    top_k: int = 5,
+    embed_query: Optional[Callable[[str], List[float]]] = None,
+    query_embedding: Optional[List[float]] = None,
+    filters: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Run vector and BM25 retrieval concurrently and fuse their rankings.
+
+    Returns the fused documents, the query embedding (when one was computed)
+    and per-stage timings in seconds.
+    """
+    start_time = time.time()
+    timings = {}
+    candidate_k = top_k * getattr(settings, 'RAG_HYBRID_CANDIDATE_MULTIPLIER', 3)
+    use_vector = embed_query is not None or query_embedding is not None
+
+    # Sync both indexes on this thread so the workers never touch the database
+    stage_start = time.time()
+    if use_vector:
+        vector_index.refresh()
+    lexical_index.refresh()
+    timings['sync'] = time.time() - stage_start
+
+    def vector_search():
+        embedding = query_embedding
+        stage_start = time.time()
+        if embedding is None:
+            embedding = embed_query(query)
+        embed_time = time.time() - stage_start
+
+        stage_start = time.time()
+        results = vector_index.search(embedding, top_k=candidate_k, filters=filters, sync=False)
+        return embedding, results, embed_time, time.time() - stage_start
+
+    future = _executor.submit(vector_search) if use_vector else None
+
+    stage_start = time.time()
+    lexical_results = lexical_index.search(query, top_k=candidate_k, filters=filters, sync=False)
+    timings['lexical'] = time.time() - stage_start
+
+    result_lists = {}
+    if future is not None:
+        try:
+            query_embedding, vector_results, timings['embed'], timings['vector'] = future.result()
+            result_lists['vector'] = vector_results
+        except Exception as e:
+            logger.warning(f"Vector retrieval failed, using lexical results only: {str(e)}")
+    result_lists['lexical'] = lexical_results
+
+    stage_start = time.time()
+    documents = reciprocal_rank_fusion(result_lists, top_k)
+    timings['fusion'] = time.time() - stage_start
+    timings['total'] = time.time() - start_time
+
+    return {
+        'documents': documents,
+        'query_embedding': query_embedding,
+        'timings': timings
+    }
@@ -49,17 +49,18 @@ class AIConversationSerializer(serializers.ModelSerializer):
 
     agent_name = serializers.CharField(source='agent.name', read_only=True)
     user_name = serializers.CharField(source='user.get_full_name', read_only=True)
+    messages = serializers.ReadOnlyField()
     last_message_preview = serializers.SerializerMethodField()
 
     class Meta:
         model = AIConversation
         fields = [
             'id', 'agent', 'agent_name', 'user', 'user_name',
-            'session_id', 'context_data', 'messages',
-            'message_count', 'last_message_at', 'created_at',
+            'session_id', 'context_data', 'messages', 'summary',
+            'summarized_count', 'message_count', 'last_message_at', 'created_at',
             'last_message_preview'
         ]
-        read_only_fields = ['id', 'created_at', 'last_message_at']
+        read_only_fields = ['id', 'summary', 'summarized_count', 'created_at', 'last_message_at']
 
     def get_last_message_preview(self, obj):
         """Get preview of the last message"""
@@ -339,8 +340,8 @@ class VectorDocumentSerializer(serializers.ModelSerializer):
         model = VectorDocument
         fields = [
             'id', 'content', 'title', 'source_type', 'source_id',
-            'source_url', 'embedding_model', 'metadata',
-            'chunk_index', 'total_chunks', 'is_active',
+            'source_url', 'embedding_model', 'embedding_dimension',
+            'embedding_dtype', 'metadata', 'chunk_index', 'total_chunks', 'token_count', 'is_active',
             'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
@@ -355,20 +356,45 @@ class RAGQuerySerializer(serializers.ModelSerializer):
         model = RAGQuery
         fields = [
             'id', 'query', 'rewritten_query', 'retrieved_documents',
-            'context_used', 'response', 'response_quality',
-            'search_time', 'generation_time', 'total_time',
+            'context_used', 'context_tokens', 'prompt_tokens', 'response', 'response_quality',
+            'search_time', 'search_timings', 'generation_time', 'time_to_first_token', 'total_time', 'cache_hit',
             'user_rating', 'user_feedback', 'session_id',
             'user', 'user_name', 'created_at'
         ]
         read_only_fields = ['id', 'created_at']
 
 
+class RAGSearchFiltersSerializer(serializers.Serializer):
+    """Serializer for structured RAG search filters"""
+
+    source_type = serializers.ListField(
+        child=serializers.ChoiceField(choices=VectorDocument._meta.get_field('source_type').choices),
+        required=False
+    )
+    min_price = serializers.FloatField(required=False, min_value=0)
+    max_price = serializers.FloatField(required=False, min_value=0)
+    difficulty = serializers.ListField(child=serializers.CharField(max_length=20), required=False)
+    min_duration = serializers.IntegerField(required=False, min_value=0)
+    max_duration = serializers.IntegerField(required=False, min_value=0)
+    tags = serializers.ListField(child=serializers.CharField(max_length=50), required=False)
+
+    def validate(self, data):
+        if data.get('min_price') is not None and data.get('max_price') is not None \
+                and data['min_price'] > data['max_price']:
+            raise serializers.ValidationError("min_price cannot be greater than max_price")
+        if data.get('min_duration') is not None and data.get('max_duration') is not None \
+                and data['min_duration'] > data['max_duration']:
+            raise serializers.ValidationError("min_duration cannot be greater than max_duration")
+        return data
+
+
 class RAGQueryRequestSerializer(serializers.Serializer):
     """Serializer for RAG query requests"""
 
     query = serializers.CharField(required=True, max_length=1000)
     session_id = serializers.CharField(required=False, max_length=100)
     top_k = serializers.IntegerField(required=False, default=5, min_value=1, max_value=20)
+    filters = RAGSearchFiltersSerializer(required=False)
 
     def validate_query(self, value):
         if not value.strip():
@@ -382,7 +408,10 @@ class RAGQueryResponseSerializer(serializers.Serializer):
     response = serializers.CharField()
     query_id = serializers.CharField()
     context_documents = serializers.IntegerField()
+    context_tokens = serializers.IntegerField(required=False)
+    prompt_tokens = serializers.IntegerField(required=False)
     generation_time = serializers.FloatField()
+    cached = serializers.BooleanField(required=False, default=False)
 
 
 class VectorStorePopulateSerializer(serializers.Serializer):
@@ -392,6 +421,17 @@ class VectorStorePopulateSerializer(serializers.Serializer):
         choices=['trip', 'all'],
         default='all'
     )
+    embedding_batch_size = serializers.IntegerField(
+        required=False,
+        min_value=1,
+        max_value=2048,
+        help_text="Number of chunks sent per embedding request"
+    )
+    force = serializers.BooleanField(
+        required=False,
+        default=False,
+        help_text="Re-embed every chunk even if its content hash is unchanged"
+    )
 
 
 class VectorStorePopulateResponseSerializer(serializers.Serializer):
@@ -400,4 +440,8 @@ class VectorStorePopulateResponseSerializer(serializers.Serializer):
     total_items = serializers.IntegerField()
     success_count = serializers.IntegerField()
     error_count = serializers.IntegerField()
+    skipped_count = serializers.IntegerField(required=False)
+    chunk_count = serializers.IntegerField(required=False)
+    deactivated_count = serializers.IntegerField(required=False)
+    timings = serializers.DictField(child=serializers.FloatField(), required=False)
     message = serializers.CharField()
\ No newline at end of file
@@ -2,27 +2,58 @@ import os
 import logging
 import time
 import uuid
-import numpy as np
-from typing import Dict, Any, Optional, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List, Iterator, Tuple
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 from django.shortcuts import get_object_or_404
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from langchain_openai import OpenAIEmbeddings
 from langchain_core.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
-from sklearn.metrics.pairwise import cosine_similarity
+from langchain_core.messages import HumanMessage, SystemMessage
 import json
 
 from .models import (
     AIAgent, AIConversation, AIMessageTemplate, AISentimentAnalysis,
-    AIContentGeneration, AIProcessingLog, VectorDocument, RAGQuery
+    AIContentGeneration, AIProcessingLog, VectorDocument, RAGQuery,
+    compute_content_hash
 )
+from .vector_index import vector_index
+from .lexical_index import lexical_index
+from .retrieval import hybrid_search
+from .chunking import chunk_text, count_tokens
+from .context_packer import pack_context
+from .embedding_cache import CachedEmbeddings
+from .response_cache import response_cache
+from .conversation_memory import ConversationMemory
+from .llm_clients import llm_clients, DEFAULT_MODEL
+from .bulk_sentiment import batch_messages, build_batch_prompt, output_token_budget, parse_batch_response
 
 logger = logging.getLogger(__name__)
 
 logger = logging.getLogger(__name__)
 
+# Per-document retrieval scores kept on RAGQuery.retrieved_documents. Fused
+# results have rrf_score and per-retriever ranks and scores; single-retriever
+# results have their retriever's similarity.
+RETRIEVAL_SCORE_KEYS = (
+    'similarity', 'rrf_score', 'vector_rank', 'vector_score', 'lexical_rank', 'lexical_score'
+)
+
+
+def retrieval_summary(document: Dict[str, Any]) -> Dict[str, Any]:
+    """A retrieved document's id, title and retrieval scores, for logging"""
+    summary = {'id': str(document['id']), 'title': document['title']}
+    summary.update((key, document[key]) for key in RETRIEVAL_SCORE_KEYS if key in document)
+    return summary
+
+
+# embedding_model recorded for chunks stored with the hash fallback vector,
+# so the next incremental index re-embeds them
+FALLBACK_EMBEDDING_MODEL = 'fallback-hash'
+
 
 class AIService:
     """
@@ -36,27 +67,6 @@ class AIService:
         if not self.api_key:
             logger.warning("OpenRouter API key not found. AI features will not work.")
 
-        # Initialize the language model
-        self.llm = self._initialize_llm()
-
-    def _initialize_llm(self, model_name: str = "xai/grok-beta", temperature: float = 0.7):
-        """Initialize the language model"""
-        if not self.api_key:
-            return None
-
-        try:
-            llm = ChatOpenAI(
-                model=model_name,
-                temperature=temperature,
-                api_key=self.api_key,
-                base_url=self.base_url,
-                max_tokens=2000,
-            )
-            return llm
-        except Exception as e:
-            logger.error(f"Failed to initialize LLM: {str(e)}")
-            return None
-
     def _log_processing(
         self,
         agent: Optional[AIAgent],
@@ -102,87 +112,66 @@ class AIService:
         start_time = time.time()
 
         try:
-            # Get or create agent
-            if agent_id:
-                agent = get_object_or_404(AIAgent, id=agent_id, is_active=True)
-            elif not agent:
-                # Use default chatbot agent or create one
-                agent = self._get_or_create_default_agent()
-
-            # Get or create conversation
-            if session_id:
-                conversation, created = AIConversation.objects.get_or_create(
-                    agent=agent,
-                    user=user,
-                    session_id=session_id,
-                    defaults={'context_data': context_data or {}}
-                )
-            else:
-                session_id = str(uuid.uuid4())
-                conversation = AIConversation.objects.create(
-                    agent=agent,
-                    user=user,
-                    session_id=session_id,
-                    context_data=context_data or {}
-                )
-
-            # Prepare messages for LangChain
-            messages = [SystemMessage(content=agent.system_prompt)]
-
-            # Add conversation history
-            for msg in conversation.messages[-10:]:  # Last 10 messages for context
-                if msg['role'] == 'user':
-                    messages.append(HumanMessage(content=msg['content']))
-                elif msg['role'] == 'assistant':
-                    messages.append(AIMessage(content=msg['content']))
-
-            # Add current message
-            messages.append(HumanMessage(content=message))
-
-            # Get response from AI
-            if not self.llm:
-                raise Exception("AI service not available - API key not configured")
-
-            # Update LLM with agent settings
-            self.llm.model_name = agent.model_name
-            self.llm.temperature = agent.temperature
-            self.llm.max_tokens = agent.max_tokens
+            agent, llm, conversation, session_id, messages = self._prepare_chat(
+                agent, agent_id, message, session_id, context_data, user
+            )
 
-            response = self.llm.invoke(messages)
+            response = llm.invoke(messages)
             ai_response = response.content
 
-            # Add messages to conversation
-            conversation.add_message('user', message)
-            conversation.add_message('assistant', ai_response)
+            return self._finalize_chat(
+                agent, conversation, session_id, message, ai_response, time.time() - start_time, user
+            )
 
+        except Exception as e:
             processing_time = time.time() - start_time
+            error_msg = str(e)
 
-            # Log processing
             self._log_processing(
                 agent=agent,
                 operation_type='chatbot_response',
                 input_data={'message': message, 'session_id': session_id},
-                output_data={'response': ai_response},
                 processing_time=processing_time,
+                status='error',
+                error_message=error_msg,
                 user=user
             )
 
-            return {
-                'response': ai_response,
-                'session_id': session_id,
-                'message_count': conversation.message_count,
-                'processing_time': processing_time
-            }
+            raise Exception(f"AI chat failed: {error_msg}")
+
+    async def achat_with_agent(
+        self,
+        agent: Optional[AIAgent] = None,
+        agent_id: Optional[str] = None,
+        message: str = "",
+        session_id: Optional[str] = None,
+        context_data: Dict[str, Any] = None,
+        user=None
+    ) -> Dict[str, Any]:
+        """
+        Async counterpart of chat_with_agent; the LLM call does not block a worker thread
+        """
+        start_time = time.time()
+
+        try:
+            agent, llm, conversation, session_id, messages = await sync_to_async(self._prepare_chat)(
+                agent, agent_id, message, session_id, context_data, user
+            )
+
+            response = await llm.ainvoke(messages)
+
+            return await sync_to_async(self._finalize_chat)(
+                agent, conversation, session_id, message, response.content, time.time() - start_time, user
+            )
 
         except Exception as e:
-            processing_time = time.time() - start_time
             error_msg = str(e)
 
-            self._log_processing(
+            await sync_to_async(self._log_processing)(
                 agent=agent,
                 operation_type='chatbot_response',
                 input_data={'message': message, 'session_id': session_id},
-                processing_time=processing_time,
+                processing_time=time.time() - start_time,
                 status='error',
                 error_message=error_msg,
                 user=user
@@ -190,6 +179,152 @@ class AIService:
 
             raise Exception(f"AI chat failed: {error_msg}")
 
+    def stream_chat_with_agent(
+        self,
+        agent: Optional[AIAgent] = None,
+        agent_id: Optional[str] = None,
+        message: str = "",
+        session_id: Optional[str] = None,
+        context_data: Dict[str, Any] = None,
+        user=None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Chat with an AI agent, yielding response tokens as they arrive.
+
+        Yields a 'start' event, one 'token' event per streamed chunk and a
+        final 'done' event once the conversation has been saved, or an
+        'error' event if anything fails.
+        """
+        start_time = time.time()
+        first_token_time = None
+        chunks = []
+
+        try:
+            agent, llm, conversation, session_id, messages = self._prepare_chat(
+                agent, agent_id, message, session_id, context_data, user
+            )
+            yield {'event': 'start', 'session_id': session_id}
+
+            for chunk in llm.stream(messages):
+                if not chunk.content:
+                    continue
+                if first_token_time is None:
+                    first_token_time = time.time() - start_time
+                chunks.append(chunk.content)
+                yield {'event': 'token', 'content': chunk.content}
+
+            # Persist only once the whole completion has been received
+            result = self._finalize_chat(
+                agent, conversation, session_id, message, ''.join(chunks), time.time() - start_time, user,
+                time_to_first_token=first_token_time
+            )
+            yield dict(result, event='done', time_to_first_token=first_token_time)
+
+        except Exception as e:
+            error_msg = str(e)
+            self._log_processing(
+                agent=agent,
+                operation_type='chatbot_response',
+                input_data={'message': message, 'session_id': session_id, 'stream': True},
+                processing_time=time.time() - start_time,
+                status='error',
+                error_message=error_msg,
+                user=user
+            )
+            yield {'event': 'error', 'error': f"AI chat failed: {error_msg}"}
+
+    def _prepare_chat(
+        self,
+        agent: Optional[AIAgent],
+        agent_id: Optional[str],
+        message: str,
+        session_id: Optional[str],
+        context_data: Optional[Dict[str, Any]],
+        user
+    ):
+        """Resolve the agent, its LLM client and the conversation, and build the LangChain messages"""
+        # Get or create agent
+        if agent_id:
+            agent = get_object_or_404(AIAgent, id=agent_id, is_active=True)
+        elif not agent:
+            # Use default chatbot agent or create one
+            agent = self._get_or_create_default_agent()
+
+        # Get or create conversation
+        if session_id:
+            conversation, created = AIConversation.objects.get_or_create(
+                agent=agent,
+                user=user,
+                session_id=session_id,
+                defaults={'context_data': context_data or {}}
+            )
+        else:
+            session_id = str(uuid.uuid4())
+            conversation = AIConversation.objects.create(
+                agent=agent,
+                user=user,
+                session_id=session_id,
+                context_data=context_data or {}
+            )
+
+        # Prepare messages for LangChain
+        messages = [SystemMessage(content=agent.system_prompt)]
+
+        # Add conversation history: running summary plus recent turns within the token budget
+        messages.extend(ConversationMemory().build_messages(conversation))
+
+        # Add current message
+        messages.append(HumanMessage(content=message))
+
+        # Shared client with the agent's settings
+        llm = llm_clients.get(agent.model_name, agent.temperature, agent.max_tokens)
+        if not llm:
+            raise Exception("AI service not available - API key not configured")
+
+        return agent, llm, conversation, session_id, messages
+
+    def _finalize_chat(
+        self,
+        agent: AIAgent,
+        conversation: AIConversation,
+        session_id: str,
+        message: str,
+        ai_response: str,
+        processing_time: float,
+        user=None,
+        time_to_first_token: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Save the exchange to the conversation and log it"""
+        # Add messages to conversation
+        conversation.add_message('user', message)
+        conversation.add_message('assistant', ai_response)
+
+        if ConversationMemory().needs_summary(conversation):
+            # Summarise off the request path; the next turn picks up the new summary
+            from .tasks import summarize_conversation_task
+            summarize_conversation_task.delay(conversation.id)
+
+        input_data = {'message': message, 'session_id': session_id}
+        if time_to_first_token is not None:
+            input_data.update(stream=True, time_to_first_token=time_to_first_token)
+
+        # Log processing
+        self._log_processing(
+            agent=agent,
+            operation_type='chatbot_response',
+            input_data=input_data,
+            output_data={'response': ai_response},
+            processing_time=processing_time,
+            user=user
+        )
+
+        return {
+            'response': ai_response,
+            'session_id': session_id,
+            'message_count': conversation.message_count,
+            'processing_time': processing_time
+        }
+
     def _get_or_create_default_agent(self) -> AIAgent:
         """Get or create a default chatbot agent"""
         agent, created = AIAgent.objects.get_or_create(
@@ -246,14 +381,11 @@ class AIService:
                 HumanMessage(content=prompt)
             ]
 
-            if not self.llm:
+            llm = llm_clients.get(agent.model_name, agent.temperature, min(agent.max_tokens, 1500))
+            if not llm:
                 raise Exception("AI service not available")
 
-            self.llm.model_name = agent.model_name
-            self.llm.temperature = agent.temperature
-            self.llm.max_tokens = min(agent.max_tokens, 1500)
-
-            response = self.llm.invoke(messages)
+            response = llm.invoke(messages)
             ai_response = response.content
 
             # Parse the response to extract redrafted message and improvements
@@ -388,13 +520,12 @@ class AIService:
                 HumanMessage(content=prompt)
             ]
 
-            if not self.llm:
+            # Very low temperature for consistent analysis
+            llm = llm_clients.get(agent.model_name, 0.1, agent.max_tokens)
+            if not llm:
                 raise Exception("AI service not available")
 
-            self.llm.model_name = agent.model_name
-            self.llm.temperature = 0.1  # Very low temperature for consistent analysis
-
-            response = self.llm.invoke(messages)
+            response = llm.invoke(messages)
             ai_response = response.content
 
             # Parse the response
@@ -559,14 +690,12 @@ class AIService:
                 HumanMessage(content=full_prompt)
             ]
 
-            if not self.llm:
+            # Rough token estimate
+            llm = llm_clients.get(agent.model_name, agent.temperature, min(agent.max_tokens, max_length // 4))
+            if not llm:
                 raise Exception("AI service not available")
 
-            self.llm.model_name = agent.model_name
-            self.llm.temperature = agent.temperature
-            self.llm.max_tokens = min(agent.max_tokens, max_length // 4)  # Rough token estimate
-
-            response = self.llm.invoke(messages)
+            response = llm.invoke(messages)
             generated_content = response.content
 
             # Save to database
@@ -647,34 +776,147 @@ class AIService:
         user=None
     ) -> List[Dict[str, Any]]:
         """
-        Analyze sentiment for multiple messages
+        Analyze sentiment for multiple messages.
+
+        Messages are packed into batched JSON prompts that run concurrently,
+        at most AI_SENTIMENT_CONCURRENCY at a time. Messages a reply leaves
+        out are retried once in a new batch. Analyses and one processing log
+        per batch are written with bulk_create; results keep the input order.
         """
-        results = []
+        if not messages:
+            return []
 
-        for message_data in messages:
-            try:
-                message_content = message_data.get('content', '')
-                message_id = message_data.get('id')
-
-                analysis = self.analyze_sentiment(
-                    message=message_content,
-                    include_keywords=include_keywords,
-                    include_entities=include_entities,
-                    user=user
+        agent = self._get_or_create_sentiment_agent()
+        batch_size = getattr(settings, 'AI_SENTIMENT_BATCH_SIZE', 20)
+
+        # Very low temperature for consistent analysis
+        llm = llm_clients.get(
+            agent.model_name, 0.1, output_token_budget(batch_size, include_keywords, include_entities)
+        )
+        if not llm:
+            return [
+                {'message_id': message_data.get('id'), 'error': "AI service not available", 'sentiment': 'error'}
+                for message_data in messages
+            ]
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(messages)
+
+        contents = [message_data.get('content', '') for message_data in messages]
+        analyses: Dict[int, Dict[str, Any]] = {}
+        errors: Dict[int, str] = {}
+        logs = []
+        pending = list(range(len(messages)))
+
+        for attempt in range(2):
+            batches = batch_messages([(index, contents[index]) for index in pending], batch_size=batch_size)
+            workers = min(getattr(settings, 'AI_SENTIMENT_CONCURRENCY', 4), len(batches))
+
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ai-sentiment') as executor:
+                outcomes = executor.map(
+                    lambda batch: self._analyze_sentiment_batch(
+                        llm, agent.system_prompt, batch, include_keywords, include_entities
+                    ),
+                    batches
                 )
+                for batch, (batch_analyses, error, processing_time, tokens_used) in zip(batches, outcomes):
+                    indexes = [index for index, _ in batch]
+                    analyses.update(batch_analyses)
+                    for index in indexes:
+                        if index not in batch_analyses:
+                            errors[index] = error or "No analysis returned for message"
+
+                    logs.append(AIProcessingLog(
+                        agent=agent,
+                        operation_type='sentiment_analysis',
+                        input_data={
+                            'message_ids': [messages[index].get('id') for index in indexes],
+                            'batch_size': len(indexes),
+                            'attempt': attempt + 1,
+                            'include_keywords': include_keywords,
+                            'include_entities': include_entities
+                        },
+                        output_data={'analyzed': len(batch_analyses), 'missing': len(indexes) - len(batch_analyses)},
+                        processing_time=processing_time,
+                        tokens_used=tokens_used,
+                        status='error' if error else 'success',
+                        error_message=error or '',
+                        user=user
+                    ))
+
+            pending = [index for index in pending if index not in analyses]
+            if not pending:
+                break
+
+        sentiment_objects = [
+            AISentimentAnalysis(
+                message_content=contents[index],
+                message_id=str(messages[index].get('id') or ''),
+                sentiment=analysis['sentiment'],
+                confidence_score=analysis['confidence_score'],
+                positive_score=analysis['positive_score'],
+                negative_score=analysis['negative_score'],
+                neutral_score=analysis['neutral_score'],
+                keywords=analysis['keywords'] if include_keywords else [],
+                entities=analysis['entities'] if include_entities else [],
+                analyzed_by=agent
+            )
+            for index, analysis in sorted(analyses.items())
+        ]
 
-                analysis['message_id'] = message_id
-                results.append(analysis)
+        with transaction.atomic():
+            AISentimentAnalysis.objects.bulk_create(sentiment_objects)
+            AIProcessingLog.objects.bulk_create(logs)
 
-            except Exception as e:
-                results.append({
-                    'message_id': message_data.get('id'),
-                    'error': str(e),
-                    'sentiment': 'error'
-                })
+        for sentiment_obj, index in zip(sentiment_objects, sorted(analyses)):
+            results[index] = {
+                'id': sentiment_obj.id,
+                'message_id': messages[index].get('id'),
+                'sentiment': sentiment_obj.sentiment,
+                'confidence_score': sentiment_obj.confidence_score,
+                'positive_score': sentiment_obj.positive_score,
+                'negative_score': sentiment_obj.negative_score,
+                'neutral_score': sentiment_obj.neutral_score,
+                'keywords': sentiment_obj.keywords,
+                'entities': sentiment_obj.entities,
+                'analyzed_at': sentiment_obj.analyzed_at
+            }
+
+        for index in pending:
+            results[index] = {
+                'message_id': messages[index].get('id'),
+                'error': errors.get(index, "No analysis returned for message"),
+                'sentiment': 'error'
+            }
 
+        logger.info(f"Bulk sentiment analysis: {len(analyses)}/{len(messages)} messages analyzed in {len(logs)} batches")
         return results
 
+    def _analyze_sentiment_batch(
+        self,
+        llm,
+        system_prompt: str,
+        batch: List[tuple],
+        include_keywords: bool,
+        include_entities: bool
+    ) -> tuple:
+        """
+        Run one batched sentiment prompt. Called from worker threads, so it
+        does not touch the database. Returns (analyses by message index,
+        error, processing time, tokens used).
+        """
+        start_time = time.time()
+        try:
+            response = llm.invoke([
+                SystemMessage(content=system_prompt),
+                HumanMessage(content=build_batch_prompt(batch, include_keywords, include_entities))
+            ])
+            usage = getattr(response, 'usage_metadata', None) or {}
+            analyses = parse_batch_response(response.content, [index for index, _ in batch])
+            return analyses, None, time.time() - start_time, usage.get('total_tokens')
+        except Exception as e:
+            logger.error(f"Sentiment batch of {len(batch)} messages failed: {str(e)}")
+            return {}, str(e), time.time() - start_time, None
+
     def enhance_template(
         self,
         template: AIMessageTemplate,
@@ -724,10 +966,11 @@ class AIService:
                 HumanMessage(content=prompt)
             ]
 
-            if not self.llm:
+            llm = llm_clients.get(agent.model_name, agent.temperature, agent.max_tokens)
+            if not llm:
                 raise Exception("AI service not available")
 
-            response = self.llm.invoke(messages)
+            response = llm.invoke(messages)
             ai_response = response.content
 
             # Parse response
@@ -814,9 +1057,16 @@ class RAGService:
         if not self.api_key:
             logger.warning("OpenRouter API key not found. RAG features will not work.")
 
+        # Embedding model, storage precision and ingestion batch sizes
+        self.embedding_model = 'text-embedding-ada-002'
+        self.embedding_dtype = getattr(settings, 'RAG_EMBEDDING_DTYPE', 'float32')
+        self.embedding_batch_size = getattr(settings, 'RAG_EMBEDDING_BATCH_SIZE', 64)
+        self.hybrid_search = getattr(settings, 'RAG_HYBRID_SEARCH', True)
+        self.write_batch_size = getattr(settings, 'RAG_WRITE_BATCH_SIZE', 500)
+
         # Initialize embeddings and LLM
         self.embeddings = self._initialize_embeddings()
-        self.llm = self._initialize_llm()
+        self.llm = llm_clients.get(DEFAULT_MODEL, temperature=0.3, max_tokens=2000)
 
     def _initialize_embeddings(self):
         """Initialize embeddings model"""
@@ -824,171 +1074,274 @@ class RAGService:
             return None
 
         try:
-            # Using OpenAI embeddings via OpenRouter
+            # Using OpenAI embeddings via OpenRouter; query embeddings are cached
             embeddings = OpenAIEmbeddings(
-                model="text-embedding-ada-002",
+                model=self.embedding_model,
                 api_key=self.api_key,
                 base_url=self.base_url,
             )
-            return embeddings
+            return CachedEmbeddings(embeddings, self.embedding_model)
         except Exception as e:
             logger.error(f"Failed to initialize embeddings: {str(e)}")
             return None
 
-    def _initialize_llm(self, model_name: str = "xai/grok-beta", temperature: float = 0.3):
-        """Initialize the language model for RAG"""
-        if not self.api_key:
-            return None
-
-        try:
-            llm = ChatOpenAI(
-                model=model_name,
-                temperature=temperature,
-                api_key=self.api_key,
-                base_url=self.base_url,
-                max_tokens=2000,
-            )
-            return llm
-        except Exception as e:
-            logger.error(f"Failed to initialize RAG LLM: {str(e)}")
-            return None
-
     def add_trip_to_vector_store(self, trip_data: Dict[str, Any]) -> bool:
         """
         Add trip information to the vector store
         """
-        try:
-            trip_id = str(trip_data.get('id', ''))
-            title = trip_data.get('title', '')
-            description = trip_data.get('description', '')
-            overview = trip_data.get('overview', '')
-            tags = trip_data.get('tags', [])
-            price = trip_data.get('price', 0)
-            duration = trip_data.get('duration', 0)
-            difficulty = trip_data.get('difficulty', 'easy')
-            itinerary = trip_data.get('itinerary', [])
-
-            # Debug logging
-            logger.info(f"Processing trip: {title}, tags type: {type(tags)}, itinerary type: {type(itinerary)}")
-
-            # Ensure tags is a list
-            if isinstance(tags, str):
-                try:
-                    import json
-                    tags = json.loads(tags)
-                    logger.info(f"Parsed tags from string: {tags}")
-                except Exception as e:
-                    logger.warning(f"Failed to parse tags string: {e}")
-                    tags = [tags] if tags else []
-            elif not isinstance(tags, list):
-                tags = []
+        result = self.index_trips([trip_data])
+        return result['error_count'] == 0
 
-            # Ensure itinerary is a list
-            if isinstance(itinerary, str):
-                try:
-                    import json
-                    itinerary = json.loads(itinerary)
-                    logger.info(f"Parsed itinerary from string: {len(itinerary)} items")
-                except Exception as e:
-                    logger.warning(f"Failed to parse itinerary string: {e}")
-                    itinerary = []
-            elif not isinstance(itinerary, list):
-                itinerary = []
+    def index_trips(
+        self,
+        trips_data: List[Dict[str, Any]],
+        embedding_batch_size: Optional[int] = None,
+        write_batch_size: Optional[int] = None,
+        force: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Index many trips at once: chunk every trip, embed only the chunks
+        whose content hash is not already indexed (in batches with
+        embed_documents), then apply all changes in bulk
+        """
+        embedding_batch_size = embedding_batch_size or self.embedding_batch_size
+        write_batch_size = write_batch_size or self.write_batch_size
+        timings = {}
+        start_time = time.time()
 
-            # Create comprehensive text content for the trip
-            content_parts = [
-                f"Trip Title: {title}",
-                f"Description: {description}",
-                f"Overview: {overview}",
-                f"Duration: {duration} days",
-                f"Difficulty: {difficulty}",
-                f"Price: ₹{price}",
-                f"Tags: {', '.join(tags)}",
-            ]
+        # Stage 1: build chunks for every trip
+        prepared = {}
+        success_count = 0
+        error_count = 0
+        for trip_data in trips_data:
+            try:
+                chunks = self._prepare_trip_chunks(trip_data)
+                prepared[str(trip_data.get('id', ''))] = chunks
+                success_count += 1
+            except Exception as e:
+                logger.error(f"Failed to prepare trip {trip_data.get('id')} for vector store: {str(e)}")
+                error_count += 1
+        timings['prepare'] = time.time() - start_time
+
+        # Stage 2: diff against what is already indexed
+        stage_start = time.time()
+        indexed = self._load_indexed_chunks(list(prepared))
+        to_embed = []
+        reused = []
+        deactivate_ids = []
+        skipped_count = 0
+
+        for trip_id, chunks in prepared.items():
+            existing = indexed.get(trip_id, [])
+
+            if not force and self._chunks_match(chunks, existing):
+                skipped_count += 1
+                continue
+
+            by_hash = {}
+            for doc in existing:
+                # Rows holding fallback vectors are never reused, so they get a real embedding
+                if force or doc['content_hash'] in by_hash or doc['embedding_model'] != self.embedding_model:
+                    deactivate_ids.append(doc['id'])
+                else:
+                    by_hash[doc['content_hash']] = doc
 
-            # Add itinerary information
-            if itinerary:
-                content_parts.append("Itinerary:")
-                for day in itinerary:
-                    if isinstance(day, dict):
-                        day_num = day.get('day', '')
-                        day_title = day.get('title', '')
-                        day_desc = day.get('description', '')
-                        content_parts.append(f"Day {day_num}: {day_title} - {day_desc}")
-                    else:
-                        content_parts.append(f"Day: {str(day)}")
+            for chunk in chunks:
+                doc = by_hash.pop(chunk['content_hash'], None)
+                if doc:
+                    reused.append(VectorDocument(id=doc['id'], **chunk))
+                else:
+                    to_embed.append(chunk)
+
+            # Chunks whose content no longer exists in the trip
+            deactivate_ids.extend(doc['id'] for doc in by_hash.values())
+        timings['diff'] = time.time() - stage_start
+
+        # Stage 3: embed new and changed chunks in batches
+        stage_start = time.time()
+        embeddings, fell_back = self._embed_texts([chunk['content'] for chunk in to_embed], embedding_batch_size)
+        timings['embed'] = time.time() - stage_start
+
+        # Stage 4: write all changes in bulk
+        stage_start = time.time()
+        documents = []
+        for chunk, embedding, fallback in zip(to_embed, embeddings, fell_back):
+            document = VectorDocument(
+                source_type='trip',
+                embedding_model=FALLBACK_EMBEDDING_MODEL if fallback else self.embedding_model,
+                is_active=True,
+                **chunk
+            )
+            document.set_embedding(embedding, dtype=self.embedding_dtype)
+            documents.append(document)
 
-            full_content = "\n".join(content_parts)
+        try:
+            now = timezone.now()
+            with transaction.atomic():
+                VectorDocument.objects.bulk_create(documents, batch_size=write_batch_size)
+                for document in reused:
+                    document.updated_at = now
+                VectorDocument.objects.bulk_update(
+                    reused,
+                    ['title', 'metadata', 'chunk_index', 'total_chunks', 'token_count', 'updated_at'],
+                    batch_size=write_batch_size
+                )
+                self._deactivate_documents(VectorDocument.objects.filter(id__in=deactivate_ids))
+        except Exception as e:
+            logger.error(f"Failed to write vector documents: {str(e)}")
+            error_count += success_count
+            success_count = 0
+            documents, reused, deactivate_ids = [], [], []
+        timings['write'] = time.time() - stage_start
+        timings['total'] = time.time() - start_time
+
+        logger.info(
+            f"Indexed {success_count} trips in {timings['total']:.2f}s: {skipped_count} unchanged, "
+            f"{len(documents)} chunks embedded, {len(reused)} reused, {len(deactivate_ids)} deactivated "
+            f"[prepare {timings['prepare']:.2f}s, diff {timings['diff']:.2f}s, "
+            f"embed {timings['embed']:.2f}s, write {timings['write']:.2f}s]"
+        )
 
-            # Split content into chunks if too long
-            chunks = self._split_text_into_chunks(full_content, max_length=1000)
+        return {
+            'success_count': success_count,
+            'error_count': error_count,
+            'skipped_count': skipped_count,
+            'chunk_count': len(documents),
+            'reused_count': len(reused),
+            'deactivated_count': len(deactivate_ids),
+            'timings': timings
+        }
 
-            # Generate embeddings and save
-            for i, chunk in enumerate(chunks):
-                try:
-                    if self.embeddings:
-                        embedding = self.embeddings.embed_query(chunk)
-                    else:
-                        # Fallback: create a simple hash-based embedding
-                        embedding = self._create_simple_embedding(chunk)
-                except Exception as e:
-                    logger.warning(f"Failed to generate embeddings for chunk {i}: {str(e)}")
-                    # Fallback: create a simple hash-based embedding
-                    embedding = self._create_simple_embedding(chunk)
-
-                # Create metadata dict
-                metadata = {
-                    'trip_id': trip_id,
-                    'title': title,
-                    'tags': tags,
-                    'price': float(price) if price else 0,
-                    'duration': duration,
-                    'difficulty': difficulty,
-                }
+    def _load_indexed_chunks(self, trip_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Load the active chunks currently indexed for the given trips"""
+        indexed = {}
+        for offset in range(0, len(trip_ids), 500):
+            rows = VectorDocument.objects.filter(
+                source_type='trip',
+                is_active=True,
+                source_id__in=trip_ids[offset:offset + 500]
+            ).order_by('chunk_index').values(
+                'id', 'source_id', 'content_hash', 'embedding_model', 'title',
+                'metadata', 'chunk_index', 'total_chunks', 'token_count'
+            )
+            for row in rows:
+                indexed.setdefault(row['source_id'], []).append(row)
+        return indexed
+
+    def _chunks_match(self, chunks: List[Dict[str, Any]], existing: List[Dict[str, Any]]) -> bool:
+        """Whether the indexed rows already hold exactly these chunks, embedded by the current model"""
+        fields = ('content_hash', 'title', 'metadata', 'chunk_index', 'total_chunks', 'token_count')
+        return len(chunks) == len(existing) and all(
+            doc['embedding_model'] == self.embedding_model
+            and all(chunk[field] == doc[field] for field in fields)
+            for chunk, doc in zip(chunks, existing)
+        )
 
-                logger.info(f"Creating VectorDocument with metadata: {metadata}")
-
-                VectorDocument.objects.create(
-                    content=chunk,
-                    title=f"{title} (Part {i+1})" if len(chunks) > 1 else title,
-                    source_type='trip',
-                    source_id=trip_id,
-                    embedding=embedding,
-                    embedding_model='text-embedding-ada-002',
-                    metadata=metadata,
-                    chunk_index=i,
-                    total_chunks=len(chunks),
-                    is_active=True
-                )
+    def _deactivate_documents(self, queryset) -> int:
+        """Deactivate documents, bumping updated_at so vector indexes notice"""
+        return queryset.filter(is_active=True).update(is_active=False, updated_at=timezone.now())
+
+    def _prepare_trip_chunks(self, trip_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Build the chunk rows (without embeddings) for a single trip"""
+        trip_id = str(trip_data.get('id', ''))
+        title = trip_data.get('title', '')
+        description = trip_data.get('description', '')
+        overview = trip_data.get('overview', '')
+        tags = trip_data.get('tags', [])
+        price = trip_data.get('price', 0)
+        duration = trip_data.get('duration', 0)
+        difficulty = trip_data.get('difficulty', 'easy')
+        itinerary = trip_data.get('itinerary', [])
+
+        # Ensure tags is a list
+        if isinstance(tags, str):
+            try:
+                tags = json.loads(tags)
+            except Exception as e:
+                logger.warning(f"Failed to parse tags string: {e}")
+                tags = [tags] if tags else []
+        elif not isinstance(tags, list):
+            tags = []
 
-            logger.info(f"Added trip '{title}' to vector store with {len(chunks)} chunks")
-            return True
+        # Ensure itinerary is a list
+        if isinstance(itinerary, str):
+            try:
+                itinerary = json.loads(itinerary)
+            except Exception as e:
+                logger.warning(f"Failed to parse itinerary string: {e}")
+                itinerary = []
+        elif not isinstance(itinerary, list):
+            itinerary = []
+
+        # Create comprehensive text content for the trip
+        content_parts = [
+            f"Trip Title: {title}",
+            f"Description: {description}",
+            f"Overview: {overview}",
+            f"Duration: {duration} days",
+            f"Difficulty: {difficulty}",
+            f"Price: ₹{price}",
+            f"Tags: {', '.join(tags)}",
+        ]
+
+        # Add itinerary information
+        if itinerary:
+            content_parts.append("Itinerary:")
+            for day in itinerary:
+                if isinstance(day, dict):
+                    day_num = day.get('day', '')
+                    day_title = day.get('title', '')
+                    day_desc = day.get('description', '')
+                    content_parts.append(f"Day {day_num}: {day_title} - {day_desc}")
+                else:
+                    content_parts.append(f"Day: {str(day)}")
 
-        except Exception as e:
-            logger.error(f"Failed to add trip to vector store: {str(e)}")
-            logger.error(f"Trip data: {trip_data}")
-            import traceback
-            logger.error(f"Traceback: {traceback.format_exc()}")
-            return False
-
-    def _split_text_into_chunks(self, text: str, max_length: int = 1000) -> List[str]:
-        """Split text into chunks of maximum length"""
-        words = text.split()
-        chunks = []
-        current_chunk = []
+        full_content = "\n".join(content_parts)
 
-        for word in words:
-            if len(' '.join(current_chunk + [word])) <= max_length:
-                current_chunk.append(word)
-            else:
-                if current_chunk:
-                    chunks.append(' '.join(current_chunk))
-                current_chunk = [word]
+        # Split content into token-bounded chunks, keeping itinerary days whole
+        chunks = chunk_text(full_content)
 
-        if current_chunk:
-            chunks.append(' '.join(current_chunk))
+        metadata = {
+            'trip_id': trip_id,
+            'title': title,
+            'tags': tags,
+            'price': float(price) if price else 0,
+            'duration': duration,
+            'difficulty': difficulty,
+        }
 
-        return chunks if chunks else [text]
+        return [{
+            'content': chunk['text'],
+            'content_hash': compute_content_hash(chunk['text'], self.embedding_model),
+            'title': f"{title} (Part {i+1})" if len(chunks) > 1 else title,
+            'source_id': trip_id,
+            'metadata': metadata,
+            'chunk_index': i,
+            'total_chunks': len(chunks),
+            'token_count': chunk['token_count'],
+        } for i, chunk in enumerate(chunks)]
+
+    def _embed_texts(self, texts: List[str], batch_size: int) -> Tuple[List[List[float]], List[bool]]:
+        """
+        Embed texts in batches, falling back to simple embeddings per failed
+        batch. Returns the embeddings and, per text, whether it fell back.
+        """
+        embeddings = []
+        fell_back = []
+        for offset in range(0, len(texts), batch_size):
+            batch = texts[offset:offset + batch_size]
+            try:
+                if not self.embeddings:
+                    raise Exception("Embeddings model not available")
+                embeddings.extend(self.embeddings.embed_documents(batch))
+                fell_back.extend([False] * len(batch))
+            except Exception as e:
+                if self.embeddings:
+                    logger.warning(f"Failed to generate embeddings for batch at {offset}: {str(e)}")
+                # Fallback: create a simple hash-based embedding
+                embeddings.extend(self._create_simple_embedding(text) for text in batch)
+                fell_back.extend([True] * len(batch))
+        return embeddings, fell_back
 
     def _create_simple_embedding(self, text: str) -> List[float]:
         """Create a simple embedding for fallback when API is not available"""
@@ -1003,93 +1356,86 @@ class RAGService:
             embedding.extend(embedding)
         return embedding[:1536]
 
-    def search_similar_documents(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+    def search_similar_documents(
+        self,
+        query: str,
+        top_k: int = 5,
+        query_embedding: Optional[List[float]] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
         """
-        Search for similar documents in the vector store
+        Search for similar documents in the vector store, restricted to
+        documents matching the optional structured filters
         """
+        return self.retrieve_documents(
+            query, top_k=top_k, query_embedding=query_embedding, filters=filters
+        )['documents']
+
+    def retrieve_documents(
+        self,
+        query: str,
+        top_k: int = 5,
+        query_embedding: Optional[List[float]] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        lexical_only: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Retrieve documents for a query, returning them with the query
+        embedding and per-stage search timings. `lexical_only` skips the
+        embedder, e.g. when the caller already failed to embed the query.
+        """
+        start_time = time.time()
+
         try:
-            if not self.embeddings:
-                # Fallback search using text similarity
-                return self._fallback_text_search(query, top_k)
-
-            # Generate embedding for the query
-            query_embedding = self.embeddings.embed_query(query)
-
-            # Get all active documents
-            documents = VectorDocument.objects.filter(is_active=True)
-
-            if not documents.exists():
-                return []
-
-            # Calculate similarities
-            similarities = []
-            for doc in documents:
-                if doc.embedding:
-                    # Convert stored embedding back to numpy array
-                    doc_embedding = np.array(doc.embedding)
-                    similarity = cosine_similarity(
-                        [query_embedding],
-                        [doc_embedding]
-                    )[0][0]
-                    similarities.append({
-                        'document': doc,
-                        'similarity': float(similarity)
-                    })
-
-            # Sort by similarity and return top_k
-            similarities.sort(key=lambda x: x['similarity'], reverse=True)
-            top_results = similarities[:top_k]
-
-            return [{
-                'id': result['document'].id,
-                'content': result['document'].content,
-                'title': result['document'].title,
-                'source_type': result['document'].source_type,
-                'source_id': result['document'].source_id,
-                'similarity': result['similarity'],
-                'metadata': result['document'].metadata
-            } for result in top_results]
+            if lexical_only or not self.embeddings:
+                # Fallback search using BM25 only
+                documents = self._fallback_text_search(query, top_k, filters=filters)
+                return {
+                    'documents': documents,
+                    'query_embedding': None,
+                    'timings': {'lexical': time.time() - start_time, 'total': time.time() - start_time}
+                }
+
+            if self.hybrid_search:
+                # Vector and BM25 retrieval run concurrently and are fused by rank
+                return hybrid_search(
+                    query,
+                    top_k=top_k,
+                    embed_query=self.embeddings.embed_query,
+                    query_embedding=query_embedding,
+                    filters=filters
+                )
+
+            # Generate embedding for the query unless the caller already has it
+            if query_embedding is None:
+                query_embedding = self.embeddings.embed_query(query)
+            embed_time = time.time() - start_time
+
+            # Score against the in-memory index of active documents
+            documents = vector_index.search(query_embedding, top_k=top_k, filters=filters)
+            return {
+                'documents': documents,
+                'query_embedding': query_embedding,
+                'timings': {
+                    'embed': embed_time,
+                    'vector': time.time() - start_time - embed_time,
+                    'total': time.time() - start_time
+                }
+            }
 
         except Exception as e:
             logger.error(f"Error searching documents: {str(e)}")
-            return []
+            return {'documents': [], 'query_embedding': query_embedding, 'timings': {'total': time.time() - start_time}}
 
-    def _fallback_text_search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
-        """Fallback text-based search when embeddings are not available"""
+    def _fallback_text_search(
+        self,
+        query: str,
+        top_k: int = 5,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Fallback BM25 keyword search when embeddings are not available"""
         try:
-            documents = VectorDocument.objects.filter(is_active=True)
-
-            results = []
-            query_lower = query.lower()
-
-            for doc in documents:
-                content_lower = doc.content.lower()
-                title_lower = doc.title.lower()
-
-                # Simple text matching score
-                score = 0
-                query_words = query_lower.split()
-
-                for word in query_words:
-                    if word in content_lower:
-                        score += 1
-                    if word in title_lower:
-                        score += 2  # Title matches weigh more
-
-                if score > 0:
-                    results.append({
-                        'id': doc.id,
-                        'content': doc.content,
-                        'title': doc.title,
-                        'source_type': doc.source_type,
-                        'source_id': doc.source_id,
-                        'similarity': min(score / len(query_words), 1.0),  # Normalize score
-                        'metadata': doc.metadata
-                    })
-
-            # Sort by score and return top_k
-            results.sort(key=lambda x: x['similarity'], reverse=True)
-            return results[:top_k]
+            return lexical_index.search(query, top_k=top_k, filters=filters)
 
         except Exception as e:
             logger.error(f"Error in fallback search: {str(e)}")
@@ -1100,7 +1446,9 @@ class RAGService:
         query: str,
         context_documents: List[Dict[str, Any]],
         session_id: Optional[str] = None,
-        user=None
+        user=None,
+        search_time: float = 0.0,
+        search_timings: Optional[Dict[str, float]] = None
     ) -> Dict[str, Any]:
         """
         Generate a response using RAG with retrieved documents
@@ -1111,76 +1459,22 @@ class RAGService:
             if not self.llm:
                 raise Exception("RAG LLM not available")
 
-            # Prepare context from retrieved documents
-            context_parts = []
-            for doc in context_documents:
-                context_parts.append(f"Title: {doc['title']}")
-                context_parts.append(f"Content: {doc['content']}")
-                if doc.get('metadata'):
-                    metadata_str = ", ".join([f"{k}: {v}" for k, v in doc['metadata'].items()])
-                    context_parts.append(f"Metadata: {metadata_str}")
-                context_parts.append("---")
-
-            context = "\n".join(context_parts)
-
-            # Create RAG prompt
-            system_prompt = """You are a helpful travel assistant for Adventure Buddha, specializing in adventure trips and travel experiences in India.
-
-Use the provided context information to answer the user's question accurately. If the context doesn't contain relevant information, say so politely and offer to help with general travel questions.
-
-Key guidelines:
-- Be friendly, informative, and enthusiastic about adventure travel
-- Provide specific details from the trip information when available
-- Mention prices, durations, and key highlights when relevant
-- If recommending trips, explain why they might be suitable
-- Always be honest about what information you have available
-- Encourage users to contact for more details or bookings
-
-Context information:
-{context}
-"""
-
-            human_prompt = """User Question: {query}
-
-Please provide a helpful, accurate response based on the available trip information."""
-
-            # Generate response
-            messages = [
-                SystemMessage(content=system_prompt.format(context=context)),
-                HumanMessage(content=human_prompt.format(query=query))
-            ]
+            messages, packed = self._build_rag_messages(query, context_documents)
 
             response = self.llm.invoke(messages)
-            ai_response = response.content
-
             generation_time = time.time() - start_time
 
-            # Log the RAG query
-            rag_query = RAGQuery.objects.create(
-                query=query,
-                retrieved_documents=[
-                    {
-                        'id': str(doc['id']),
-                        'title': doc['title'],
-                        'similarity': doc['similarity']
-                    } for doc in context_documents
-                ],
-                context_used=context[:2000],  # Truncate for storage
-                response=ai_response,
-                search_time=0,  # We don't track this separately
+            return self._log_rag_query(
+                query, context_documents, packed, messages, response.content,
+                getattr(response, 'usage_metadata', None),
+                search_time=search_time,
+                search_timings=search_timings,
                 generation_time=generation_time,
-                total_time=generation_time,
-                session_id=session_id or str(uuid.uuid4()),
+                total_time=search_time + generation_time,
+                session_id=session_id,
                 user=user
             )
 
-            return {
-                'response': ai_response,
-                'query_id': str(rag_query.id),
-                'context_documents': len(context_documents),
-                'generation_time': generation_time
-            }
-
         except Exception as e:
             generation_time = time.time() - start_time
             error_msg = str(e)
@@ -1189,21 +1483,110 @@ Please provide a helpful, accurate response based on the available trip informat
             RAGQuery.objects.create(
                 query=query,
                 response="",
-                search_time=0,
+                search_time=search_time,
+                search_timings=search_timings or {},
                 generation_time=generation_time,
-                total_time=generation_time,
+                total_time=search_time + generation_time,
                 session_id=session_id or str(uuid.uuid4()),
                 user=user
             )
 
             raise Exception(f"RAG response generation failed: {error_msg}")
 
-    def populate_vector_store(self, source_type: str = 'all') -> Dict[str, Any]:
+    def _build_rag_messages(self, query: str, context_documents: List[Dict[str, Any]]):
+        """Pack the retrieved chunks into the prompt; returns the messages and packing result"""
+        # Pack the retrieved chunks into the context token budget
+        packed = pack_context(query, context_documents)
+
+        # Create RAG prompt
+        system_prompt = """You are a helpful travel assistant for Adventure Buddha, specializing in adventure trips and travel experiences in India.
+
+Use the provided context information to answer the user's question accurately. If the context doesn't contain relevant information, say so politely and offer to help with general travel questions.
+
+Key guidelines:
+- Be friendly, informative, and enthusiastic about adventure travel
+- Provide specific details from the trip information when available
+- Mention prices, durations, and key highlights when relevant
+- If recommending trips, explain why they might be suitable
+- Always be honest about what information you have available
+- Encourage users to contact for more details or bookings
+
+Context information:
+{context}
+"""
+
+        human_prompt = """User Question: {query}
+
+Please provide a helpful, accurate response based on the available trip information."""
+
+        messages = [
+            SystemMessage(content=system_prompt.format(context=packed['context'])),
+            HumanMessage(content=human_prompt.format(query=query))
+        ]
+        return messages, packed
+
+    def _log_rag_query(
+        self,
+        query: str,
+        context_documents: List[Dict[str, Any]],
+        packed: Dict[str, Any],
+        messages: list,
+        ai_response: str,
+        usage: Optional[Dict[str, Any]],
+        search_time: float,
+        search_timings: Optional[Dict[str, float]],
+        generation_time: float,
+        total_time: float,
+        session_id: Optional[str] = None,
+        user=None,
+        time_to_first_token: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Persist a generated RAG answer and build the API response"""
+        used_ids = {str(doc['id']) for doc in packed['documents']}
+
+        # Prefer the provider's count; fall back to our own estimate
+        prompt_tokens = (usage or {}).get('input_tokens') or sum(count_tokens(m.content) for m in messages)
+
+        # Log the RAG query
+        rag_query = RAGQuery.objects.create(
+            query=query,
+            retrieved_documents=[
+                dict(retrieval_summary(doc), used=str(doc['id']) in used_ids)
+                for doc in context_documents
+            ],
+            context_used=packed['context'][:2000],  # Truncate for storage
+            context_tokens=packed['token_count'],
+            prompt_tokens=prompt_tokens,
+            response=ai_response,
+            search_time=search_time,
+            search_timings=search_timings or {},
+            generation_time=generation_time,
+            time_to_first_token=time_to_first_token,
+            total_time=total_time,
+            session_id=session_id or str(uuid.uuid4()),
+            user=user
+        )
+
+        return {
+            'response': ai_response,
+            'query_id': str(rag_query.id),
+            'context_documents': len(packed['documents']),
+            'context_tokens': packed['token_count'],
+            'prompt_tokens': prompt_tokens,
+            'generation_time': generation_time
+        }
+
+    def populate_vector_store(
+        self,
+        source_type: str = 'all',
+        embedding_batch_size: Optional[int] = None,
+        force: bool = False
+    ) -> Dict[str, Any]:
         """
         Populate the vector store with data based on source type
         """
         if source_type == 'trip' or source_type == 'all':
-            return self.populate_trip_vector_store()
+            return self.populate_trip_vector_store(embedding_batch_size=embedding_batch_size, force=force)
         else:
             return {
                 'total_items': 0,
@@ -1217,25 +1600,48 @@ Please provide a helpful, accurate response based on the available trip informat
         query: str,
         session_id: Optional[str] = None,
         top_k: int = 5,
-        user=None
+        user=None,
+        filters: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         """
-        Process a RAG query: retrieve relevant documents and generate response
+        Process a RAG query: retrieve relevant documents (optionally restricted
+        by structured filters) and generate response
         """
         start_time = time.time()
+        search_time = 0.0
+        search_timings = {}
 
         try:
             # Search for relevant documents
-            context_documents = self.search_similar_documents(query, top_k=top_k)
+            retrieval = self.retrieve_documents(query, top_k=top_k, filters=filters)
+            context_documents = retrieval['documents']
+            query_embedding = retrieval['query_embedding']
+            search_timings = retrieval['timings']
+            search_time = time.time() - start_time
+
+            # Reuse the answer to a near-identical question over the same documents
+            if query_embedding is not None:
+                cached = response_cache.lookup(query_embedding, context_documents)
+                if cached:
+                    return self._cached_rag_response(
+                        query, cached, context_documents, search_time, search_timings, session_id, user
+                    )
 
             # Generate RAG response
             response_data = self.generate_rag_response(
                 query=query,
                 context_documents=context_documents,
                 session_id=session_id,
-                user=user
+                user=user,
+                search_time=search_time,
+                search_timings=search_timings
             )
 
+            if query_embedding is not None and 'query_id' in response_data:
+                response_cache.store(
+                    query_embedding, context_documents, response_data['response'], response_data['query_id']
+                )
+
             total_time = time.time() - start_time
 
             # Update the query record with total time
@@ -1257,8 +1663,94 @@ Please provide a helpful, accurate response based on the available trip informat
             RAGQuery.objects.create(
                 query=query,
                 response="",
-                search_time=0,
-                generation_time=0,
+                search_time=search_time,
+                search_timings=search_timings,
+                generation_time=max(total_time - search_time, 0),
+                total_time=total_time,
+                session_id=session_id or str(uuid.uuid4()),
+                user=user
+            )
+
+            raise Exception(f"RAG query processing failed: {error_msg}")
+
+    async def aprocess_query(
+        self,
+        query: str,
+        session_id: Optional[str] = None,
+        top_k: int = 5,
+        user=None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Async counterpart of process_query. The query embedding and the LLM
+        call are awaited; retrieval and persistence run via sync_to_async.
+        """
+        start_time = time.time()
+        search_time = 0.0
+        search_timings = {}
+
+        try:
+            query_embedding = None
+            lexical_only = False
+            if self.embeddings:
+                try:
+                    query_embedding = await self.embeddings.aembed_query(query)
+                except Exception as e:
+                    # Don't retry with the blocking sync embedder inside retrieval
+                    logger.warning(f"Failed to embed query, using keyword search only: {str(e)}")
+                    lexical_only = True
+
+            retrieval = await sync_to_async(self.retrieve_documents)(
+                query, top_k=top_k, query_embedding=query_embedding, filters=filters, lexical_only=lexical_only
+            )
+            context_documents = retrieval['documents']
+            search_timings = dict(retrieval['timings'])
+            search_time = time.time() - start_time
+            search_timings['total'] = search_time
+
+            # Reuse the answer to a near-identical question over the same documents
+            if query_embedding is not None:
+                cached = response_cache.lookup(query_embedding, context_documents)
+                if cached:
+                    return await sync_to_async(self._cached_rag_response)(
+                        query, cached, context_documents, search_time, search_timings, session_id, user
+                    )
+
+            if not self.llm:
+                raise Exception("RAG LLM not available")
+
+            messages, packed = self._build_rag_messages(query, context_documents)
+
+            generation_start = time.time()
+            response = await self.llm.ainvoke(messages)
+
+            result = await sync_to_async(self._log_rag_query)(
+                query, context_documents, packed, messages, response.content,
+                getattr(response, 'usage_metadata', None),
+                search_time=search_time,
+                search_timings=search_timings,
+                generation_time=time.time() - generation_start,
+                total_time=time.time() - start_time,
+                session_id=session_id,
+                user=user
+            )
+
+            if query_embedding is not None:
+                response_cache.store(query_embedding, context_documents, response.content, result['query_id'])
+
+            return result
+
+        except Exception as e:
+            total_time = time.time() - start_time
+            error_msg = str(e)
+
+            # Log failed query
+            await sync_to_async(RAGQuery.objects.create)(
+                query=query,
+                response="",
+                search_time=search_time,
+                search_timings=search_timings,
+                generation_time=max(total_time - search_time, 0),
                 total_time=total_time,
                 session_id=session_id or str(uuid.uuid4()),
                 user=user
@@ -1266,40 +1758,168 @@ Please provide a helpful, accurate response based on the available trip informat
 
             raise Exception(f"RAG query processing failed: {error_msg}")
 
-    def populate_trip_vector_store(self) -> Dict[str, Any]:
+    def stream_query(
+        self,
+        query: str,
+        session_id: Optional[str] = None,
+        top_k: int = 5,
+        user=None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Process a RAG query, yielding response tokens as they arrive.
+
+        Yields 'start', 'token' and 'done' events; the RAGQuery is saved
+        once the stream completes and its id is sent with 'done'. Cached
+        answers are sent as a single token.
+        """
+        start_time = time.time()
+        search_time = 0.0
+        search_timings = {}
+
+        try:
+            retrieval = self.retrieve_documents(query, top_k=top_k, filters=filters)
+            context_documents = retrieval['documents']
+            query_embedding = retrieval['query_embedding']
+            search_timings = retrieval['timings']
+            search_time = time.time() - start_time
+
+            yield {'event': 'start', 'context_documents': len(context_documents)}
+
+            if query_embedding is not None:
+                cached = response_cache.lookup(query_embedding, context_documents)
+                if cached:
+                    result = self._cached_rag_response(
+                        query, cached, context_documents, search_time, search_timings, session_id, user
+                    )
+                    yield {'event': 'token', 'content': result['response']}
+                    yield dict(result, event='done')
+                    return
+
+            if not self.llm:
+                raise Exception("RAG LLM not available")
+
+            messages, packed = self._build_rag_messages(query, context_documents)
+
+            generation_start = time.time()
+            first_token_time = None
+            chunks = []
+            usage = None
+            for chunk in self.llm.stream(messages):
+                usage = getattr(chunk, 'usage_metadata', None) or usage
+                if not chunk.content:
+                    continue
+                if first_token_time is None:
+                    first_token_time = time.time() - start_time
+                chunks.append(chunk.content)
+                yield {'event': 'token', 'content': chunk.content}
+
+            ai_response = ''.join(chunks)
+            result = self._log_rag_query(
+                query, context_documents, packed, messages, ai_response, usage,
+                search_time=search_time,
+                search_timings=search_timings,
+                generation_time=time.time() - generation_start,
+                total_time=time.time() - start_time,
+                session_id=session_id,
+                user=user,
+                time_to_first_token=first_token_time
+            )
+
+            if query_embedding is not None:
+                response_cache.store(query_embedding, context_documents, ai_response, result['query_id'])
+
+            yield dict(result, event='done', time_to_first_token=first_token_time)
+
+        except Exception as e:
+            total_time = time.time() - start_time
+            logger.error(f"Streaming RAG query failed: {str(e)}")
+
+            # Log failed query
+            RAGQuery.objects.create(
+                query=query,
+                response="",
+                search_time=search_time,
+                search_timings=search_timings,
+                generation_time=max(total_time - search_time, 0),
+                total_time=total_time,
+                session_id=session_id or str(uuid.uuid4()),
+                user=user
+            )
+            yield {'event': 'error', 'error': f"RAG query processing failed: {str(e)}"}
+
+    def _cached_rag_response(
+        self,
+        query: str,
+        cached: Dict[str, Any],
+        context_documents: List[Dict[str, Any]],
+        search_time: float,
+        search_timings: Dict[str, float],
+        session_id: Optional[str] = None,
+        user=None
+    ) -> Dict[str, Any]:
+        """Log and return a response served from the semantic response cache"""
+        rag_query = RAGQuery.objects.create(
+            query=query,
+            retrieved_documents=[retrieval_summary(doc) for doc in context_documents],
+            response=cached['response'],
+            search_time=search_time,
+            search_timings=search_timings,
+            generation_time=0,
+            total_time=search_time,
+            cache_hit=True,
+            session_id=session_id or str(uuid.uuid4()),
+            user=user
+        )
+
+        logger.info(
+            f"Served RAG query from cache (similarity {cached['similarity']:.3f}, source query {cached['query_id']})"
+        )
+
+        return {
+            'response': cached['response'],
+            'query_id': str(rag_query.id),
+            'context_documents': len(context_documents),
+            'generation_time': 0.0,
+            'cached': True
+        }
+
+    def populate_trip_vector_store(self, embedding_batch_size: Optional[int] = None, force: bool = False) -> Dict[str, Any]:
         """
-        Populate the vector store with all existing trips
+        Populate the vector store with all existing trips, re-embedding only
+        changed chunks and deactivating trips that are no longer published
         """
         from trips.models import Trip
 
         try:
-            trips = Trip.objects.filter(status='published')
-            success_count = 0
-            error_count = 0
-
-            for trip in trips:
-                trip_data = {
-                    'id': trip.id,
-                    'title': trip.title,
-                    'description': trip.description,
-                    'overview': trip.overview,
-                    'tags': trip.tags,
-                    'price': float(trip.price),
-                    'duration': trip.duration,
-                    'difficulty': trip.difficulty,
-                    'itinerary': trip.itinerary,
-                }
+            trips = Trip.objects.filter(status='published').values(
+                'id', 'title', 'description', 'overview', 'tags',
+                'price', 'duration', 'difficulty', 'itinerary'
+            )
+            trips_data = [dict(trip, price=float(trip['price'])) for trip in trips]
 
-                if self.add_trip_to_vector_store(trip_data):
-                    success_count += 1
-                else:
-                    error_count += 1
+            result = self.index_trips(trips_data, embedding_batch_size=embedding_batch_size, force=force)
+
+            # Trips that were removed or unpublished
+            removed_count = self._deactivate_documents(
+                VectorDocument.objects.filter(source_type='trip').exclude(
+                    source_id__in=[str(trip['id']) for trip in trips_data]
+                )
+            )
 
             return {
-                'total_trips': trips.count(),
-                'success_count': success_count,
-                'error_count': error_count,
-                'message': f"Successfully added {success_count} trips to vector store"
+                'total_trips': len(trips_data),
+                'total_items': len(trips_data),
+                'success_count': result['success_count'],
+                'error_count': result['error_count'],
+                'skipped_count': result['skipped_count'],
+                'chunk_count': result['chunk_count'],
+                'deactivated_count': result['deactivated_count'] + removed_count,
+                'timings': result['timings'],
+                'message': (
+                    f"Indexed {result['success_count']} trips "
+                    f"({result['skipped_count']} unchanged, {result['chunk_count']} chunks embedded)"
+                )
             }
 
         except Exception as e:
@@ -1307,4 +1927,4 @@ Please provide a helpful, accurate response based on the available trip informat
             return {
                 'error': str(e),
                 'message': 'Failed to populate vector store'
-            }
\ No newline at end of file
+            }
@@ -33,6 +33,36 @@ def process_ai_chat_task(self, agent_id, message, session_id, context_data, user
         raise self.retry(countdown=60 * (2 ** self.request.retries), exc=e)
 
 
+@shared_task(bind=True, max_retries=3)
+def summarize_conversation_task(self, conversation_id):
+    """
+    Fold a conversation's older turns into its running summary once the
+    history has outgrown its budget
+    """
+    from .models import AIConversation
+    from .conversation_memory import ConversationMemory
+    from .llm_clients import llm_clients
+
+    try:
+        conversation = AIConversation.objects.select_related('agent').get(id=conversation_id)
+        memory = ConversationMemory()
+
+        # Another run may already have caught up
+        if not memory.needs_summary(conversation):
+            return {'summarized': False}
+
+        llm = llm_clients.get(conversation.agent.model_name, 0.2, memory.summary_tokens)
+        if not llm:
+            return {'summarized': False}
+
+        memory.update_summary(conversation, llm)
+        return {'summarized': True, 'summarized_count': conversation.summarized_count}
+
+    except Exception as e:
+        logger.error(f"Error summarizing conversation {conversation_id}: {str(e)}")
+        raise self.retry(countdown=60 * (2 ** self.request.retries), exc=e)
+
+
 @shared_task(bind=True, max_retries=3)
 def redraft_message_task(self, original_message, context, tone, max_length, user_id):
     """
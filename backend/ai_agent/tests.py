@@ -0,0 +1,908 @@
+import json
+import zlib
+from datetime import timedelta
+
+import numpy as np
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ai_agent.llm_clients import LLMClientRegistry, llm_clients
+from ai_agent.models import VectorDocument
+from ai_agent.vector_index import VectorIndex
+
+
+class VectorIndexTestCase(TestCase):
+    def setUp(self):
+        """Set up three trip documents with simple embeddings"""
+        self.ladakh = self._create_document('Ladakh', [1.0, 0.0, 0.0])
+        self.goa = self._create_document('Goa', [0.0, 2.0, 0.0])
+        self.kashmir = self._create_document('Kashmir', [0.6, 0.8, 0.0])
+
+        self.index = VectorIndex(refresh_interval=0)
+
+    def _create_document(self, title, embedding, dtype='float32'):
+        document = VectorDocument(
+            content=f"{title} trip",
+            title=title,
+            source_type='trip',
+            source_id=title.lower(),
+        )
+        document.set_embedding(embedding, dtype=dtype)
+        document.save()
+        return document
+
+    def test_search_returns_top_k_by_cosine_similarity(self):
+        """Results are ordered by cosine similarity and truncated to top_k"""
+        results = self.index.search([1.0, 0.1, 0.0], top_k=2)
+
+        self.assertEqual([r['title'] for r in results], ['Ladakh', 'Kashmir'])
+        self.assertAlmostEqual(results[0]['similarity'], 1 / np.sqrt(1.01), places=5)
+
+    def test_rows_are_normalised(self):
+        """Stored vectors are unit length regardless of input magnitude"""
+        self.index.rebuild()
+
+        norms = np.linalg.norm(self.index._matrix, axis=1)
+        np.testing.assert_allclose(norms, np.ones(3), rtol=1e-6)
+
+    def test_new_and_deactivated_documents_are_picked_up(self):
+        """Refresh applies additions and deactivations incrementally"""
+        self.index.rebuild()
+        version = self.index.version
+
+        self._create_document('Spiti', [0.0, 0.0, 1.0])
+        VectorDocument.objects.filter(id=self.ladakh.id).update(
+            is_active=False, updated_at=timezone.now()
+        )
+
+        titles = [r['title'] for r in self.index.search([1.0, 0.0, 1.0], top_k=5)]
+
+        self.assertIn('Spiti', titles)
+        self.assertNotIn('Ladakh', titles)
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual(self.index.version, version + 1)
+
+    def test_hard_delete_triggers_rebuild(self):
+        """Deleted rows are dropped even though the watermark does not move"""
+        self.index.rebuild()
+        self.goa.delete()
+
+        titles = [r['title'] for r in self.index.search([0.0, 1.0, 0.0], top_k=5)]
+
+        self.assertNotIn('Goa', titles)
+
+    def test_packed_embedding_round_trip(self):
+        """Binary embeddings decode to the stored values"""
+        document = VectorDocument.objects.get(id=self.kashmir.id)
+
+        self.assertEqual(document.embedding_dimension, 3)
+        self.assertIsNone(document.embedding)
+        np.testing.assert_allclose(document.get_embedding(), [0.6, 0.8, 0.0], rtol=1e-6)
+
+    def test_float16_and_legacy_json_embeddings_are_indexed(self):
+        """Half-precision rows and rows still holding JSON are both searchable"""
+        self._create_document('Spiti', [0.0, 0.0, 1.0], dtype='float16')
+        VectorDocument.objects.create(
+            content='Sikkim trip', title='Sikkim', source_type='trip',
+            source_id='sikkim', embedding=[0.0, 0.0, -1.0]
+        )
+
+        self.assertEqual(self.index.search([0.0, 0.0, 1.0], top_k=1)[0]['title'], 'Spiti')
+        self.assertEqual(self.index.search([0.0, 0.0, -1.0], top_k=1)[0]['title'], 'Sikkim')
+
+    def test_dimension_mismatch_is_skipped(self):
+        """Query vectors of a different dimension return no results"""
+        self.assertEqual(self.index.search([1.0, 0.0], top_k=1), [])
+
+
+class FakeEmbeddings:
+    """Deterministic stand-in for OpenAIEmbeddings that records its calls"""
+
+    def __init__(self, dimension=8):
+        self.dimension = dimension
+        self.document_batches = []
+        self.queries = []
+
+    def _embed(self, text):
+        vector = np.zeros(self.dimension)
+        for word in text.lower().split():
+            vector[zlib.crc32(word.encode()) % self.dimension] += 1.0
+        return vector.tolist()
+
+    def embed_documents(self, texts):
+        self.document_batches.append(list(texts))
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return self._embed(text)
+
+    async def aembed_query(self, text):
+        return self.embed_query(text)
+
+
+def make_trip(trip_id, title, **overrides):
+    trip = {
+        'id': trip_id,
+        'title': title,
+        'description': f"{title} adventure through the mountains",
+        'overview': 'Scenic drives and local food',
+        'tags': ['mountains', 'adventure'],
+        'price': 25000,
+        'duration': 6,
+        'difficulty': 'moderate',
+        'itinerary': [
+            {'day': 1, 'title': 'Arrival', 'description': 'Check in and acclimatise'},
+            {'day': 2, 'title': 'Sightseeing', 'description': 'Visit the monasteries'},
+        ],
+    }
+    trip.update(overrides)
+    return trip
+
+
+class RAGIngestionTestCase(TestCase):
+    def setUp(self):
+        """Set up a RAG service backed by fake embeddings"""
+        from ai_agent.services import RAGService
+
+        self.service = RAGService()
+        self.service.embeddings = FakeEmbeddings()
+
+    def test_index_trips_batches_embedding_requests(self):
+        """Chunks from many trips share embed_documents calls and one bulk write"""
+        trips = [make_trip(i, f"Trip {i}") for i in range(5)]
+
+        result = self.service.index_trips(trips, embedding_batch_size=2)
+
+        self.assertEqual(result['success_count'], 5)
+        self.assertEqual(result['chunk_count'], 5)
+        self.assertEqual([len(b) for b in self.service.embeddings.document_batches], [2, 2, 1])
+        self.assertEqual(VectorDocument.objects.filter(source_type='trip').count(), 5)
+        self.assertEqual(set(result['timings']), {'prepare', 'diff', 'embed', 'write', 'total'})
+
+    def test_index_trips_falls_back_without_embeddings(self):
+        """Trips are still indexed with hash embeddings when no model is configured"""
+        self.service.embeddings = None
+
+        result = self.service.index_trips([make_trip(1, 'Ladakh')])
+
+        document = VectorDocument.objects.get(source_id='1')
+        self.assertEqual(result['error_count'], 0)
+        self.assertEqual(document.embedding_dimension, 1536)
+
+    def test_reindex_skips_unchanged_trips(self):
+        """A second pass over the same trips embeds nothing and writes no duplicates"""
+        trips = [make_trip(1, 'Ladakh'), make_trip(2, 'Spiti')]
+        self.service.index_trips(trips)
+        self.service.embeddings.document_batches = []
+
+        result = self.service.index_trips(trips)
+
+        self.assertEqual(result['skipped_count'], 2)
+        self.assertEqual(result['chunk_count'], 0)
+        self.assertEqual(self.service.embeddings.document_batches, [])
+        self.assertEqual(VectorDocument.objects.filter(is_active=True).count(), 2)
+
+    def test_reindex_embeds_only_changed_trip(self):
+        """Only the trip whose content changed is re-embedded; its old chunk is deactivated"""
+        self.service.index_trips([make_trip(1, 'Ladakh'), make_trip(2, 'Spiti')])
+        self.service.embeddings.document_batches = []
+
+        result = self.service.index_trips([make_trip(1, 'Ladakh', price=30000), make_trip(2, 'Spiti')])
+
+        self.assertEqual(result['skipped_count'], 1)
+        self.assertEqual(result['chunk_count'], 1)
+        self.assertEqual(result['deactivated_count'], 1)
+        self.assertEqual(len(self.service.embeddings.document_batches[0]), 1)
+        self.assertEqual(VectorDocument.objects.filter(source_id='1', is_active=True).count(), 1)
+
+    def test_reindex_replaces_fallback_embeddings(self):
+        """Chunks stored with fallback vectors after a failed batch are re-embedded on the next pass"""
+        from ai_agent.services import FALLBACK_EMBEDDING_MODEL
+
+        with patch.object(self.service.embeddings, 'embed_documents', side_effect=Exception('rate limited')):
+            self.service.index_trips([make_trip(1, 'Ladakh')])
+        self.assertEqual(VectorDocument.objects.get(source_id='1').embedding_model, FALLBACK_EMBEDDING_MODEL)
+
+        result = self.service.index_trips([make_trip(1, 'Ladakh')])
+
+        document = VectorDocument.objects.get(source_id='1', is_active=True)
+        self.assertEqual(result['chunk_count'], 1)
+        self.assertEqual(result['deactivated_count'], 1)
+        self.assertEqual(document.embedding_model, self.service.embedding_model)
+        self.assertEqual(len(self.service.embeddings.document_batches), 1)
+
+    def test_populate_deactivates_unpublished_trips(self):
+        """Chunks for trips that are no longer published are deactivated"""
+        from trips.models import Trip
+
+        published = Trip.objects.create(
+            slug='ladakh', title='Ladakh', description='High passes', price=35000,
+            duration=7, difficulty='challenging', status='published'
+        )
+        self.service.index_trips([make_trip(999, 'Removed trip')])
+
+        result = self.service.populate_trip_vector_store()
+
+        self.assertEqual(result['success_count'], 1)
+        self.assertEqual(result['deactivated_count'], 1)
+        self.assertFalse(VectorDocument.objects.filter(source_id='999', is_active=True).exists())
+        self.assertTrue(VectorDocument.objects.filter(source_id=str(published.id), is_active=True).exists())
+
+
+class EmbeddingCacheTestCase(TestCase):
+    def setUp(self):
+        """Set up a small cache in front of fake embeddings"""
+        from ai_agent.embedding_cache import EmbeddingCache, CachedEmbeddings
+
+        self.cache = EmbeddingCache(max_size=2, ttl=60, use_shared=False)
+        self.fake = FakeEmbeddings()
+        self.embeddings = CachedEmbeddings(self.fake, 'test-model', cache_instance=self.cache)
+
+    def test_normalised_queries_share_an_entry(self):
+        """Case and whitespace differences hit the same cache entry"""
+        first = self.embeddings.embed_query('Ladakh  bike trip')
+        second = self.embeddings.embed_query(' ladakh bike TRIP ')
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.fake.queries), 1)
+        self.assertEqual(self.cache.stats()['local_hits'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        """The cache holds at most max_size entries"""
+        self.embeddings.embed_query('ladakh')
+        self.embeddings.embed_query('goa')
+        self.embeddings.embed_query('ladakh')
+        self.embeddings.embed_query('spiti')
+        self.embeddings.embed_query('goa')
+
+        self.assertEqual(self.fake.queries, ['ladakh', 'goa', 'spiti', 'goa'])
+        self.assertEqual(self.cache.stats()['size'], 2)
+
+    def test_expired_entries_are_recomputed(self):
+        """Entries older than the TTL count as misses"""
+        self.cache.ttl = 0
+        self.embeddings.embed_query('ladakh')
+        self.embeddings.embed_query('ladakh')
+
+        self.assertEqual(len(self.fake.queries), 2)
+
+    def test_shared_cache_serves_other_processes(self):
+        """A fresh local cache falls back to the shared Django cache"""
+        from ai_agent.embedding_cache import EmbeddingCache
+
+        self.cache.use_shared = True
+        expected = self.embeddings.embed_query('ladakh')
+        other = EmbeddingCache(max_size=2, ttl=60, use_shared=True)
+
+        np.testing.assert_allclose(other.get('Ladakh', 'test-model'), expected, rtol=1e-6)
+        self.assertEqual(other.stats()['shared_hits'], 1)
+        self.assertIsNone(other.get('ladakh', 'other-model'))
+
+
+class FakeLLM:
+    """Chat model stand-in that counts invocations"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        return type('Response', (), {'content': f"Answer {self.calls}"})()
+
+    def stream(self, messages):
+        self.calls += 1
+        for part in ['Answer', ' ', str(self.calls)]:
+            yield type('Chunk', (), {'content': part})()
+
+    async def ainvoke(self, messages):
+        return self.invoke(messages)
+
+
+class SemanticResponseCacheTestCase(TestCase):
+    def setUp(self):
+        """Set up an indexed trip and a RAG service with fake models"""
+        from ai_agent.services import RAGService
+        from ai_agent.response_cache import response_cache
+        from ai_agent.vector_index import vector_index
+        from ai_agent.lexical_index import lexical_index
+
+        self.cache = response_cache
+        self.cache.clear()
+        vector_index.refresh_interval = 0
+        lexical_index.refresh_interval = 0
+
+        self.service = RAGService()
+        self.service.embeddings = FakeEmbeddings()
+        self.service.llm = FakeLLM()
+        self.service.index_trips([make_trip(1, 'Ladakh')])
+
+    def test_similar_query_reuses_answer(self):
+        """A repeated question is answered without calling the LLM"""
+        from ai_agent.models import RAGQuery
+
+        first = self.service.process_query('Ladakh mountains trip', top_k=1)
+        second = self.service.process_query('ladakh   mountains trip', top_k=1)
+
+        self.assertEqual(self.service.llm.calls, 1)
+        self.assertEqual(second['response'], first['response'])
+        self.assertTrue(second['cached'])
+        self.assertTrue(RAGQuery.objects.get(id=second['query_id']).cache_hit)
+
+    def test_changed_documents_invalidate_answer(self):
+        """Re-indexing the retrieved trip forces a fresh answer"""
+        self.service.process_query('Ladakh mountains trip', top_k=1)
+        self.service.index_trips([make_trip(1, 'Ladakh', price=30000)])
+
+        response = self.service.process_query('Ladakh mountains trip', top_k=1)
+
+        self.assertEqual(self.service.llm.calls, 2)
+        self.assertEqual(response['response'], 'Answer 2')
+
+    def test_dissimilar_query_misses(self):
+        """Queries below the similarity threshold are not served from cache"""
+        self.service.process_query('Ladakh mountains trip', top_k=1)
+        self.service.process_query('What is the refund policy for cancellations', top_k=1)
+
+        self.assertEqual(self.service.llm.calls, 2)
+
+
+class VectorIndexFilterTestCase(TestCase):
+    def setUp(self):
+        """Set up trip chunks with different prices, durations and tags"""
+        self._create_document('Ladakh', [1.0, 0.0], price=35000, duration=7, difficulty='Challenging', tags=['mountains'])
+        self._create_document('Goa', [0.9, 0.1], price=15000, duration=4, difficulty='easy', tags=['beach'])
+        self._create_document('Spiti', [0.8, 0.2], price=22000, duration=8, difficulty='moderate', tags=['mountains', 'culture'])
+        self._create_document('Refunds', [1.0, 0.0], source_type='policy')
+
+        self.index = VectorIndex(refresh_interval=0)
+
+    def _create_document(self, title, embedding, source_type='trip', **metadata):
+        document = VectorDocument(
+            content=f"{title} content", title=title, source_type=source_type,
+            source_id=title.lower(), metadata=metadata
+        )
+        document.set_embedding(embedding)
+        document.save()
+
+    def _titles(self, filters):
+        return [r['title'] for r in self.index.search([1.0, 0.0], top_k=5, filters=filters)]
+
+    def test_price_and_duration_filters(self):
+        """Numeric ranges exclude rows outside the range and rows without the field"""
+        self.assertEqual(self._titles({'max_price': 25000}), ['Goa', 'Spiti'])
+        self.assertEqual(self._titles({'min_duration': 5, 'max_duration': 7}), ['Ladakh'])
+
+    def test_difficulty_tags_and_source_type_filters(self):
+        """Categorical filters are case-insensitive and tags match any requested tag"""
+        self.assertEqual(self._titles({'difficulty': ['challenging', 'EASY']}), ['Ladakh', 'Goa'])
+        self.assertEqual(self._titles({'tags': ['culture', 'beach']}), ['Goa', 'Spiti'])
+        self.assertEqual(self._titles({'source_type': 'policy'}), ['Refunds'])
+        self.assertEqual(self._titles({'tags': ['desert']}), [])
+
+
+class LexicalIndexTestCase(TestCase):
+    def setUp(self):
+        """Set up a few text-only documents"""
+        from ai_agent.lexical_index import LexicalIndex
+
+        self.ladakh = VectorDocument.objects.create(
+            content='Trekking over high passes and staying in monasteries', title='Ladakh',
+            source_type='trip', source_id='ladakh', metadata={'price': 35000}
+        )
+        VectorDocument.objects.create(
+            content='Beaches, seafood and a relaxed stay by the sea', title='Goa',
+            source_type='trip', source_id='goa', metadata={'price': 15000}
+        )
+        VectorDocument.objects.create(
+            content='Refunds are processed within seven days of cancellation', title='Refund policy',
+            source_type='policy', source_id='refunds'
+        )
+
+        self.index = LexicalIndex(refresh_interval=0)
+
+    def test_stemmed_terms_match(self):
+        """Inflected query words match their stems in the documents"""
+        from ai_agent.lexical_index import tokenize
+
+        self.assertEqual(tokenize('Treks and stays'), ['trek', 'stay'])
+        results = self.index.search('trek stays', top_k=5)
+
+        self.assertEqual(results[0]['title'], 'Ladakh')
+        self.assertEqual(results[0]['similarity'], 1.0)
+
+    def test_documents_without_shared_terms_are_not_returned(self):
+        """Only documents in the query terms' postings are scored"""
+        titles = [r['title'] for r in self.index.search('refund', top_k=5)]
+
+        self.assertEqual(titles, ['Refund policy'])
+        self.assertEqual(self.index.search('the and of', top_k=5), [])
+
+    def test_incremental_updates_and_filters(self):
+        """Changed and deactivated documents are reflected without a rebuild"""
+        self.index.rebuild()
+        VectorDocument.objects.create(
+            content='Trekking through apple orchards', title='Himachal',
+            source_type='trip', source_id='himachal', metadata={'price': 18000}
+        )
+        VectorDocument.objects.filter(id=self.ladakh.id).update(is_active=False, updated_at=timezone.now())
+
+        self.assertEqual([r['title'] for r in self.index.search('trekking', top_k=5)], ['Himachal'])
+        self.assertEqual(self.index.search('trekking', top_k=5, filters={'max_price': 10000}), [])
+        self.assertEqual(len(self.index), 3)
+
+    def test_late_commits_behind_the_watermark_are_picked_up(self):
+        """An edit committed late, with updated_at older than the watermark, is still applied once"""
+        self.index.rebuild()
+        VectorDocument.objects.filter(id=self.ladakh.id).update(
+            content='Trekking to Everest base camp',
+            updated_at=self.index._synced_until - timedelta(seconds=1)
+        )
+        version = self.index.version
+
+        self.index.refresh(force=True)
+        self.index.refresh(force=True)
+
+        self.assertEqual([r['title'] for r in self.index.search('everest', top_k=5)], ['Ladakh'])
+        self.assertEqual(self.index.version, version + 1)
+
+    def test_updates_leave_earlier_snapshots_untouched(self):
+        """Searches score a snapshot outside the lock, so updates replace postings instead of editing them"""
+        self.index.rebuild()
+        postings = self.index._postings
+        VectorDocument.objects.filter(id=self.ladakh.id).update(is_active=False, updated_at=timezone.now())
+
+        self.index.refresh(force=True)
+
+        self.assertIn(str(self.ladakh.id), postings['trek'])
+        self.assertNotIn('trek', self.index._postings)
+
+
+class HybridRetrievalTestCase(TestCase):
+    def setUp(self):
+        """Set up indexed trips and a RAG service with fake models"""
+        from ai_agent.services import RAGService
+        from ai_agent.response_cache import response_cache
+        from ai_agent.vector_index import vector_index
+        from ai_agent.lexical_index import lexical_index
+
+        response_cache.clear()
+        vector_index.refresh_interval = 0
+        lexical_index.refresh_interval = 0
+
+        self.service = RAGService()
+        self.service.embeddings = FakeEmbeddings()
+        self.service.llm = FakeLLM()
+        self.service.index_trips([make_trip(1, 'Ladakh'), make_trip(2, 'Goa', description='Beach shacks and seafood')])
+
+    def test_reciprocal_rank_fusion_rewards_agreement(self):
+        """Documents ranked by both retrievers beat a single first place"""
+        from ai_agent.retrieval import reciprocal_rank_fusion
+
+        fused = reciprocal_rank_fusion({
+            'vector': [{'id': 'a', 'similarity': 0.9}, {'id': 'b', 'similarity': 0.8}],
+            'lexical': [{'id': 'c', 'score': 7.5, 'similarity': 1.0}, {'id': 'b', 'score': 3.0, 'similarity': 0.4}],
+        }, top_k=2, k=60)
+
+        self.assertEqual(fused[0]['id'], 'b')
+        self.assertEqual(fused[0]['retrievers'], ['vector', 'lexical'])
+        self.assertAlmostEqual(fused[0]['rrf_score'], 2 / 62)
+        self.assertEqual(
+            (fused[0]['vector_rank'], fused[0]['vector_score'], fused[0]['lexical_rank'], fused[0]['lexical_score']),
+            (2, 0.8, 2, 3.0)
+        )
+        self.assertNotIn('similarity', fused[0])
+
+    def test_process_query_records_search_timings(self):
+        """Search time and per-stage latencies are stored on the RAGQuery"""
+        from ai_agent.models import RAGQuery
+
+        response = self.service.process_query('beach seafood', top_k=1)
+
+        rag_query = RAGQuery.objects.get(id=response['query_id'])
+        self.assertGreater(rag_query.search_time, 0)
+        self.assertTrue({'sync', 'embed', 'vector', 'lexical', 'fusion', 'total'} <= set(rag_query.search_timings))
+        self.assertEqual(rag_query.retrieved_documents[0]['title'], 'Goa')
+        self.assertIn('rrf_score', rag_query.retrieved_documents[0])
+        self.assertNotIn('similarity', rag_query.retrieved_documents[0])
+
+    def test_failed_query_keeps_search_timings(self):
+        """A query that fails after retrieval still records how long the search took"""
+        from ai_agent.models import RAGQuery
+
+        self.service.llm = None
+        with self.assertRaises(Exception):
+            self.service.process_query('beach seafood', top_k=1)
+
+        for rag_query in RAGQuery.objects.filter(response=''):
+            self.assertGreater(rag_query.search_time, 0)
+            self.assertIn('fusion', rag_query.search_timings)
+
+
+class ChunkingTestCase(TestCase):
+    def _itinerary(self, days):
+        lines = ['Trip Title: Spiti', 'Itinerary:']
+        lines += [f"Day {i}: Drive to camp {i} - Cross the river and set up camp near the monastery." for i in range(1, days + 1)]
+        return '\n'.join(lines)
+
+    def test_chunks_respect_token_budget_and_report_counts(self):
+        """Every chunk fits the budget and carries its own token count"""
+        from ai_agent.chunking import chunk_text, count_tokens
+
+        chunks = chunk_text(self._itinerary(12), max_tokens=60, overlap_tokens=0)
+
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            self.assertLessEqual(chunk['token_count'], 60)
+            self.assertEqual(chunk['token_count'], count_tokens(chunk['text']))
+
+    def test_itinerary_days_are_not_split(self):
+        """Each day line appears whole inside a chunk"""
+        from ai_agent.chunking import chunk_text
+
+        chunks = chunk_text(self._itinerary(12), max_tokens=60, overlap_tokens=0)
+        lines = [line for chunk in chunks for line in chunk['text'].split('\n')]
+
+        for i in range(1, 13):
+            self.assertIn(
+                f"Day {i}: Drive to camp {i} - Cross the river and set up camp near the monastery.", lines
+            )
+
+    def test_overlap_repeats_trailing_units(self):
+        """Consecutive chunks share their boundary lines when overlap is enabled"""
+        from ai_agent.chunking import chunk_text
+
+        chunks = chunk_text(self._itinerary(12), max_tokens=60, overlap_tokens=25)
+
+        for previous, current in zip(chunks, chunks[1:]):
+            self.assertEqual(previous['text'].split('\n')[-1], current['text'].split('\n')[0])
+
+    def test_oversized_sentence_is_split_into_word_windows(self):
+        """A single sentence longer than the budget is still bounded"""
+        from ai_agent.chunking import chunk_text
+
+        chunks = chunk_text(' '.join(['mountain'] * 400), max_tokens=50, overlap_tokens=0)
+
+        self.assertTrue(all(chunk['token_count'] <= 50 for chunk in chunks))
+        self.assertEqual(sum(chunk['text'].count('mountain') for chunk in chunks), 400)
+
+
+class ContextPackerTestCase(TestCase):
+    def _doc(self, doc_id, source_id, content, similarity, **metadata):
+        return {
+            'id': doc_id, 'title': f"Trip {source_id} (Part 1)", 'source_type': 'trip',
+            'source_id': source_id, 'content': content, 'similarity': similarity, 'metadata': metadata,
+        }
+
+    def test_overlapping_chunks_from_one_source_are_merged(self):
+        """Lines repeated by chunk overlap appear once under a single heading"""
+        from ai_agent.context_packer import pack_context
+
+        packed = pack_context('What happens on day 2?', [
+            self._doc(1, 'ladakh', 'Day 1: Arrive in Leh\nDay 2: Visit Hemis', 0.9),
+            self._doc(2, 'ladakh', 'Day 2: Visit Hemis\nDay 3: Cross Khardung La', 0.8),
+        ])
+
+        self.assertEqual(packed['context'].count('Day 2: Visit Hemis'), 1)
+        self.assertEqual(packed['context'].count('## Trip ladakh'), 1)
+        self.assertEqual(len(packed['documents']), 2)
+
+    def test_budget_is_filled_greedily_by_score(self):
+        """Higher-scoring chunks win and chunks that do not fit are skipped"""
+        from ai_agent.context_packer import pack_context
+
+        packed = pack_context('tell me about treks', [
+            self._doc(1, 'low', 'short', 0.1),
+            self._doc(2, 'long', 'word ' * 200, 0.5),
+            self._doc(3, 'best', 'Best trek details', 0.9),
+        ], max_tokens=40)
+
+        self.assertEqual([doc['id'] for doc in packed['documents']], [3, 1])
+        self.assertLessEqual(packed['token_count'], 40)
+        self.assertEqual(packed['skipped_count'], 1)
+
+    def test_only_relevant_metadata_is_rendered(self):
+        """Metadata appears compactly and only for fields the query mentions"""
+        from ai_agent.context_packer import pack_context
+
+        document = self._doc(1, 'spiti', 'Spiti circuit', 0.9, price=22000, duration=8, difficulty='moderate', trip_id='7')
+
+        priced = pack_context('How much does it cost?', [document])['context']
+        plain = pack_context('Tell me about Spiti', [document])['context']
+
+        self.assertIn('₹22,000', priced)
+        self.assertNotIn('8 days', priced)
+        self.assertNotIn('₹', plain)
+        self.assertNotIn('trip_id', priced + plain)
+
+
+class StreamingResponseTestCase(TestCase):
+    def setUp(self):
+        """Set up an indexed trip and a RAG service with fake models"""
+        from ai_agent.services import RAGService
+        from ai_agent.response_cache import response_cache
+        from ai_agent.vector_index import vector_index
+        from ai_agent.lexical_index import lexical_index
+
+        response_cache.clear()
+        vector_index.refresh_interval = 0
+        lexical_index.refresh_interval = 0
+
+        self.service = RAGService()
+        self.service.embeddings = FakeEmbeddings()
+        self.service.llm = FakeLLM()
+        self.service.index_trips([make_trip(1, 'Ladakh')])
+
+    def test_rag_stream_yields_tokens_then_persists_query(self):
+        """Tokens arrive one by one and the RAGQuery is saved when the stream ends"""
+        from ai_agent.models import RAGQuery
+
+        events = list(self.service.stream_query('Ladakh mountains trip', top_k=1))
+
+        self.assertEqual([e['event'] for e in events], ['start', 'token', 'token', 'token', 'done'])
+        self.assertEqual(''.join(e['content'] for e in events if e['event'] == 'token'), 'Answer 1')
+        rag_query = RAGQuery.objects.get(id=events[-1]['query_id'])
+        self.assertEqual(rag_query.response, 'Answer 1')
+        self.assertIsNotNone(rag_query.time_to_first_token)
+
+    def test_rag_stream_serves_cached_answer(self):
+        """A repeated question streams the cached answer without calling the LLM"""
+        list(self.service.stream_query('Ladakh mountains trip', top_k=1))
+        events = list(self.service.stream_query('ladakh mountains trip', top_k=1))
+
+        self.assertEqual(self.service.llm.calls, 1)
+        self.assertTrue(events[-1]['cached'])
+
+    def test_chat_stream_saves_conversation(self):
+        """The streamed exchange is appended to the conversation once complete"""
+        from ai_agent.models import AIConversation
+        from ai_agent.services import AIService
+
+        ai_service = AIService()
+        with patch.object(llm_clients, 'get', return_value=FakeLLM()):
+            events = list(ai_service.stream_chat_with_agent(message='Hello there'))
+
+        self.assertEqual(events[0]['event'], 'start')
+        self.assertEqual(events[-1]['event'], 'done')
+        conversation = AIConversation.objects.get(session_id=events[0]['session_id'])
+        self.assertEqual([m['content'] for m in conversation.messages], ['Hello there', 'Answer 1'])
+
+
+class AsyncExecutionTestCase(TestCase):
+    def setUp(self):
+        """Set up an indexed trip and a RAG service with fake models"""
+        from ai_agent.services import RAGService
+        from ai_agent.response_cache import response_cache
+        from ai_agent.vector_index import vector_index
+        from ai_agent.lexical_index import lexical_index
+
+        response_cache.clear()
+        vector_index.refresh_interval = 0
+        lexical_index.refresh_interval = 0
+
+        self.service = RAGService()
+        self.service.embeddings = FakeEmbeddings()
+        self.service.llm = FakeLLM()
+        self.service.index_trips([make_trip(1, 'Ladakh')])
+
+    def test_async_rag_query_matches_sync_path(self):
+        """aprocess_query retrieves, answers and logs like process_query, then hits the cache"""
+        from asgiref.sync import async_to_sync
+        from ai_agent.models import RAGQuery
+
+        result = async_to_sync(self.service.aprocess_query)('Ladakh mountains trip', top_k=1)
+        self.assertEqual(result['response'], 'Answer 1')
+        self.assertEqual(result['context_documents'], 1)
+        self.assertTrue(RAGQuery.objects.filter(id=result['query_id']).exists())
+
+        cached = async_to_sync(self.service.aprocess_query)('ladakh mountains trip', top_k=1)
+        self.assertTrue(cached['cached'])
+        self.assertEqual(self.service.llm.calls, 1)
+
+    def test_failed_async_embedding_falls_back_to_keyword_search(self):
+        """When aembed_query fails, retrieval is lexical only and never calls the sync embedder"""
+        from asgiref.sync import async_to_sync
+        from ai_agent.models import RAGQuery
+
+        with patch.object(self.service.embeddings, 'aembed_query', side_effect=Exception('timeout')):
+            result = async_to_sync(self.service.aprocess_query)('Ladakh mountains trip', top_k=1)
+
+        self.assertEqual(self.service.embeddings.queries, [])
+        self.assertEqual(result['response'], 'Answer 1')
+        self.assertEqual(result['context_documents'], 1)
+        self.assertIn('lexical', RAGQuery.objects.get(id=result['query_id']).search_timings)
+
+    def test_async_chat_saves_conversation(self):
+        """achat_with_agent awaits the model and appends both turns"""
+        from asgiref.sync import async_to_sync
+        from ai_agent.models import AIConversation
+        from ai_agent.services import AIService
+
+        ai_service = AIService()
+        with patch.object(llm_clients, 'get', return_value=FakeLLM()):
+            result = async_to_sync(ai_service.achat_with_agent)(message='Hello there')
+
+        self.assertEqual(result['response'], 'Answer 1')
+        conversation = AIConversation.objects.get(session_id=result['session_id'])
+        self.assertEqual([m['content'] for m in conversation.messages], ['Hello there', 'Answer 1'])
+
+
+class BatchSentimentLLM:
+    """Answers batched sentiment prompts, leaving out the given message texts"""
+
+    def __init__(self, drop=()):
+        self.drop = set(drop)
+        self.batches = []
+
+    def invoke(self, messages):
+        payload = json.loads(messages[-1].content.split('Messages: ', 1)[1].split('\n\n', 1)[0])
+        self.batches.append([item['text'] for item in payload])
+        reply = [
+            {'i': item['i'], 'sentiment': 'negative' if 'late' in item['text'] else 'positive',
+             'confidence': 0.9, 'positive': 0.8, 'negative': 0.1, 'neutral': 0.1}
+            for item in payload if item['text'] not in self.drop
+        ]
+        self.drop -= set(self.batches[-1])
+        return type('Response', (), {'content': f"```json\n{json.dumps(reply)}\n```"})()
+
+
+class BulkSentimentTestCase(TestCase):
+    @override_settings(AI_SENTIMENT_BATCH_SIZE=2, AI_SENTIMENT_CONCURRENCY=2)
+    def test_batches_messages_and_bulk_saves_results(self):
+        """Messages share prompts, keep their order and are saved with one log per batch"""
+        from ai_agent.models import AISentimentAnalysis, AIProcessingLog
+        from ai_agent.services import AIService
+
+        ai_service = AIService()
+        llm = BatchSentimentLLM(drop=['Bus was late'])
+        messages = [
+            {'id': 1, 'content': 'Loved the trek'},
+            {'id': 2, 'content': 'Bus was late'},
+            {'id': 3, 'content': 'Great guide'},
+            {'id': 4, 'content': 'Amazing views'},
+            {'id': 5, 'content': 'Food was good'},
+        ]
+
+        with patch.object(llm_clients, 'get', return_value=llm):
+            results = ai_service.bulk_analyze_sentiment(messages)
+
+        self.assertEqual([r['message_id'] for r in results], [1, 2, 3, 4, 5])
+        self.assertEqual(results[1]['sentiment'], 'negative')
+        # Three batches of up to two messages, plus a retry for the dropped one
+        self.assertEqual(len(llm.batches), 4)
+        self.assertEqual(llm.batches[-1], ['Bus was late'])
+        self.assertEqual(AISentimentAnalysis.objects.count(), 5)
+        self.assertEqual(AISentimentAnalysis.objects.get(message_id='2').sentiment, 'negative')
+        self.assertEqual(AIProcessingLog.objects.filter(operation_type='sentiment_analysis').count(), 4)
+
+    def test_parse_batch_response_falls_back_to_position(self):
+        """Replies without indexes map by position; invalid sentiments are dropped"""
+        from ai_agent.bulk_sentiment import parse_batch_response
+
+        reply = 'Here you go: [{"sentiment": "Positive", "confidence": 2}, {"sentiment": "great"}]'
+        analyses = parse_batch_response(reply, [7, 9])
+
+        self.assertEqual(list(analyses), [7])
+        self.assertEqual(analyses[7]['sentiment'], 'positive')
+        self.assertEqual(analyses[7]['confidence_score'], 1.0)
+
+
+@override_settings(OPENROUTER_API_KEY='test-key')
+class LLMClientRegistryTestCase(TestCase):
+    def test_clients_are_shared_per_configuration(self):
+        """Equal settings reuse one client; all clients share one connection pool"""
+        registry = LLMClientRegistry()
+
+        first = registry.get('model-a', 0.2, 500)
+        self.assertIs(registry.get('model-a', 0.2, 500), first)
+        other = registry.get('model-a', 0.7, 500)
+
+        self.assertIsNot(other, first)
+        self.assertEqual(other.temperature, 0.7)
+        self.assertEqual(first.temperature, 0.2)
+        self.assertIs(other.http_client, first.http_client)
+        # Async clients are per ChatOpenAI; a shared one would outlive the event loop it was bound to
+        self.assertIsNone(first.http_async_client)
+        self.assertEqual(registry.stats(), {'clients': 2, 'created': 2, 'reused': 1})
+        registry.clear()
+
+    @override_settings(OPENROUTER_API_KEY='')
+    def test_no_client_without_api_key(self):
+        """Without an API key there is nothing to create"""
+        self.assertIsNone(LLMClientRegistry().get('model-a', 0.2, 500))
+
+
+class ConversationMemoryTestCase(TestCase):
+    def setUp(self):
+        """Set up a conversation with twenty 10-token turns"""
+        from ai_agent.models import AIConversation
+        from ai_agent.services import AIService
+
+        # Fixed token counts, whether or not the real tokenizer is available
+        patcher = patch('ai_agent.conversation_memory.count_tokens', lambda text: len(text) // 4)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        agent = AIService()._get_or_create_default_agent()
+        self.conversation = AIConversation.objects.create(agent=agent, session_id='long-chat')
+        for i in range(20):
+            self.conversation.add_message('user' if i % 2 == 0 else 'assistant', f"turn {i:02d} " + 'x' * 16)
+
+    def test_history_is_bounded_and_older_turns_are_summarized(self):
+        """Over budget, old turns fold into the summary and only recent ones are sent"""
+        from ai_agent.conversation_memory import ConversationMemory
+
+        memory = ConversationMemory(history_tokens=100, recent_tokens=40, summary_tokens=50)
+        llm = FakeLLM()
+        self.assertTrue(memory.needs_summary(self.conversation))
+
+        memory.update_summary(self.conversation, llm)
+        messages = memory.build_messages(self.conversation)
+
+        self.conversation.refresh_from_db()
+        self.assertEqual(llm.calls, 1)
+        self.assertEqual(self.conversation.summary, 'Answer 1')
+        self.assertEqual(self.conversation.summarized_count, 16)
+        self.assertIn('Answer 1', messages[0].content)
+        self.assertEqual([m.content[:7] for m in messages[1:]], ['turn 16', 'turn 17', 'turn 18', 'turn 19'])
+
+        # Under budget again: no further summarisation until the history grows
+        self.assertFalse(memory.needs_summary(self.conversation))
+
+    def test_building_the_prompt_never_summarizes(self):
+        """An over-budget history is trimmed to the most recent turns that fit, without an LLM call"""
+        from ai_agent.conversation_memory import ConversationMemory
+
+        messages = ConversationMemory(history_tokens=100).build_messages(self.conversation)
+
+        self.assertEqual(len(messages), 10)
+        self.assertEqual(messages[-1].content[:7], 'turn 19')
+        self.conversation.refresh_from_db()
+        self.assertEqual((self.conversation.summary, self.conversation.summarized_count), ('', 0))
+
+    def test_history_reads_at_most_max_messages_rows(self):
+        """A generous token budget still reads a fixed number of rows"""
+        from ai_agent.conversation_memory import ConversationMemory
+
+        memory = ConversationMemory(history_tokens=100000, max_messages=6)
+        with self.assertNumQueries(1):
+            messages = memory.build_messages(self.conversation)
+
+        self.assertEqual([m.content[:7] for m in messages], [f"turn {i}" for i in range(14, 20)])
+        self.assertTrue(memory.needs_summary(self.conversation))
+
+
+class ConversationMessageTestCase(TestCase):
+    def setUp(self):
+        """Set up an empty conversation"""
+        from ai_agent.models import AIConversation
+        from ai_agent.services import AIService
+
+        agent = AIService()._get_or_create_default_agent()
+        self.conversation = AIConversation.objects.create(agent=agent, session_id='rows')
+
+    def test_add_message_is_one_insert_and_one_update(self):
+        """Appending never rewrites earlier messages"""
+        for i in range(5):
+            self.conversation.add_message('user', f"message {i}")
+
+        with self.assertNumQueries(2):
+            self.conversation.add_message('assistant', 'reply', {'agent_type': 'faq'})
+
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.message_count, 6)
+        self.assertEqual(self.conversation.turns.count(), 6)
+
+    def test_history_keeps_the_json_shape(self):
+        """messages and recent_messages return the old dicts, oldest first"""
+        for i in range(5):
+            self.conversation.add_message('user' if i % 2 == 0 else 'assistant', f"message {i}")
+
+        self.assertEqual([m['content'] for m in self.conversation.messages], [f"message {i}" for i in range(5)])
+        self.assertEqual(set(self.conversation.messages[0]), {'role', 'content', 'timestamp', 'metadata'})
+        with self.assertNumQueries(1):
+            recent = self.conversation.recent_messages(2)
+        self.assertEqual([m['content'] for m in recent], ['message 3', 'message 4'])
@@ -20,6 +20,8 @@ urlpatterns = [
 
     # AI Operation URLs
     path('chat/', views.ai_chat, name='ai-chat'),
+    path('chat/stream/', views.ai_chat_stream, name='ai-chat-stream'),
+    path('chat/async/', views.ai_chat_async, name='ai-chat-async'),
     path('redraft-message/', views.ai_redraft_message, name='ai-redraft-message'),
     path('analyze-sentiment/', views.ai_analyze_sentiment, name='ai-analyze-sentiment'),
     path('generate-content/', views.ai_generate_content, name='ai-generate-content'),
@@ -27,6 +29,8 @@ urlpatterns = [
 
     # RAG Operation URLs
     path('rag-query/', views.rag_query, name='rag-query'),
+    path('rag-query/stream/', views.rag_query_stream, name='rag-query-stream'),
+    path('rag-query/async/', views.rag_query_async, name='rag-query-async'),
     path('populate-vector-store/', views.populate_vector_store, name='populate-vector-store'),
 
     # Analytics URLs
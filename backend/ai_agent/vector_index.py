@@ -0,0 +1,185 @@
+import logging
+from typing import Dict, Any, Optional, List
+
+import numpy as np
+
+from .document_index import SyncedDocumentIndex, _as_list, _as_number
+from .models import unpack_embedding
+
+logger = logging.getLogger(__name__)
+
+
+class VectorIndex(SyncedDocumentIndex):
+    """
+    Process-local similarity index over active VectorDocument embeddings.
+
+    All embeddings are kept as one L2-normalised float32 matrix with parallel
+    id/document arrays, so a query is a single matrix-vector product followed
+    by an argpartition for the top-k rows.
+
+    Price, duration, difficulty, tags and source type are also kept as
+    column arrays (tags as one boolean mask per tag), so structured filters
+    reduce the candidate rows before any similarity is computed.
+    """
+
+    LOAD_FIELDS = SyncedDocumentIndex.LOAD_FIELDS + ('embedding_vector', 'embedding_dtype', 'embedding')
+
+    def __len__(self):
+        return len(self._ids)
+
+    @property
+    def dimension(self) -> int:
+        return self._matrix.shape[1] if self._matrix.ndim == 2 else 0
+
+    # Loading and synchronisation
+
+    def _reset(self):
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._ids: List[str] = []
+        self._documents: List[Dict[str, Any]] = []
+        self._columns = self._build_columns([])
+
+    def _prepare(self, row: Dict[str, Any]) -> Optional[np.ndarray]:
+        """Decode a row's embedding, preferring the packed binary column"""
+        if row['embedding_vector']:
+            return unpack_embedding(row['embedding_vector'], row['embedding_dtype'])
+        if row['embedding']:
+            # Rows written before the binary column existed
+            return np.asarray(row['embedding'], dtype=np.float32)
+        return None
+
+    def _update(self, upserts: Dict[str, tuple], removals: set, unindexed: set):
+        """Apply changes copy-on-write so concurrent searches keep a consistent snapshot"""
+        dropped = removals | unindexed
+        keep = [i for i, doc_id in enumerate(self._ids) if doc_id not in dropped and doc_id not in upserts]
+        dimension = self.dimension if keep else next(
+            (len(vector) for vector, _ in upserts.values()), self.dimension
+        )
+        ids = [self._ids[i] for i in keep]
+        documents = [self._documents[i] for i in keep]
+        vectors = [self._matrix[keep]] if keep else []
+
+        new_rows = []
+        for doc_id, (vector, document) in upserts.items():
+            if len(vector) != dimension:
+                self._skipped.add(doc_id)
+                logger.warning(
+                    f"Skipping vector document {doc_id}: dimension {len(vector)} does not match index dimension {dimension}"
+                )
+                continue
+            ids.append(doc_id)
+            documents.append(document)
+            new_rows.append(vector)
+
+        if new_rows:
+            block = np.vstack(new_rows).astype(np.float32, copy=False)
+            norms = np.linalg.norm(block, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            vectors.append(block / norms)
+
+        matrix = np.vstack(vectors) if vectors else np.zeros((0, dimension), dtype=np.float32)
+
+        self._matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        self._ids = ids
+        self._documents = documents
+        self._columns = self._build_columns(documents)
+
+    def _build_columns(self, documents: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Extract the filterable metadata into arrays aligned with the matrix rows"""
+        metadata = [doc['metadata'] for doc in documents]
+        tag_masks = {}
+        for i, meta in enumerate(metadata):
+            for tag in _as_list(meta.get('tags') or []):
+                if tag not in tag_masks:
+                    tag_masks[tag] = np.zeros(len(documents), dtype=bool)
+                tag_masks[tag][i] = True
+
+        return {
+            'source_type': np.array([str(doc['source_type']).lower() for doc in documents], dtype=object),
+            'difficulty': np.array([str(meta.get('difficulty', '')).lower() for meta in metadata], dtype=object),
+            'price': np.array([_as_number(meta.get('price')) for meta in metadata], dtype=np.float64),
+            'duration': np.array([_as_number(meta.get('duration')) for meta in metadata], dtype=np.float64),
+            'tags': tag_masks,
+        }
+
+    def _filter_mask(self, columns: Dict[str, Any], size: int, filters: Dict[str, Any]) -> np.ndarray:
+        """Combine the structured filters into one boolean mask over the rows"""
+        mask = np.ones(size, dtype=bool)
+
+        if filters.get('source_type'):
+            mask &= np.isin(columns['source_type'], _as_list(filters['source_type']))
+        if filters.get('difficulty'):
+            mask &= np.isin(columns['difficulty'], _as_list(filters['difficulty']))
+
+        # Comparisons against NaN are False, so rows without the field drop out
+        with np.errstate(invalid='ignore'):
+            if filters.get('min_price') is not None:
+                mask &= columns['price'] >= filters['min_price']
+            if filters.get('max_price') is not None:
+                mask &= columns['price'] <= filters['max_price']
+            if filters.get('min_duration') is not None:
+                mask &= columns['duration'] >= filters['min_duration']
+            if filters.get('max_duration') is not None:
+                mask &= columns['duration'] <= filters['max_duration']
+
+        if filters.get('tags'):
+            tag_mask = np.zeros(size, dtype=bool)
+            for tag in _as_list(filters['tags']):
+                if tag in columns['tags']:
+                    tag_mask |= columns['tags'][tag]
+            mask &= tag_mask
+
+        return mask
+
+    # Querying
+
+    def search(
+        self,
+        query_embedding,
+        top_k: int = 5,
+        filters: Optional[Dict[str, Any]] = None,
+        sync: bool = True
+    ) -> List[Dict[str, Any]]:
+        """Return the top_k most similar documents matching the optional filters"""
+        if sync:
+            self.refresh()
+
+        with self._lock:
+            matrix = self._matrix
+            documents = self._documents
+            columns = self._columns
+
+        if not documents or top_k <= 0:
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        if query.shape[0] != matrix.shape[1]:
+            logger.warning(
+                f"Query dimension {query.shape[0]} does not match index dimension {matrix.shape[1]}"
+            )
+            return []
+
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return []
+
+        candidates = None
+        if filters:
+            mask = self._filter_mask(columns, len(documents), filters)
+            if not mask.all():
+                candidates = np.flatnonzero(mask)
+                if candidates.size == 0:
+                    return []
+                matrix = matrix[candidates]
+
+        scores = matrix @ (query / norm)
+        k = min(top_k, scores.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        rows = candidates[top] if candidates is not None else top
+
+        return [dict(documents[row], similarity=float(scores[i])) for i, row in zip(top, rows)]
+
+
+# Global instance
+vector_index = VectorIndex()
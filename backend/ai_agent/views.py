@@ -1,9 +1,15 @@
 from rest_framework import viewsets, status
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes, renderer_classes
+from rest_framework.renderers import BaseRenderer, JSONRenderer
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
 from django.db import models
+from django.http import StreamingHttpResponse, JsonResponse, HttpResponseNotAllowed
+from asgiref.sync import sync_to_async
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
 from .models import (
     AIAgent, AIConversation, AIMessageTemplate, AISentimentAnalysis,
     AIContentGeneration, AIProcessingLog, VectorDocument, RAGQuery
@@ -20,11 +26,76 @@ from .serializers import (
     VectorStorePopulateResponseSerializer
 )
 from .services import AIService, RAGService
+from .embedding_cache import embedding_cache
+from .response_cache import response_cache
+from .llm_clients import llm_clients
+import json
 import logging
+from functools import wraps
 
 logger = logging.getLogger(__name__)
 
 
+class EventStreamRenderer(BaseRenderer):
+    """Lets clients send Accept: text/event-stream; errors are rendered as JSON"""
+
+    media_type = 'text/event-stream'
+    format = 'sse'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, default=str).encode()
+
+
+def _authenticate(request):
+    """Authenticate a plain Django request with the DRF authentication classes"""
+    drf_request = Request(
+        request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    )
+    try:
+        user = drf_request.user
+    except APIException:
+        return None
+    return user if user and user.is_authenticated else None
+
+
+def async_post_view(view_func):
+    """
+    Async-safe replacement for @csrf_exempt/@require_POST on ASGI views:
+    POST only, token-authenticated with the DRF classes, JSON body parsed
+    """
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'POST':
+            return HttpResponseNotAllowed(['POST'])
+
+        user = await sync_to_async(_authenticate)(request)
+        if user is None:
+            return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return JsonResponse({'detail': 'Invalid JSON body.'}, status=400)
+
+        return await view_func(request, data, user, *args, **kwargs)
+
+    wrapper.csrf_exempt = True
+    return wrapper
+
+
+def _event_stream_response(events) -> StreamingHttpResponse:
+    """Serve service events as Server-Sent Events"""
+    def serialize():
+        for event in events:
+            name = event.pop('event')
+            yield f"event: {name}\ndata: {json.dumps(event, default=str)}\n\n"
+
+    response = StreamingHttpResponse(serialize(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Stop nginx from buffering the stream
+    return response
+
+
 class AIAgentViewSet(viewsets.ModelViewSet):
     """ViewSet for AI Agent management"""
 
@@ -76,15 +147,15 @@ class AIConversationViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return AIConversation.objects.filter(user=self.request.user)
+        return AIConversation.objects.filter(user=self.request.user).select_related(
+            'agent', 'user'
+        ).prefetch_related('turns')
 
     @action(detail=True, methods=['delete'])
     def clear_history(self, request, pk=None):
         """Clear conversation history"""
         conversation = self.get_object()
-        conversation.messages = []
-        conversation.message_count = 0
-        conversation.save()
+        conversation.clear_messages()
 
         return Response({'message': 'Conversation history cleared'})
 
@@ -203,6 +274,52 @@ def ai_chat(request):
         )
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@renderer_classes([JSONRenderer, EventStreamRenderer])
+def ai_chat_stream(request):
+    """Chat with an AI agent, streaming the response as Server-Sent Events"""
+    serializer = AIChatRequestSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    ai_service = AIService()
+    return _event_stream_response(ai_service.stream_chat_with_agent(
+        agent_id=None,  # Use default chatbot agent
+        message=serializer.validated_data['message'],
+        session_id=serializer.validated_data.get('session_id'),
+        context_data=serializer.validated_data.get('context_data', {}),
+        user=request.user
+    ))
+
+
+@async_post_view
+async def ai_chat_async(request, data, user):
+    """Chat with an AI agent without holding a worker thread during the LLM call (ASGI)"""
+    serializer = AIChatRequestSerializer(data=data)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=400)
+
+    try:
+        ai_service = AIService()
+        response_data = await ai_service.achat_with_agent(
+            agent_id=None,  # Use default chatbot agent
+            message=serializer.validated_data['message'],
+            session_id=serializer.validated_data.get('session_id'),
+            context_data=serializer.validated_data.get('context_data', {}),
+            user=user
+        )
+
+        response_serializer = AIChatResponseSerializer(data=response_data)
+        if response_serializer.is_valid():
+            return JsonResponse(response_serializer.validated_data)
+        return JsonResponse(response_serializer.errors, status=500)
+
+    except Exception as e:
+        logger.error(f"Error in async AI chat: {str(e)}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def ai_redraft_message(request):
@@ -448,7 +565,8 @@ def rag_query(request):
             query=serializer.validated_data['query'],
             session_id=serializer.validated_data.get('session_id'),
             top_k=serializer.validated_data.get('top_k', 5),
-            user=request.user
+            user=request.user,
+            filters=serializer.validated_data.get('filters')
         )
 
         response_serializer = RAGQueryResponseSerializer(data=response_data)
@@ -465,6 +583,52 @@ def rag_query(request):
         )
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@renderer_classes([JSONRenderer, EventStreamRenderer])
+def rag_query_stream(request):
+    """Process a RAG query, streaming the response as Server-Sent Events"""
+    serializer = RAGQueryRequestSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    rag_service = RAGService()
+    return _event_stream_response(rag_service.stream_query(
+        query=serializer.validated_data['query'],
+        session_id=serializer.validated_data.get('session_id'),
+        top_k=serializer.validated_data.get('top_k', 5),
+        user=request.user,
+        filters=serializer.validated_data.get('filters')
+    ))
+
+
+@async_post_view
+async def rag_query_async(request, data, user):
+    """Process a RAG query without holding a worker thread during the LLM call (ASGI)"""
+    serializer = RAGQueryRequestSerializer(data=data)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=400)
+
+    try:
+        rag_service = RAGService()
+        response_data = await rag_service.aprocess_query(
+            query=serializer.validated_data['query'],
+            session_id=serializer.validated_data.get('session_id'),
+            top_k=serializer.validated_data.get('top_k', 5),
+            user=user,
+            filters=serializer.validated_data.get('filters')
+        )
+
+        response_serializer = RAGQueryResponseSerializer(data=response_data)
+        if response_serializer.is_valid():
+            return JsonResponse(response_serializer.validated_data)
+        return JsonResponse(response_serializer.errors, status=500)
+
+    except Exception as e:
+        logger.error(f"Error processing async RAG query: {str(e)}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def populate_vector_store(request):
@@ -476,7 +640,9 @@ def populate_vector_store(request):
     try:
         rag_service = RAGService()
         result = rag_service.populate_vector_store(
-            source_type=serializer.validated_data.get('source_type', 'all')
+            source_type=serializer.validated_data.get('source_type', 'all'),
+            embedding_batch_size=serializer.validated_data.get('embedding_batch_size'),
+            force=serializer.validated_data.get('force', False)
         )
 
         response_serializer = VectorStorePopulateResponseSerializer(data=result)
@@ -527,7 +693,10 @@ def rag_stats(request):
             'total_queries': total_queries,
             'average_response_time': avg_response_time,
             'average_rating': avg_rating,
-            'recent_queries': recent_query_data
+            'recent_queries': recent_query_data,
+            'embedding_cache': embedding_cache.stats(),
+            'response_cache': response_cache.stats(),
+            'llm_clients': llm_clients.stats()
         })
 
     except Exception as e:
@@ -4,8 +4,12 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
 from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
 from messaging.custom_messaging_service import custom_messaging_service
-from messaging.models import MessageCampaign, Contact, Message
+from messaging.phone_numbers import normalize_numbers, duplicate_mask
+from messaging.models import MessageCampaign, ContactList, Contact, Message
+from messaging.tasks import materialize_campaign_task
 from messaging.serializers import MessageSerializer, ContactSerializer
 import logging
 
@@ -50,7 +54,7 @@ def send_message(request):
 
         # Send message
         result = custom_messaging_service.send_message(
-            phone_number=phone_number,
+            phone_number=validation['formatted_number'],
             message=message,
             campaign_id=campaign_id,
             attachment_url=attachment_url,
@@ -244,14 +248,16 @@ def get_campaign_messages(request, campaign_id):
 @permission_classes([IsAuthenticated])
 def create_campaign_with_messages(request):
     """
-    Create a campaign and send messages to contacts
+    Create a campaign for a list of phone numbers and start sending
+
+    Messages are prepared and sent in the background; poll the campaign
+    for prepared_messages and send progress.
 
     POST /api/messaging/create-campaign-send/
     {
         "campaign_name": "My Campaign",
-        "message_template": "Hello {{name}}!",
+        "message_template": "Hello {{phone}}!",
         "phone_numbers": ["+1234567890", "+0987654321"],
-        "priority": "normal",
         "use_ai_personalization": false
     }
     """
@@ -259,7 +265,6 @@ def create_campaign_with_messages(request):
         campaign_name = request.data.get('campaign_name')
         message_template = request.data.get('message_template')
         phone_numbers = request.data.get('phone_numbers', [])
-        priority = request.data.get('priority', 'normal')
         use_ai_personalization = request.data.get('use_ai_personalization', False)
 
         if not campaign_name or not message_template or not phone_numbers:
@@ -268,39 +273,68 @@ def create_campaign_with_messages(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Create campaign
-        campaign = MessageCampaign.objects.create(
-            name=campaign_name,
-            message_content=message_template,
-            created_by=request.user,
-            campaign_type='personalized' if use_ai_personalization else 'standard',
-            total_messages=len(phone_numbers)
-        )
+        # Normalize to E.164, drop invalid numbers and send to each number once
+        normalized = normalize_numbers(phone_numbers)
+        invalid_numbers = [number for number, is_valid in zip(phone_numbers, normalized['is_valid']) if not is_valid]
+        unique_numbers = normalized['e164'][normalized['is_valid'] & ~duplicate_mask(normalized['e164'])].tolist()
 
-        # Send messages
-        messages_to_send = []
-        for phone in phone_numbers:
-            messages_to_send.append({
-                'phone_number': phone,
-                'message': message_template,  # In real implementation, you'd personalize this
-                'priority': priority
-            })
-
-        bulk_result = custom_messaging_service.send_bulk_messages(
-            messages_to_send,
-            str(campaign.id)
-        )
+        if not unique_numbers:
+            return Response(
+                {'error': 'No valid phone numbers', 'invalid_numbers': invalid_numbers},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        with transaction.atomic():
+            # The numbers become a contact list of their own, so the campaign runs through the
+            # same preparation and dispatch pipeline as list-based campaigns
+            contact_list = ContactList.objects.create(
+                name=f"{campaign_name} recipients",
+                total_contacts=len(phone_numbers),
+                valid_contacts=len(unique_numbers),
+                invalid_contacts=len(invalid_numbers),
+                duplicate_contacts=len(phone_numbers) - len(invalid_numbers) - len(unique_numbers),
+                whatsapp_contacts=len(unique_numbers),
+                processed_rows=len(phone_numbers),
+                uploaded_by=request.user,
+                processed_at=timezone.now()
+            )
+            Contact.objects.bulk_create([
+                Contact(
+                    contact_list=contact_list,
+                    phone_number=phone_number,
+                    status='whatsapp_valid',
+                    whatsapp_status=True
+                )
+                for phone_number in unique_numbers
+            ])
+
+            # Create campaign; sending is paced by the dispatcher's global rate limit only
+            campaign = MessageCampaign.objects.create(
+                name=campaign_name,
+                message_content=message_template,
+                contact_list=contact_list,
+                created_by=request.user,
+                campaign_type='personalized' if use_ai_personalization else 'standard',
+                status='running',
+                delay_between_messages=0,
+                total_messages=len(unique_numbers),
+                messages_prepared=False
+            )
 
-        # Update campaign statistics
-        campaign.sent_messages = bulk_result['successful']
-        campaign.failed_messages = bulk_result['failed']
-        campaign.save()
+        # Prepare the messages in the background, then start sending
+        job = materialize_campaign_task.delay(campaign.id, start=True)
+        MessageCampaign.objects.filter(id=campaign.id).update(preparation_job_id=job.id)
 
         return Response({
             'campaign_id': campaign.id,
             'campaign_name': campaign.name,
-            'bulk_send_result': bulk_result
-        }, status=status.HTTP_201_CREATED)
+            'contact_list_id': contact_list.id,
+            'job_id': job.id,
+            'total_messages': len(unique_numbers),
+            'prepared_messages': 0,
+            'invalid_numbers': invalid_numbers,
+            'duplicates_removed': contact_list.duplicate_contacts
+        }, status=status.HTTP_202_ACCEPTED)
 
     except Exception as e:
         logger.error(f"Error in create_campaign_with_messages API: {str(e)}")
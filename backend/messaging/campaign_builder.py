@@ -0,0 +1,115 @@
+import re
+import logging
+from itertools import islice
+from typing import Dict, Any, Optional, Callable
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import MessageCampaign, Message
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER_PATTERN = re.compile(r'\{\{\s*([^{}]+?)\s*\}\}')
+
+
+def compile_template(content: str) -> Callable[..., str]:
+    """
+    Compile a message template into a renderer that fills every
+    {{placeholder}} in one pass. Fills {{name}}, {{phone}}, {{email}} and
+    the contact's custom fields; custom fields win over the built-in
+    names. Unknown placeholders are left as written.
+    """
+    parts = PLACEHOLDER_PATTERN.split(content)
+    # split() alternates literal text and placeholder names
+    literals = parts[0::2]
+    keys = parts[1::2]
+    originals = [match.group(0) for match in PLACEHOLDER_PATTERN.finditer(content)]
+
+    if not keys:
+        return lambda name, phone_number, email, custom_fields: content
+
+    def render(name, phone_number, email, custom_fields) -> str:
+        values = {
+            'name': name or 'Valued Customer',
+            'phone': phone_number,
+            'email': email or '',
+        }
+        if custom_fields:
+            values.update((key, str(value)) for key, value in custom_fields.items())
+
+        pieces = [literals[0]]
+        for key, original, literal in zip(keys, originals, literals[1:]):
+            pieces.append(values.get(key, original))
+            pieces.append(literal)
+        return ''.join(pieces)
+
+    return render
+
+
+def campaign_contacts(campaign: MessageCampaign):
+    """Contacts a campaign messages: the list's WhatsApp-valid numbers"""
+    return campaign.contact_list.contacts.filter(status='whatsapp_valid', whatsapp_status=True)
+
+
+def materialize_campaign(
+    campaign: MessageCampaign,
+    contacts=None,
+    chunk_size: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Create the campaign's queued Messages, one per contact.
+
+    Contacts are streamed with iterator() as plain value tuples, rendered
+    with the compiled template and inserted with bulk_create one chunk at
+    a time. After each chunk prepared_messages and pending_messages are
+    bumped so clients can poll progress. Contacts that already have a
+    message in the campaign are skipped, so a retried run picks up where
+    the last one stopped.
+    """
+    chunk_size = chunk_size or getattr(settings, 'CAMPAIGN_BUILD_CHUNK_SIZE', 2000)
+    contacts = campaign_contacts(campaign) if contacts is None else contacts
+    render = compile_template(campaign.message_content)
+
+    rows = (
+        contacts.exclude(id__in=campaign.messages.values('contact_id'))
+        .order_by()
+        .values_list('id', 'name', 'phone_number', 'email', 'custom_fields')
+        .iterator(chunk_size=chunk_size)
+    )
+
+    created = 0
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+
+        Message.objects.bulk_create([
+            Message(
+                campaign=campaign,
+                contact_id=contact_id,
+                content=render(name, phone_number, email, custom_fields),
+                attachment_url=campaign.attachment_url,
+                attachment_file=campaign.attachment_file
+            )
+            for contact_id, name, phone_number, email, custom_fields in chunk
+        ], batch_size=chunk_size)
+        created += len(chunk)
+
+        MessageCampaign.objects.filter(id=campaign.id).update(
+            prepared_messages=F('prepared_messages') + len(chunk),
+            pending_messages=F('pending_messages') + len(chunk),
+            updated_at=timezone.now()
+        )
+
+    total = campaign.messages.count()
+    MessageCampaign.objects.filter(id=campaign.id).update(
+        total_messages=total,
+        prepared_messages=total,
+        messages_prepared=True,
+        updated_at=timezone.now()
+    )
+    logger.info(f"Prepared {created} messages for campaign {campaign.id} ({total} in total)")
+
+    return {'created': created, 'total_messages': total}
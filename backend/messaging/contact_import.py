@@ -0,0 +1,215 @@
+import logging
+from itertools import islice
+from typing import Dict, Any, Optional, List, Iterator, Tuple
+
+import numpy as np
+import openpyxl
+import pandas as pd
+from django.conf import settings
+from django.utils import timezone
+
+from .models import ContactList, Contact
+from .phone_numbers import normalize_numbers, duplicate_mask, existing_numbers
+
+logger = logging.getLogger(__name__)
+
+STANDARD_FIELDS = ['phone_number', 'name', 'email']
+
+
+def _cell_to_str(value) -> str:
+    """Excel cell value as text; phone numbers typed as numbers lose their '.0'"""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _read_xlsx_chunks(file_path: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Stream an .xlsx sheet row by row in openpyxl read-only mode"""
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [
+            str(name).strip() if name is not None else f'Unnamed: {i}'
+            for i, name in enumerate(header)
+        ]
+
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            width = len(columns)
+            yield pd.DataFrame(
+                [
+                    [_cell_to_str(value) for value in row[:width]] + [''] * (width - len(row))
+                    for row in chunk
+                ],
+                columns=columns
+            )
+    finally:
+        workbook.close()
+
+
+def read_chunks(file_path: str, file_extension: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Yield the uploaded rows as DataFrames of text columns, chunk_size rows at a time"""
+    if file_extension == 'csv':
+        # dtype=str keeps leading zeros and '+' and stops numbers turning into floats
+        for chunk in pd.read_csv(file_path, dtype=str, chunksize=chunk_size):
+            yield chunk.fillna('')
+    elif file_extension == 'xlsx':
+        yield from _read_xlsx_chunks(file_path, chunk_size)
+    elif file_extension == 'xls':
+        # The legacy format cannot be streamed; read it once and hand it out in chunks
+        df = pd.read_excel(file_path, dtype=str).fillna('')
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+    else:
+        raise ValueError(f"Unsupported file type: {file_extension}")
+
+
+def autodetect_columns(df) -> Dict[str, str]:
+    """Auto-detect column mappings from DataFrame"""
+    mapping = {}
+    columns = [str(col).lower() for col in df.columns]
+
+    # Common column name patterns
+    phone_patterns = ['phone', 'mobile', 'number', 'contact', 'tel']
+    name_patterns = ['name', 'full_name', 'first_name', 'customer_name']
+    email_patterns = ['email', 'mail', 'e-mail']
+
+    for i, col in enumerate(columns):
+        col_name = df.columns[i]
+        if any(pattern in col for pattern in phone_patterns):
+            mapping['phone_number'] = col_name
+        elif any(pattern in col for pattern in name_patterns):
+            mapping['name'] = col_name
+        elif any(pattern in col for pattern in email_patterns):
+            mapping['email'] = col_name
+
+    return mapping
+
+
+def check_whatsapp_validity(phone_numbers: pd.Series) -> np.ndarray:
+    """Check which numbers have WhatsApp (mock implementation)"""
+    # In a real implementation, this would check with WhatsApp Business API
+    # For now, assume 80% of valid numbers have WhatsApp
+    return np.random.random(len(phone_numbers)) < 0.8
+
+
+def _column(chunk: pd.DataFrame, column_mapping: Dict[str, str], field: str) -> pd.Series:
+    col_name = column_mapping.get(field)
+    if col_name in chunk.columns:
+        return chunk[col_name].astype(str).str.strip()
+    return pd.Series('', index=chunk.index)
+
+
+def build_contacts(
+    contact_list: ContactList,
+    chunk: pd.DataFrame,
+    column_mapping: Dict[str, str],
+    seen: set,
+    other_contacts=None
+) -> Tuple[List[Contact], int]:
+    """
+    Validate a chunk in bulk and return unsaved Contacts for its valid,
+    unique rows, plus the number of rows dropped as duplicates. Numbers in
+    `seen` (earlier in the file) or in the `other_contacts` queryset count
+    as duplicates; new ones are added to `seen`.
+    """
+    phone_numbers = normalize_numbers(_column(chunk, column_mapping, 'phone_number'))['e164']
+    if other_contacts is not None:
+        seen.update(existing_numbers(phone_numbers, other_contacts))
+    duplicates = duplicate_mask(phone_numbers, seen)
+    keep = (phone_numbers != '') & ~duplicates
+    if not keep.any():
+        return [], int(duplicates.sum())
+
+    chunk = chunk[keep]
+    phone_numbers = phone_numbers[keep]
+    seen.update(phone_numbers)
+
+    names = _column(chunk, column_mapping, 'name')
+    emails = _column(chunk, column_mapping, 'email')
+    custom_columns = {
+        field: chunk[col_name].astype(str).str.strip()
+        for field, col_name in column_mapping.items()
+        if field not in STANDARD_FIELDS and col_name in chunk.columns
+    }
+    custom_fields = [
+        {field: value for field, value in zip(custom_columns, values) if value}
+        for values in zip(*custom_columns.values())
+    ] if custom_columns else [{} for _ in range(len(chunk))]
+    whatsapp = check_whatsapp_validity(phone_numbers)
+
+    contacts = [
+        Contact(
+            contact_list=contact_list,
+            phone_number=phone_number,
+            name=name,
+            email=email,
+            custom_fields=fields,
+            status='whatsapp_valid' if whatsapp_valid else 'valid',
+            whatsapp_status=bool(whatsapp_valid)
+        )
+        for phone_number, name, email, fields, whatsapp_valid
+        in zip(phone_numbers, names, emails, custom_fields, whatsapp)
+    ]
+    return contacts, int(duplicates.sum())
+
+
+def import_contact_list(contact_list: ContactList, chunk_size: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Stream a contact list's uploaded file into Contacts.
+
+    Rows are read, validated and bulk-inserted one chunk at a time, so
+    memory stays flat however long the file is. After every chunk the
+    running counts, including processed_rows, are written to the
+    ContactList so clients can poll progress. Safe to rerun: rows already
+    imported are skipped by the (contact_list, phone_number) constraint.
+
+    Numbers are stored in E.164 form and repeats within the file are
+    dropped. With CONTACT_IMPORT_DEDUP_ACROSS_LISTS, numbers already in
+    the uploader's other lists are dropped too.
+    """
+    chunk_size = chunk_size or getattr(settings, 'CONTACT_IMPORT_CHUNK_SIZE', 2000)
+    file_extension = contact_list.file.name.split('.')[-1].lower()
+    column_mapping = contact_list.column_mapping or {}
+
+    counts = {
+        'total_contacts': 0, 'valid_contacts': 0, 'invalid_contacts': 0,
+        'duplicate_contacts': 0, 'whatsapp_contacts': 0
+    }
+    seen = set()
+    other_contacts = None
+    if getattr(settings, 'CONTACT_IMPORT_DEDUP_ACROSS_LISTS', False) and contact_list.uploaded_by_id:
+        other_contacts = Contact.objects.filter(
+            contact_list__uploaded_by_id=contact_list.uploaded_by_id
+        ).exclude(contact_list=contact_list)
+
+    for chunk in read_chunks(contact_list.get_file_path(), file_extension, chunk_size):
+        if not column_mapping:
+            # Auto-detect columns
+            column_mapping = autodetect_columns(chunk)
+
+        contacts, duplicates = build_contacts(contact_list, chunk, column_mapping, seen, other_contacts)
+        Contact.objects.bulk_create(contacts, batch_size=chunk_size, ignore_conflicts=True)
+
+        counts['total_contacts'] += len(chunk)
+        counts['valid_contacts'] += len(contacts)
+        counts['duplicate_contacts'] += duplicates
+        counts['invalid_contacts'] += len(chunk) - len(contacts) - duplicates
+        counts['whatsapp_contacts'] += sum(contact.whatsapp_status for contact in contacts)
+
+        ContactList.objects.filter(id=contact_list.id).update(processed_rows=counts['total_contacts'], **counts)
+
+    ContactList.objects.filter(id=contact_list.id).update(processed_at=timezone.now())
+    logger.info(
+        f"Imported contact list {contact_list.id}: {counts['valid_contacts']} valid, "
+        f"{counts['invalid_contacts']} invalid, {counts['duplicate_contacts']} duplicates "
+        f"of {counts['total_contacts']} rows"
+    )
+    return counts
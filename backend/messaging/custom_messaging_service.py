@@ -8,7 +8,7 @@ from django.conf import settings
 from django.core.files import File
 from django.core.cache import cache
 from django.utils import timezone
-from messaging.models import Message, Contact, MessageCampaign
+from messaging.phone_numbers import normalize_number
 
 logger = logging.getLogger(__name__)
 
@@ -106,9 +106,6 @@ class CustomMessagingService:
         message_id = f"custom_msg_{int(time.time())}_{phone_number.replace('+', '')}"
 
         if success:
-            # Update database if this is part of a campaign
-            self._update_message_status(message_id, 'sent', campaign_id)
-
             return {
                 'success': True,
                 'message_id': message_id,
@@ -126,8 +123,6 @@ class CustomMessagingService:
             ]
             error = random.choice(error_types)
 
-            self._update_message_status(message_id, 'failed', campaign_id, error)
-
             return {
                 'success': False,
                 'error': error,
@@ -185,9 +180,6 @@ class CustomMessagingService:
                 data = response.json()
                 message_id = data.get('message_id', f"api_msg_{int(time.time())}")
 
-                # Update database status
-                self._update_message_status(message_id, 'sent', campaign_id)
-
                 return {
                     'success': True,
                     'message_id': message_id,
@@ -270,31 +262,15 @@ class CustomMessagingService:
             Dict with validation results
         """
         try:
-            # Basic phone number validation
-            import re
-            # Remove all non-digit characters except +
-            clean_number = re.sub(r'[^\d+]', '', phone_number)
-
-            # Check if it starts with + and has reasonable length
-            if not clean_number.startswith('+'):
-                clean_number = '+' + clean_number
-
-            # Basic length check (10-15 digits after +)
-            digits_only = clean_number[1:]
-            if not 10 <= len(digits_only) <= 15:
+            normalized = normalize_number(phone_number)
+            if not normalized['is_valid']:
                 return {
                     'is_valid': False,
-                    'formatted_number': clean_number,
-                    'error': 'Invalid phone number length'
+                    'formatted_number': phone_number,
+                    'error': 'Invalid phone number'
                 }
 
-            # Check if all characters are digits after +
-            if not digits_only.isdigit():
-                return {
-                    'is_valid': False,
-                    'formatted_number': clean_number,
-                    'error': 'Phone number contains invalid characters'
-                }
+            clean_number = normalized['e164']
 
             if self.use_mock:
                 # Mock validation - 90% success rate
@@ -303,6 +279,7 @@ class CustomMessagingService:
                 return {
                     'is_valid': True,
                     'formatted_number': clean_number,
+                    'country_code': normalized['country_code'],
                     'can_receive_messages': can_receive,
                     'carrier_info': 'Mock Carrier' if can_receive else None,
                     'checked_at': time.time()
@@ -326,6 +303,7 @@ class CustomMessagingService:
                     return {
                         'is_valid': data.get('valid', False),
                         'formatted_number': clean_number,
+                        'country_code': normalized['country_code'],
                         'can_receive_messages': data.get('can_receive', False),
                         'carrier_info': data.get('carrier'),
                         'checked_at': time.time()
@@ -462,34 +440,6 @@ class CustomMessagingService:
         cache.set(cache_key, current_count + 1, 60)
         return True
 
-    def _update_message_status(
-        self,
-        message_id: str,
-        status: str,
-        campaign_id: Optional[str] = None,
-        error_message: Optional[str] = None
-    ):
-        """Update message status in database"""
-        try:
-            # Find message by ID or create if it doesn't exist
-            message = Message.objects.filter(whatsapp_message_id=message_id).first()
-            if message:
-                message.status = status
-                if error_message:
-                    message.error_message = error_message
-                if status == 'sent':
-                    message.sent_at = timezone.now()
-                elif status == 'delivered':
-                    message.delivered_at = timezone.now()
-                elif status == 'read':
-                    message.read_at = timezone.now()
-                elif status == 'failed':
-                    message.failed_at = timezone.now()
-                message.save()
-
-        except Exception as e:
-            logger.error(f"Error updating message status: {str(e)}")
-
 
 # Global instance
 custom_messaging_service = CustomMessagingService()
\ No newline at end of file
@@ -0,0 +1,306 @@
+import math
+import time
+import logging
+import threading
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List, Callable, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F, Min
+from django.utils import timezone
+
+from .models import Message, MessageLog, MessageCampaign
+
+logger = logging.getLogger(__name__)
+
+_bucket_lock = threading.Lock()
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at `rate` tokens per second up to `capacity`.
+
+    State lives in the Django cache so pacing carries over between task
+    runs. Updates are serialised within a process. Pacing across worker
+    processes needs a shared cache backend (Redis or Memcached in CACHES);
+    with the default per-process LocMemCache every worker keeps its own
+    buckets. Even then cross-process updates are best effort, like the
+    per-number limit in CustomMessagingService.
+    """
+
+    def __init__(self, key: str, rate: float, capacity: float):
+        self.key = f"msg_bucket_{key}"
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        # Once idle this long the bucket is full again, so the entry can expire
+        self.ttl = math.ceil(self.capacity / self.rate) + 60
+
+    def _tokens(self, now: float) -> float:
+        tokens, updated = cache.get(self.key, (self.capacity, now))
+        return min(self.capacity, tokens + max(now - updated, 0.0) * self.rate)
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available (0 if one is available now)"""
+        tokens = self._tokens(now)
+        return 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+
+    def consume(self, now: float):
+        cache.set(self.key, (self._tokens(now) - 1, now), self.ttl)
+
+
+def acquire(buckets: List[TokenBucket]) -> float:
+    """Take a token from every bucket if all have one; otherwise return the seconds until they will"""
+    with _bucket_lock:
+        now = time.time()
+        wait = max((bucket.wait_time(now) for bucket in buckets), default=0.0)
+        if wait == 0:
+            for bucket in buckets:
+                bucket.consume(now)
+        return wait
+
+
+def global_bucket() -> TokenBucket:
+    """Provider-wide send budget shared by every campaign"""
+    return TokenBucket(
+        'global',
+        rate=getattr(settings, 'MESSAGING_RATE_LIMIT', 60) / 60.0,
+        capacity=getattr(settings, 'MESSAGING_RATE_BURST', 10)
+    )
+
+
+def campaign_bucket(campaign) -> Optional[TokenBucket]:
+    """
+    Pacing for one campaign: on average one message per
+    delay_between_messages seconds, with bursts of up to a batch.
+    None when the campaign has no delay.
+    """
+    if campaign.delay_between_messages <= 0:
+        return None
+    return TokenBucket(
+        f"campaign_{campaign.id}",
+        rate=1.0 / campaign.delay_between_messages,
+        capacity=campaign.batch_size
+    )
+
+
+def record_send_results(campaign, results: List[Tuple[Any, Dict[str, Any]]]):
+    """
+    Write a dispatched batch's outcomes back in a constant number of
+    queries: one bulk_update of the messages, one bulk_create of their
+    send_attempt logs and one F() update of the campaign counters.
+    """
+    now = timezone.now()
+    sent_count = 0
+    failed_count = 0
+    logs = []
+
+    for message, result in results:
+        if result['success']:
+            message.status = 'sent'
+            message.sent_at = now
+            message.whatsapp_message_id = result.get('message_id')
+            sent_count += 1
+        else:
+            message.status = 'failed'
+            message.error_message = result.get('error', 'Unknown error')
+            message.failed_at = now
+            failed_count += 1
+        # bulk_update skips auto_now
+        message.updated_at = now
+
+        logs.append(MessageLog(
+            message=message,
+            action='send_attempt',
+            status=message.status,
+            details=result,
+            error_message=result.get('error')
+        ))
+
+    with transaction.atomic():
+        Message.objects.bulk_update(
+            [message for message, _ in results],
+            ['status', 'sent_at', 'failed_at', 'whatsapp_message_id', 'error_message', 'updated_at']
+        )
+        MessageLog.objects.bulk_create(logs)
+        # Counters only, so a pause or cancel made during the batch is not overwritten
+        MessageCampaign.objects.filter(id=campaign.id).update(
+            sent_messages=F('sent_messages') + sent_count,
+            failed_messages=F('failed_messages') + failed_count,
+            pending_messages=F('pending_messages') - (sent_count + failed_count),
+            current_batch=F('current_batch') + 1,
+            last_message_sent_at=now,
+            updated_at=now
+        )
+
+    logger.info(f"Campaign {campaign.id} batch completed: {sent_count} sent, {failed_count} failed")
+
+
+def claim_batch(campaign, size: int) -> List[Message]:
+    """
+    Move up to `size` of the campaign's queued messages to 'sending' and
+    return them. Rows are locked with skip_locked, so concurrent runs
+    claim disjoint batches and no message is sent twice.
+    """
+    with transaction.atomic():
+        ids = list(
+            campaign.messages.filter(status='queued')
+            .select_for_update(skip_locked=True)
+            .values_list('id', flat=True)[:size]
+        )
+        Message.objects.filter(id__in=ids, status='queued').update(status='sending', updated_at=timezone.now())
+    return list(Message.objects.filter(id__in=ids, status='sending').select_related('contact'))
+
+
+def release_messages(messages: List[Message]):
+    """Put claimed messages that were not sent back in the queue"""
+    if messages:
+        Message.objects.filter(id__in=[message.id for message in messages], status='sending').update(
+            status='queued', updated_at=timezone.now()
+        )
+
+
+class CampaignDispatcher:
+    """
+    Sends a campaign's queued messages with up to max_in_flight provider
+    calls running at once, paced by the global and per-campaign token
+    buckets instead of sleeps. Each batch is claimed in the database
+    first, so overlapping runs never send the same message. Batches follow
+    each other immediately while tokens are available. A run ends when the
+    campaign is finished or stopped, when the next token is more than
+    max_token_wait seconds away, or after time_budget seconds, so the
+    worker is released and the caller can reschedule the rest with the
+    returned retry_after.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[Any], Dict[str, Any]],
+        max_in_flight: Optional[int] = None,
+        time_budget: Optional[float] = None,
+        max_token_wait: Optional[float] = None
+    ):
+        self.send = send
+        self.max_in_flight = max(max_in_flight or getattr(settings, 'MESSAGING_MAX_IN_FLIGHT', 8), 1)
+        self.time_budget = time_budget or getattr(settings, 'MESSAGING_DISPATCH_TIME_BUDGET', 240)
+        self.max_token_wait = max_token_wait if max_token_wait is not None else getattr(
+            settings, 'MESSAGING_MAX_TOKEN_WAIT', 5
+        )
+
+    def _send(self, message) -> Dict[str, Any]:
+        try:
+            return self.send(message)
+        except Exception as e:
+            logger.error(f"Error sending message {message.id}: {str(e)}")
+            return {'success': False, 'error': str(e), 'message_id': None}
+        finally:
+            # Worker threads get their own DB connection if the provider touches the database
+            if connection.connection is not None:
+                connection.close()
+
+    def _abandon_after(self) -> timedelta:
+        """How long a message may stay 'sending' before its run is presumed dead"""
+        return timedelta(seconds=self.time_budget + 60)
+
+    def _requeue_abandoned(self, campaign):
+        """Requeue messages claimed by a run that must have ended without recording them"""
+        cutoff = timezone.now() - self._abandon_after()
+        requeued = campaign.messages.filter(status='sending', updated_at__lt=cutoff).update(
+            status='queued', updated_at=timezone.now()
+        )
+        if requeued:
+            logger.warning(f"Campaign {campaign.id}: requeued {requeued} messages left in 'sending'")
+
+    def _seconds_until_abandoned(self, campaign) -> float:
+        """Seconds until the oldest 'sending' message can be requeued by a new run"""
+        oldest = campaign.messages.filter(status='sending').aggregate(oldest=Min('updated_at'))['oldest']
+        if oldest is None:
+            return 0.0
+        return max((oldest + self._abandon_after() - timezone.now()).total_seconds(), 0.0)
+
+    def _wait_for_token(self, buckets: List[TokenBucket], deadline: float) -> float:
+        """Block for short waits; return the wait instead when it is too long for this run"""
+        while True:
+            wait = acquire(buckets)
+            if wait == 0:
+                return 0.0
+            if wait > self.max_token_wait or time.monotonic() + wait > deadline:
+                return wait
+            time.sleep(wait)
+
+    def run(
+        self,
+        campaign,
+        record: Callable[[Any, List[Tuple[Any, Dict[str, Any]]]], None] = record_send_results
+    ) -> Dict[str, Any]:
+        """
+        Dispatch queued messages until the run ends. `record` is called with
+        the campaign and (message, result) pairs after each batch.
+        Returns counts, whether the campaign has no queued messages left
+        ('done') and, if more remain, the seconds to wait before the next
+        run ('retry_after', None when the campaign was stopped).
+        """
+        deadline = time.monotonic() + self.time_budget
+        self._requeue_abandoned(campaign)
+        buckets = [bucket for bucket in (global_bucket(), campaign_bucket(campaign)) if bucket]
+        slots = threading.BoundedSemaphore(self.max_in_flight)
+        sent = failed = batches = 0
+        done = False
+        retry_after = None
+
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            while True:
+                campaign.refresh_from_db(fields=['status'])
+                if campaign.status not in ['running', 'scheduled']:
+                    break
+
+                batch = claim_batch(campaign, campaign.batch_size)
+                if not batch:
+                    # Messages still 'sending' belong to another run. Check back once they
+                    # would count as abandoned, in case that run died before recording them
+                    done = not campaign.messages.filter(status__in=['queued', 'sending']).exists()
+                    if not done:
+                        retry_after = self._seconds_until_abandoned(campaign)
+                    break
+
+                futures = []
+                for message in batch:
+                    wait = self._wait_for_token(buckets, deadline)
+                    if wait:
+                        retry_after = wait
+                        break
+                    slots.acquire()
+                    future = executor.submit(self._send, message)
+                    future.add_done_callback(lambda _: slots.release())
+                    futures.append((message, future))
+
+                results = [(message, future.result()) for message, future in futures]
+                release_messages(batch[len(futures):])
+                if results:
+                    record(campaign, results)
+                    batches += 1
+                    for _, result in results:
+                        if result.get('success'):
+                            sent += 1
+                        else:
+                            failed += 1
+
+                if retry_after is not None:
+                    break
+                if time.monotonic() >= deadline:
+                    retry_after = 0.0
+                    break
+
+        logger.info(
+            f"Campaign {campaign.id} dispatch: {sent} sent, {failed} failed in {batches} batches"
+            + ('' if retry_after is None else f", resuming in {retry_after:.1f}s")
+        )
+        return {
+            'sent': sent,
+            'failed': failed,
+            'batches': batches,
+            'done': done,
+            'retry_after': retry_after,
+        }
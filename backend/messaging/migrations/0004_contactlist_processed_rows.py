@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0003_unsubscriber'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contactlist',
+            name='processed_rows',
+            field=models.IntegerField(default=0),
+        ),
+    ]
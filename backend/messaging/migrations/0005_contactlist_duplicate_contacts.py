@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0004_contactlist_processed_rows'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contactlist',
+            name='duplicate_contacts',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0005_contactlist_duplicate_contacts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='messagecampaign',
+            name='messages_prepared',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name='messagecampaign',
+            name='preparation_job_id',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='messagecampaign',
+            name='prepared_messages',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -34,7 +34,9 @@ class ContactList(models.Model):
     total_contacts = models.IntegerField(default=0)
     valid_contacts = models.IntegerField(default=0)
     invalid_contacts = models.IntegerField(default=0)
+    duplicate_contacts = models.IntegerField(default=0)  # Rows repeating a number already imported
     whatsapp_contacts = models.IntegerField(default=0)  # Valid WhatsApp numbers
+    processed_rows = models.IntegerField(default=0)  # Import progress, updated after every chunk
     column_mapping = models.JSONField(help_text="Mapping of Excel columns to fields", null=True, blank=True)
     uploaded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -121,6 +123,11 @@ class MessageCampaign(models.Model):
     current_batch = models.IntegerField(default=0)
     last_message_sent_at = models.DateTimeField(null=True, blank=True)
 
+    # Message preparation (runs in the background after creation)
+    messages_prepared = models.BooleanField(default=True)
+    prepared_messages = models.IntegerField(default=0)
+    preparation_job_id = models.CharField(max_length=255, blank=True, null=True)
+
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -135,6 +142,14 @@ class MessageCampaign(models.Model):
             return 0
         return int((self.sent_messages / self.total_messages) * 100)
 
+    def get_preparation_percentage(self):
+        """Calculate how much of the campaign's messages have been prepared"""
+        if self.messages_prepared:
+            return 100
+        if self.total_messages == 0:
+            return 0
+        return min(int((self.prepared_messages / self.total_messages) * 100), 99)
+
     def can_pause(self):
         return self.status in ['running', 'scheduled']
 
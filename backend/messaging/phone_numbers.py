@@ -0,0 +1,116 @@
+import logging
+from typing import Dict, Any, Iterable, Optional
+
+import pandas as pd
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Calling code -> ISO country. E.164 calling codes are prefix-free, so at
+# most one of a number's 1-3 digit prefixes can match.
+CALLING_CODES = {
+    '1': 'US',
+    '7': 'RU',
+    '33': 'FR',
+    '44': 'GB',
+    '49': 'DE',
+    '60': 'MY',
+    '61': 'AU',
+    '65': 'SG',
+    '66': 'TH',
+    '81': 'JP',
+    '86': 'CN',
+    '91': 'IN',
+    '92': 'PK',
+    '94': 'LK',
+    '880': 'BD',
+    '971': 'AE',
+    '966': 'SA',
+    '974': 'QA',
+    '975': 'BT',
+    '977': 'NP',
+}
+
+MIN_DIGITS = 10
+MAX_DIGITS = 15  # E.164 limit, country code included
+
+COLUMNS = ['e164', 'is_valid', 'calling_code', 'country_code']
+
+
+def default_calling_code() -> str:
+    """Calling code assumed for numbers written without one"""
+    return str(getattr(settings, 'MESSAGING_DEFAULT_CALLING_CODE', '91')).lstrip('+')
+
+
+def normalize_numbers(raw: Iterable, calling_code: Optional[str] = None) -> pd.DataFrame:
+    """
+    Normalize a column of raw phone numbers in one vectorized pass.
+
+    A trailing '.0' from a float-typed cell is dropped, then everything
+    but digits and '+' is stripped. '00' becomes '+'. A bare
+    10-digit number, or one with a leading trunk '0', gets the default
+    calling code. A bare 11-15 digit number is taken to include its
+    country code already. Valid numbers are '+' followed by 10-15 digits
+    with no leading zero.
+
+    Returns a DataFrame with the input's index and columns: e164 (''
+    when invalid), is_valid, calling_code and country_code (the ISO code,
+    'Unknown' when the calling code is not in CALLING_CODES).
+    """
+    series = raw if isinstance(raw, pd.Series) else pd.Series(list(raw), dtype=object)
+    calling_code = calling_code or default_calling_code()
+
+    # Numbers read as floats ('9876543210.0') lose the '.0' before the digits are joined
+    cleaned = series.fillna('').astype(str).str.strip().str.replace(r'\.0+$', '', regex=True)
+    cleaned = cleaned.str.replace(r'[^\d+]', '', regex=True)
+    cleaned = cleaned.str.replace(r'^00', '+', regex=True)
+
+    digits = cleaned.str.lstrip('+')
+    bare = ~cleaned.str.startswith('+')
+    lengths = digits.str.len()
+    national = bare & ((lengths == 10) | ((lengths == 11) & digits.str.startswith('0')))
+
+    e164 = ('+' + digits).where(~national, '+' + calling_code + digits.str[-10:])
+    is_valid = e164.str.fullmatch(rf'\+[1-9]\d{{{MIN_DIGITS - 1},{MAX_DIGITS - 1}}}').fillna(False).astype(bool)
+    e164 = e164.where(is_valid, '')
+
+    number_digits = e164.str[1:]
+    code = pd.Series('', index=series.index)
+    for length in (3, 2, 1):
+        prefix = number_digits.str[:length]
+        code = code.where(code != '', prefix.where(prefix.isin(CALLING_CODES.keys()), ''))
+
+    return pd.DataFrame({
+        'e164': e164,
+        'is_valid': is_valid,
+        'calling_code': code,
+        'country_code': code.map(CALLING_CODES).fillna('Unknown'),
+    }, index=series.index)
+
+
+def normalize_number(raw: str) -> Dict[str, Any]:
+    """normalize_numbers for a single number, as a dict"""
+    return normalize_numbers([raw]).to_dict('records')[0]
+
+
+def duplicate_mask(e164: pd.Series, existing: Optional[Iterable[str]] = None) -> pd.Series:
+    """
+    True for every number that repeats an earlier one in the column or is
+    already in `existing`. Invalid ('') numbers are never marked.
+    """
+    duplicated = e164.duplicated()
+    if existing:
+        duplicated |= e164.isin(existing)
+    return duplicated & (e164 != '')
+
+
+def existing_numbers(numbers: Iterable[str], contacts, batch_size: int = 1000) -> set:
+    """Which of the numbers already belong to the given Contact queryset, looked up in batches"""
+    numbers = list(dict.fromkeys(number for number in numbers if number))
+    found = set()
+    for start in range(0, len(numbers), batch_size):
+        found.update(
+            contacts.filter(phone_number__in=numbers[start:start + batch_size])
+            .values_list('phone_number', flat=True)
+        )
+    return found
@@ -3,6 +3,7 @@ from .models import (
     MessageTemplate, ContactList, Contact, MessageCampaign,
     Message, MessageLog, CampaignReport, Unsubscriber
 )
+from .phone_numbers import normalize_numbers
 import re
 
 
@@ -29,12 +30,13 @@ class ContactListSerializer(serializers.ModelSerializer):
         model = ContactList
         fields = [
             'id', 'name', 'file', 'total_contacts', 'valid_contacts',
-            'invalid_contacts', 'whatsapp_contacts', 'column_mapping',
-            'uploaded_by', 'created_at', 'processed_at'
+            'invalid_contacts', 'duplicate_contacts', 'whatsapp_contacts',
+            'processed_rows', 'column_mapping', 'uploaded_by', 'created_at', 'processed_at'
         ]
         read_only_fields = [
             'id', 'total_contacts', 'valid_contacts', 'invalid_contacts',
-            'whatsapp_contacts', 'uploaded_by', 'created_at', 'processed_at'
+            'duplicate_contacts', 'whatsapp_contacts', 'processed_rows',
+            'uploaded_by', 'created_at', 'processed_at'
         ]
 
     def create(self, validated_data):
@@ -63,6 +65,7 @@ class MessageCampaignSerializer(serializers.ModelSerializer):
     template_name = serializers.CharField(source='template.name', read_only=True)
     contact_list_name = serializers.CharField(source='contact_list.name', read_only=True)
     progress_percentage = serializers.SerializerMethodField()
+    preparation_percentage = serializers.SerializerMethodField()
 
     class Meta:
         model = MessageCampaign
@@ -73,19 +76,24 @@ class MessageCampaignSerializer(serializers.ModelSerializer):
             'delay_between_messages', 'batch_size', 'campaign_type', 'personalization_rules',
             'total_messages', 'sent_messages', 'delivered_messages', 'failed_messages',
             'pending_messages', 'current_batch', 'last_message_sent_at',
-            'progress_percentage', 'created_by', 'created_at', 'updated_at',
-            'completed_at'
+            'progress_percentage', 'messages_prepared', 'prepared_messages',
+            'preparation_job_id', 'preparation_percentage', 'created_by',
+            'created_at', 'updated_at', 'completed_at'
         ]
         read_only_fields = [
             'id', 'total_messages', 'sent_messages', 'delivered_messages',
             'failed_messages', 'pending_messages', 'current_batch',
-            'last_message_sent_at', 'progress_percentage', 'created_by',
-            'created_at', 'updated_at', 'completed_at'
+            'last_message_sent_at', 'progress_percentage', 'messages_prepared',
+            'prepared_messages', 'preparation_job_id', 'preparation_percentage',
+            'created_by', 'created_at', 'updated_at', 'completed_at'
         ]
 
     def get_progress_percentage(self, obj):
         return obj.get_progress_percentage()
 
+    def get_preparation_percentage(self, obj):
+        return obj.get_preparation_percentage()
+
     def validate_message_content(self, value):
         """Validate message content for placeholders"""
         if not value or not value.strip():
@@ -193,15 +201,13 @@ class BulkMessageSerializer(serializers.Serializer):
         if not value:
             raise serializers.ValidationError("At least one phone number is required.")
 
-        validated_numbers = []
-        for number in value:
-            # Basic phone number validation (allow international format)
-            cleaned = re.sub(r'[^\d+\-\s]', '', number).strip()
-            if not re.match(r'^\+?[\d\s\-\(\)]{7,20}$', cleaned):
-                raise serializers.ValidationError(f"Invalid phone number format: {number}")
-            validated_numbers.append(cleaned)
+        normalized = normalize_numbers(value)
+        invalid = [number for number, is_valid in zip(value, normalized['is_valid']) if not is_valid]
+        if invalid:
+            raise serializers.ValidationError(f"Invalid phone number format: {invalid[0]}")
 
-        return validated_numbers
+        # E.164 numbers, each sent to once
+        return list(dict.fromkeys(normalized['e164']))
 
 
 class CampaignActionSerializer(serializers.Serializer):
@@ -221,6 +227,9 @@ class CampaignActionSerializer(serializers.Serializer):
         if action == 'resume' and not campaign.can_resume():
             raise serializers.ValidationError(f"Cannot resume campaign in {campaign.status} status.")
 
+        if action == 'resume' and not campaign.messages_prepared:
+            raise serializers.ValidationError("Campaign messages are still being prepared.")
+
         if action == 'cancel' and not campaign.can_cancel():
             raise serializers.ValidationError(f"Cannot cancel campaign in {campaign.status} status.")
 
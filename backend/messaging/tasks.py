@@ -1,11 +1,13 @@
 from celery import shared_task
 from django.conf import settings
 from django.core.files.base import ContentFile
+from django.core.cache import cache
 from django.utils import timezone
 import pandas as pd
 import openpyxl
 from io import BytesIO
 import time
+import math
 import logging
 import json
 import os
@@ -16,12 +18,18 @@ from .models import (
     MessageLog, CampaignReport
 )
 from .whatsapp_service import WhatsAppService
+from .dispatch import CampaignDispatcher
+from .contact_import import import_contact_list
+from .campaign_builder import materialize_campaign
 
 logger = logging.getLogger(__name__)
 
 # Initialize WhatsApp service
 whatsapp_service = WhatsAppService()
 
+# How long a dispatch run waits for a campaign whose messages are still being prepared
+PREPARATION_POLL_SECONDS = 15
+
 
 @shared_task(bind=True, max_retries=3)
 def send_bulk_messages_task(self, phone_numbers, message_content, attachment_url, delay_seconds, user_id):
@@ -74,7 +82,7 @@ def send_bulk_messages_task(self, phone_numbers, message_content, attachment_url
 
 @shared_task(bind=True, max_retries=2)
 def process_contact_list_task(self, contact_list_id):
-    """Process uploaded Excel/CSV file and create contacts"""
+    """Stream the uploaded Excel/CSV file into contacts"""
     try:
         contact_list = ContactList.objects.get(id=contact_list_id)
 
@@ -83,82 +91,14 @@ def process_contact_list_task(self, contact_list_id):
         if not file_path or not os.path.exists(file_path):
             raise FileNotFoundError(f"Contact list file not found: {file_path}")
 
-        # Determine file type and read accordingly
-        file_extension = contact_list.file.name.split('.')[-1].lower()
-
-        if file_extension == 'csv':
-            df = pd.read_csv(file_path)
-        elif file_extension in ['xlsx', 'xls']:
-            df = pd.read_excel(file_path, engine='openpyxl' if file_extension == 'xlsx' else None)
-        else:
-            raise ValueError(f"Unsupported file type: {file_extension}")
-
-        # Process contacts
-        total_contacts = len(df)
-        valid_contacts = 0
-        invalid_contacts = 0
-        whatsapp_contacts = 0
-
-        # Default column mapping if not provided
-        column_mapping = contact_list.column_mapping or {}
-        if not column_mapping:
-            # Auto-detect columns
-            column_mapping = autodetect_columns(df)
-
-        for index, row in df.iterrows():
-            try:
-                # Extract contact data
-                contact_data = extract_contact_data(row, column_mapping)
-
-                if not contact_data.get('phone_number'):
-                    invalid_contacts += 1
-                    continue
-
-                # Validate phone number
-                phone_number = validate_phone_number(contact_data['phone_number'])
-                if not phone_number:
-                    invalid_contacts += 1
-                    continue
+        counts = import_contact_list(contact_list)
 
-                # Check WhatsApp validity (mock for now)
-                whatsapp_valid = check_whatsapp_validity(phone_number)
-
-                # Create contact
-                Contact.objects.create(
-                    contact_list=contact_list,
-                    phone_number=phone_number,
-                    name=contact_data.get('name', ''),
-                    email=contact_data.get('email', ''),
-                    custom_fields=contact_data.get('custom_fields', {}),
-                    status='whatsapp_valid' if whatsapp_valid else 'valid',
-                    whatsapp_status=whatsapp_valid
-                )
-
-                valid_contacts += 1
-                if whatsapp_valid:
-                    whatsapp_contacts += 1
-
-            except Exception as e:
-                logger.error(f"Error processing contact at row {index}: {str(e)}")
-                invalid_contacts += 1
-
-        # Update contact list statistics
-        contact_list.total_contacts = total_contacts
-        contact_list.valid_contacts = valid_contacts
-        contact_list.invalid_contacts = invalid_contacts
-        contact_list.whatsapp_contacts = whatsapp_contacts
-        contact_list.processed_at = timezone.now()
-        contact_list.save()
+        logger.info(
+            f"Processed contact list {contact_list_id}: "
+            f"{counts['valid_contacts']} valid, {counts['invalid_contacts']} invalid"
+        )
 
-        logger.info(f"Processed contact list {contact_list_id}: {valid_contacts} valid, {invalid_contacts} invalid")
-
-        return {
-            'success': True,
-            'total_contacts': total_contacts,
-            'valid_contacts': valid_contacts,
-            'invalid_contacts': invalid_contacts,
-            'whatsapp_contacts': whatsapp_contacts
-        }
+        return {'success': True, **counts}
 
     except Exception as e:
         logger.error(f"Contact list processing failed for {contact_list_id}: {str(e)}")
@@ -167,7 +107,8 @@ def process_contact_list_task(self, contact_list_id):
 
 @shared_task(bind=True, max_retries=3)
 def send_campaign_messages_task(self, campaign_id):
-    """Send messages for a campaign in batches"""
+    """Send a campaign's queued messages, paced by the dispatcher's token buckets"""
+    lock_key = f"campaign_dispatch_{campaign_id}"
     try:
         campaign = MessageCampaign.objects.get(id=campaign_id)
 
@@ -175,86 +116,43 @@ def send_campaign_messages_task(self, campaign_id):
             logger.info(f"Campaign {campaign_id} is not in running state")
             return
 
-        # Get pending messages
-        pending_messages = campaign.messages.filter(status='queued')[:campaign.batch_size]
+        dispatcher = CampaignDispatcher(send=send_campaign_message)
 
-        if not pending_messages:
-            # No more messages to send, mark campaign as completed
-            campaign.status = 'completed'
-            campaign.completed_at = timezone.now()
-            campaign.save()
-            logger.info(f"Campaign {campaign_id} completed")
+        # Skip duplicate runs, e.g. when resume is pressed while a run is going. The cache
+        # lock only spans processes with a shared CACHES backend; the dispatcher's
+        # database claim is what keeps overlapping runs from sending a message twice.
+        if not cache.add(lock_key, True, dispatcher.time_budget + 60):
+            logger.info(f"Campaign {campaign_id} is already being dispatched")
             return
 
-        sent_count = 0
-        failed_count = 0
-
-        for message in pending_messages:
-            try:
-                # Send message
-                result = whatsapp_service.send_message(
-                    phone_number=message.contact.phone_number,
-                    message=message.content,
-                    attachment_url=message.attachment_url,
-                    attachment_file=message.attachment_file.path if message.attachment_file else None
-                )
-
-                if result['success']:
-                    message.status = 'sent'
-                    message.sent_at = timezone.now()
-                    message.whatsapp_message_id = result.get('message_id')
-                    sent_count += 1
-                else:
-                    message.status = 'failed'
-                    message.error_message = result.get('error', 'Unknown error')
-                    message.failed_at = timezone.now()
-                    failed_count += 1
-
-                message.save()
-
-                # Log the action
-                MessageLog.objects.create(
-                    message=message,
-                    action='send_attempt',
-                    status=message.status,
-                    details=result,
-                    error_message=result.get('error')
-                )
-
-                # Delay between messages
-                if campaign.delay_between_messages > 0:
-                    time.sleep(campaign.delay_between_messages)
-
-            except Exception as e:
-                logger.error(f"Error sending message {message.id}: {str(e)}")
-                message.status = 'failed'
-                message.error_message = str(e)
-                message.failed_at = timezone.now()
-                message.save()
-                failed_count += 1
-
-        # Update campaign statistics
-        campaign.sent_messages += sent_count
-        campaign.failed_messages += failed_count
-        campaign.pending_messages -= (sent_count + failed_count)
-        campaign.current_batch += 1
-        campaign.last_message_sent_at = timezone.now()
-        campaign.save()
-
-        # Continue with next batch if campaign is still running
-        if campaign.status == 'running' and campaign.pending_messages > 0:
-            # Schedule next batch
+        try:
+            outcome = dispatcher.run(campaign)
+        finally:
+            cache.delete(lock_key)
+
+        if outcome['done']:
+            campaign.refresh_from_db(fields=['status', 'messages_prepared'])
+            if not campaign.messages_prepared:
+                # Caught up with the builder; more messages are on the way
+                send_campaign_messages_task.apply_async(args=[campaign_id], countdown=PREPARATION_POLL_SECONDS)
+            elif campaign.status in ['running', 'scheduled']:
+                # No more messages to send, mark campaign as completed
+                campaign.status = 'completed'
+                campaign.completed_at = timezone.now()
+                campaign.save(update_fields=['status', 'completed_at', 'updated_at'])
+                logger.info(f"Campaign {campaign_id} completed")
+        elif outcome['retry_after'] is not None:
+            # Out of send budget or time for this run; pick up where it left off
             send_campaign_messages_task.apply_async(
                 args=[campaign_id],
-                countdown=60  # Wait 1 minute before next batch
+                countdown=math.ceil(outcome['retry_after'])
             )
 
-        logger.info(f"Campaign {campaign_id} batch completed: {sent_count} sent, {failed_count} failed")
-
+        campaign.refresh_from_db(fields=['pending_messages'])
         return {
             'success': True,
-            'sent': sent_count,
-            'failed': failed_count,
+            'sent': outcome['sent'],
+            'failed': outcome['failed'],
             'remaining': campaign.pending_messages
         }
 
@@ -263,6 +161,36 @@ def send_campaign_messages_task(self, campaign_id):
         raise self.retry(countdown=120, exc=e)
 
 
+def send_campaign_message(message):
+    """Provider call for one campaign message; runs on a dispatcher worker thread"""
+    return whatsapp_service.send_message(
+        phone_number=message.contact.phone_number,
+        message=message.content,
+        attachment_url=message.attachment_url,
+        attachment_file=message.attachment_file.path if message.attachment_file else None
+    )
+
+
+@shared_task(bind=True, max_retries=3)
+def materialize_campaign_task(self, campaign_id, start=False):
+    """Create a campaign's messages in the background; optionally start sending when done"""
+    try:
+        campaign = MessageCampaign.objects.get(id=campaign_id)
+
+        result = materialize_campaign(campaign)
+
+        if start:
+            campaign.refresh_from_db(fields=['status'])
+            if campaign.status == 'running':
+                send_campaign_messages_task.delay(campaign_id)
+
+        return {'success': True, 'campaign_id': str(campaign_id), **result}
+
+    except Exception as e:
+        logger.error(f"Message preparation failed for campaign {campaign_id}: {str(e)}")
+        raise self.retry(countdown=60, exc=e)
+
+
 @shared_task(bind=True, max_retries=2)
 def send_single_message_task(self, message_id):
     """Send a single message (for retries)"""
@@ -353,78 +281,6 @@ def generate_campaign_report_task(self, campaign_id, report_type, user_id):
 
 # Helper functions
 
-def autodetect_columns(df):
-    """Auto-detect column mappings from DataFrame"""
-    mapping = {}
-    columns = [col.lower() for col in df.columns]
-
-    # Common column name patterns
-    phone_patterns = ['phone', 'mobile', 'number', 'contact', 'tel']
-    name_patterns = ['name', 'full_name', 'first_name', 'customer_name']
-    email_patterns = ['email', 'mail', 'e-mail']
-
-    for i, col in enumerate(columns):
-        col_name = df.columns[i]
-        if any(pattern in col for pattern in phone_patterns):
-            mapping['phone_number'] = col_name
-        elif any(pattern in col for pattern in name_patterns):
-            mapping['name'] = col_name
-        elif any(pattern in col for pattern in email_patterns):
-            mapping['email'] = col_name
-
-    return mapping
-
-
-def extract_contact_data(row, column_mapping):
-    """Extract contact data from a DataFrame row"""
-    data = {}
-
-    # Map standard fields
-    for field, col_name in column_mapping.items():
-        if col_name in row.index:
-            value = row[col_name]
-            if pd.notna(value):  # Check if value is not NaN
-                if field in ['phone_number', 'name', 'email']:
-                    data[field] = str(value).strip()
-                else:
-                    data.setdefault('custom_fields', {})[field] = str(value).strip()
-
-    return data
-
-
-def validate_phone_number(phone_number):
-    """Validate and format phone number"""
-    import re
-
-    if not phone_number:
-        return None
-
-    # Remove all non-digit characters except +
-    cleaned = re.sub(r'[^\d+]', '', str(phone_number))
-
-    # Ensure it starts with +
-    if not cleaned.startswith('+'):
-        # Assume Indian number if no country code
-        if len(cleaned) == 10:
-            cleaned = f'+91{cleaned}'
-        else:
-            return None
-
-    # Basic validation
-    if not re.match(r'^\+\d{10,15}$', cleaned):
-        return None
-
-    return cleaned
-
-
-def check_whatsapp_validity(phone_number):
-    """Check if phone number has WhatsApp (mock implementation)"""
-    # In a real implementation, this would check with WhatsApp Business API
-    # For now, assume 80% of valid numbers have WhatsApp
-    import random
-    return random.random() < 0.8
-
-
 def generate_summary_report(campaign):
     """Generate summary report data"""
     messages = campaign.messages.all()
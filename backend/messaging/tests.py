@@ -0,0 +1,377 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+
+import openpyxl
+import pandas as pd
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from messaging.campaign_builder import compile_template, materialize_campaign
+from messaging.contact_import import import_contact_list
+from messaging.dispatch import CampaignDispatcher, TokenBucket, acquire, claim_batch, record_send_results
+from messaging.models import ContactList, Contact, MessageCampaign, Message, MessageLog
+from messaging.phone_numbers import normalize_numbers, duplicate_mask
+
+
+class TokenBucketTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_bucket_allows_burst_then_reports_wait(self):
+        """A full bucket serves `capacity` tokens at once, then the next is 1/rate away"""
+        bucket = TokenBucket('test', rate=0.5, capacity=2)
+
+        self.assertEqual(acquire([bucket]), 0)
+        self.assertEqual(acquire([bucket]), 0)
+        wait = acquire([bucket])
+
+        self.assertGreater(wait, 1.9)
+        self.assertLessEqual(wait, 2.0)
+
+    def test_acquire_takes_nothing_unless_every_bucket_has_a_token(self):
+        """An empty bucket blocks the send without draining the others"""
+        roomy = TokenBucket('roomy', rate=1, capacity=1)
+        empty = TokenBucket('empty', rate=0.01, capacity=1)
+        acquire([empty])
+
+        self.assertGreater(acquire([roomy, empty]), 0)
+        self.assertEqual(acquire([roomy]), 0)
+
+
+@override_settings(MESSAGING_RATE_LIMIT=600000, MESSAGING_RATE_BURST=1000)
+class CampaignDispatcherTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        contact_list = ContactList.objects.create(name='Leads', file='contact_lists/leads.csv')
+        self.campaign = MessageCampaign.objects.create(
+            name='Ladakh launch',
+            contact_list=contact_list,
+            message_content='Hi {{name}}',
+            status='running',
+            delay_between_messages=0,
+            batch_size=4,
+            total_messages=10,
+            pending_messages=10,
+        )
+        for i in range(10):
+            contact = Contact.objects.create(contact_list=contact_list, phone_number=f'+9198765432{i:02d}')
+            Message.objects.create(campaign=self.campaign, contact=contact, content='Hi')
+
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.lock = threading.Lock()
+        self.batches = []
+
+    def _send(self, message):
+        with self.lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        time.sleep(0.02)
+        with self.lock:
+            self.in_flight -= 1
+        return {'success': message.contact.phone_number != '+919876543200', 'message_id': 'x'}
+
+    def _record(self, campaign, results):
+        self.batches.append(len(results))
+        for message, result in results:
+            message.status = 'sent' if result['success'] else 'failed'
+            message.save(update_fields=['status'])
+
+    def test_sends_every_batch_concurrently(self):
+        """Batches run back to back with several provider calls in flight"""
+        outcome = CampaignDispatcher(send=self._send, max_in_flight=4).run(self.campaign, self._record)
+
+        self.assertTrue(outcome['done'])
+        self.assertIsNone(outcome['retry_after'])
+        self.assertEqual((outcome['sent'], outcome['failed']), (9, 1))
+        self.assertEqual(self.batches, [4, 4, 2])
+        self.assertGreater(self.peak_in_flight, 1)
+        self.assertLessEqual(self.peak_in_flight, 4)
+        self.assertFalse(self.campaign.messages.filter(status='queued').exists())
+
+    def test_campaign_pacing_ends_the_run_instead_of_sleeping(self):
+        """Once the campaign's burst is spent, the run returns when to resume"""
+        self.campaign.delay_between_messages = 30
+        self.campaign.save()
+
+        started = time.monotonic()
+        outcome = CampaignDispatcher(send=self._send, max_token_wait=1).run(self.campaign, self._record)
+
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertFalse(outcome['done'])
+        self.assertEqual(outcome['sent'] + outcome['failed'], 4)
+        self.assertGreater(outcome['retry_after'], 25)
+        self.assertEqual(self.campaign.messages.filter(status='queued').count(), 6)
+
+    def test_overlapping_runs_never_send_a_message_twice(self):
+        """Batches are claimed in the database, so a second run skips messages the first one holds"""
+        claimed = claim_batch(self.campaign, 4)
+        self.assertEqual(self.campaign.messages.filter(status='sending').count(), 4)
+
+        sent_ids = []
+        outcome = CampaignDispatcher(send=lambda m: sent_ids.append(m.id) or {'success': True}).run(
+            self.campaign, self._record
+        )
+
+        self.assertEqual(len(sent_ids), 6)
+        self.assertFalse({message.id for message in claimed} & set(sent_ids))
+        self.assertFalse(outcome['done'])
+
+    def test_in_flight_messages_schedule_a_check_for_abandoned_claims(self):
+        """With only another run's claims left, the run returns when they would count as abandoned"""
+        self.campaign.messages.update(status='sending', updated_at=timezone.now() - timedelta(seconds=30))
+
+        outcome = CampaignDispatcher(send=self._send, time_budget=100).run(self.campaign, self._record)
+
+        self.assertEqual(outcome['sent'] + outcome['failed'], 0)
+        self.assertFalse(outcome['done'])
+        # Claims are requeued once older than time_budget + 60 seconds
+        self.assertAlmostEqual(outcome['retry_after'], 130, delta=5)
+        self.assertEqual(self.campaign.messages.filter(status='sending').count(), 10)
+
+    def test_paused_campaign_sends_nothing(self):
+        """A campaign that is no longer running is left alone and not rescheduled"""
+        MessageCampaign.objects.filter(id=self.campaign.id).update(status='paused')
+
+        outcome = CampaignDispatcher(send=self._send).run(self.campaign, self._record)
+
+        self.assertEqual(outcome['sent'] + outcome['failed'], 0)
+        self.assertIsNone(outcome['retry_after'])
+        self.assertFalse(outcome['done'])
+
+    def _recorded_queries(self, messages):
+        results = [(message, {'success': True, 'message_id': f'wa_{i}'}) for i, message in enumerate(messages)]
+        with CaptureQueriesContext(connection) as queries:
+            record_send_results(self.campaign, results)
+        return len(queries)
+
+    def test_results_are_written_back_in_constant_queries(self):
+        """Recording a batch costs the same number of queries for 2 or 8 messages"""
+        messages = list(self.campaign.messages.select_related('contact'))
+
+        small = self._recorded_queries(messages[:2])
+        large = self._recorded_queries(messages[2:])
+
+        self.assertEqual(small, large)
+        self.campaign.refresh_from_db()
+        self.assertEqual(
+            (self.campaign.sent_messages, self.campaign.pending_messages, self.campaign.current_batch),
+            (10, 0, 2)
+        )
+        self.assertEqual(Message.objects.filter(status='sent', whatsapp_message_id__startswith='wa_').count(), 10)
+        self.assertEqual(MessageLog.objects.filter(action='send_attempt').count(), 10)
+
+
+class ContactImportTestCase(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.media_root, 'contact_lists'))
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root)
+
+        self.rows = [
+            ['Phone', 'Full Name', 'Email', 'City'],
+            ['98765 43210', 'Asha', 'asha@example.com', 'Pune'],
+            ['+1 (415) 555-0100', 'Ben', '', ''],
+            ['12345', 'Too short', '', 'Delhi'],
+            ['+919876543210', 'Asha again', '', ''],
+            ['', 'No phone', '', ''],
+            ['9123456789', 'Chitra', '', 'Leh'],
+        ]
+
+    def _contact_list(self, name, column_mapping=None, uploaded_by=None):
+        return ContactList.objects.create(
+            name='Leads', file=f'contact_lists/{name}', column_mapping=column_mapping, uploaded_by=uploaded_by
+        )
+
+    def _write_csv(self, name='leads.csv'):
+        path = os.path.join(self.media_root, 'contact_lists', name)
+        pd.DataFrame(self.rows[1:], columns=self.rows[0]).to_csv(path, index=False)
+
+    def test_csv_import_streams_chunks_and_publishes_progress(self):
+        """Valid, de-duplicated rows are inserted and counts land on the list"""
+        self._write_csv()
+        contact_list = self._contact_list('leads.csv', {'phone_number': 'Phone', 'name': 'Full Name', 'city': 'City'})
+
+        counts = import_contact_list(contact_list, chunk_size=2)
+
+        self.assertEqual(
+            (counts['total_contacts'], counts['valid_contacts'], counts['invalid_contacts'], counts['duplicate_contacts']),
+            (6, 3, 2, 1)
+        )
+        contact_list.refresh_from_db()
+        self.assertEqual(contact_list.processed_rows, 6)
+        self.assertIsNotNone(contact_list.processed_at)
+        contacts = {contact.phone_number: contact for contact in contact_list.contacts.all()}
+        self.assertEqual(set(contacts), {'+919876543210', '+14155550100', '+919123456789'})
+        self.assertEqual(contacts['+919876543210'].name, 'Asha')
+        self.assertEqual(contacts['+919876543210'].custom_fields, {'city': 'Pune'})
+        self.assertEqual(contacts['+14155550100'].custom_fields, {})
+
+    def test_xlsx_import_autodetects_columns_and_numeric_cells(self):
+        """Read-only xlsx rows are imported, including phone numbers typed as numbers"""
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        for row in self.rows:
+            sheet.append(row)
+        sheet.append([9988776655.0, 'Numeric'])
+        workbook.save(os.path.join(self.media_root, 'contact_lists', 'leads.xlsx'))
+        contact_list = self._contact_list('leads.xlsx')
+
+        counts = import_contact_list(contact_list, chunk_size=3)
+
+        self.assertEqual((counts['total_contacts'], counts['valid_contacts']), (7, 4))
+        self.assertTrue(contact_list.contacts.filter(phone_number='+919988776655', name='Numeric').exists())
+        self.assertTrue(contact_list.contacts.filter(phone_number='+919876543210', email='asha@example.com').exists())
+
+    def test_rerun_does_not_duplicate_contacts(self):
+        """Importing the same file again leaves one contact per number"""
+        self._write_csv()
+        contact_list = self._contact_list('leads.csv')
+
+        import_contact_list(contact_list)
+        import_contact_list(contact_list)
+
+        self.assertEqual(contact_list.contacts.count(), 3)
+
+    @override_settings(CONTACT_IMPORT_DEDUP_ACROSS_LISTS=True)
+    def test_dedup_across_the_uploaders_lists(self):
+        """Numbers already in another of the uploader's lists are skipped"""
+        user = User.objects.create_user('ops', password='x')
+        other_list = self._contact_list('old.csv', uploaded_by=user)
+        Contact.objects.create(contact_list=other_list, phone_number='+14155550100')
+        self._write_csv()
+        contact_list = self._contact_list('leads.csv', uploaded_by=user)
+
+        counts = import_contact_list(contact_list)
+
+        self.assertEqual((counts['valid_contacts'], counts['duplicate_contacts']), (2, 2))
+        self.assertFalse(contact_list.contacts.filter(phone_number='+14155550100').exists())
+
+
+class PhoneNumbersTestCase(TestCase):
+    def test_normalize_numbers(self):
+        """Numbers come back in E.164 with validity and country in one pass"""
+        normalized = normalize_numbers([
+            '98765-43210', '09876543210', '+44 20 7946 0958', '0014155550100', '555', None
+        ])
+
+        self.assertEqual(
+            list(normalized['e164']),
+            ['+919876543210', '+919876543210', '+442079460958', '+14155550100', '', '']
+        )
+        self.assertEqual(list(normalized['is_valid']), [True, True, True, True, False, False])
+        self.assertEqual(list(normalized['country_code']), ['IN', 'IN', 'GB', 'US', 'Unknown', 'Unknown'])
+        self.assertEqual(normalized['calling_code'][2], '44')
+
+    def test_float_formatted_numbers_keep_their_digits(self):
+        """A '.0' left by a float-typed cell is not read as an extra digit"""
+        normalized = normalize_numbers(['9876543210.0', 9876543210.0, '+14155550100.00', '98765.43210'])
+
+        self.assertEqual(
+            list(normalized['e164']),
+            ['+919876543210', '+919876543210', '+14155550100', '+919876543210']
+        )
+
+    @override_settings(MESSAGING_DEFAULT_CALLING_CODE='+977')
+    def test_default_calling_code_is_configurable(self):
+        """Bare 10-digit numbers take the configured calling code"""
+        self.assertEqual(normalize_numbers(['9812345678'])['e164'][0], '+9779812345678')
+
+    def test_duplicate_mask(self):
+        """Repeats and already-known numbers are marked; invalid numbers are not"""
+        e164 = pd.Series(['+919876543210', '', '+919876543210', '', '+14155550100'])
+
+        self.assertEqual(list(duplicate_mask(e164)), [False, False, True, False, False])
+        self.assertEqual(list(duplicate_mask(e164, {'+14155550100'})), [False, False, True, False, True])
+
+
+class CampaignBuilderTestCase(TestCase):
+    def setUp(self):
+        self.contact_list = ContactList.objects.create(name='Leads', file='contact_lists/leads.csv')
+        for i in range(7):
+            Contact.objects.create(
+                contact_list=self.contact_list,
+                phone_number=f'+9198765432{i:02d}',
+                name=f'Traveller {i}' if i else None,
+                custom_fields={'trip': 'Ladakh'},
+                status='whatsapp_valid',
+                whatsapp_status=True
+            )
+        Contact.objects.create(contact_list=self.contact_list, phone_number='+919999999999', status='valid')
+
+        self.campaign = MessageCampaign.objects.create(
+            name='Ladakh launch',
+            contact_list=self.contact_list,
+            message_content='Hi {{name}}, {{trip}} seats for {{phone}} {{unknown}}',
+            total_messages=7,
+            messages_prepared=False,
+        )
+
+    def test_compiled_template_fills_placeholders_in_one_pass(self):
+        """Built-in and custom placeholders are filled; substituted text is not re-scanned"""
+        render = compile_template('Hi {{ name }} ({{email}}) - {{city}} {{missing}}')
+
+        self.assertEqual(
+            render(None, '+919876543210', None, {'city': '{{name}}'}),
+            'Hi Valued Customer () - {{name}} {{missing}}'
+        )
+        self.assertEqual(
+            render('Asha', '+919876543210', 'a@example.com', {'name': 'Override'}),
+            'Hi Override (a@example.com) - {{city}} {{missing}}'
+        )
+
+    def test_materialize_creates_messages_in_chunks(self):
+        """One queued message per WhatsApp-valid contact, with progress on the campaign"""
+        result = materialize_campaign(self.campaign, chunk_size=3)
+
+        self.assertEqual(result, {'created': 7, 'total_messages': 7})
+        self.campaign.refresh_from_db()
+        self.assertTrue(self.campaign.messages_prepared)
+        self.assertEqual(
+            (self.campaign.total_messages, self.campaign.prepared_messages, self.campaign.pending_messages),
+            (7, 7, 7)
+        )
+        self.assertEqual(self.campaign.get_preparation_percentage(), 100)
+        message = self.campaign.messages.get(contact__phone_number='+919876543201')
+        self.assertEqual(message.status, 'queued')
+        self.assertEqual(message.content, 'Hi Traveller 1, Ladakh seats for +919876543201 {{unknown}}')
+        self.assertTrue(self.campaign.messages.filter(content__startswith='Hi Valued Customer').exists())
+
+    def test_rerun_only_adds_missing_messages(self):
+        """A retried run skips contacts that already have a message"""
+        first = self.contact_list.contacts.filter(status='whatsapp_valid').first()
+        Message.objects.create(campaign=self.campaign, contact=first, content='Hi')
+        MessageCampaign.objects.filter(id=self.campaign.id).update(prepared_messages=1, pending_messages=1)
+
+        result = materialize_campaign(self.campaign)
+
+        self.assertEqual(result, {'created': 6, 'total_messages': 7})
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.pending_messages, 7)
+
+    def test_resume_waits_for_prepared_messages(self):
+        """A campaign paused while its messages are built cannot be resumed until they are ready"""
+        from messaging.serializers import CampaignActionSerializer
+
+        self.campaign.status = 'paused'
+        self.campaign.save()
+
+        serializer = CampaignActionSerializer(data={'action': 'resume'}, context={'campaign': self.campaign})
+        self.assertFalse(serializer.is_valid())
+
+        materialize_campaign(self.campaign)
+        self.campaign.refresh_from_db()
+        serializer = CampaignActionSerializer(data={'action': 'resume'}, context={'campaign': self.campaign})
+        self.assertTrue(serializer.is_valid())
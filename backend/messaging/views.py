@@ -27,9 +27,12 @@ from .serializers import (
     CampaignReportSerializer, BulkMessageSerializer, CampaignActionSerializer,
     ExcelUploadSerializer, PersonalizedCampaignSerializer
 )
+from .phone_numbers import normalize_numbers, duplicate_mask, existing_numbers
+from .campaign_builder import campaign_contacts
 from .tasks import (
     send_bulk_messages_task, process_contact_list_task,
-    send_campaign_messages_task, generate_campaign_report_task
+    send_campaign_messages_task, generate_campaign_report_task,
+    materialize_campaign_task
 )
 
 logger = logging.getLogger(__name__)
@@ -159,37 +162,32 @@ class ContactViewSet(viewsets.ModelViewSet):
         """Validate phone numbers for WhatsApp compatibility"""
         phone_numbers = request.data.get('phone_numbers', [])
 
-        if not phone_numbers:
+        if not phone_numbers or not isinstance(phone_numbers, list):
             return Response(
                 {'error': 'phone_numbers list is required'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # This would integrate with WhatsApp validation API
-        # For now, return mock validation results
+        normalized = normalize_numbers(phone_numbers)
+        duplicates = duplicate_mask(normalized['e164'])
+        # Numbers already in any of the user's contact lists
+        existing = existing_numbers(normalized['e164'], self.get_queryset())
+
         results = []
-        for number in phone_numbers:
+        for number, row, is_duplicate in zip(phone_numbers, normalized.to_dict('records'), duplicates):
             results.append({
                 'number': number,
-                'is_valid': True,  # Mock validation
-                'is_whatsapp_user': True,  # Mock WhatsApp check
-                'country_code': self._extract_country_code(number)
+                'formatted_number': row['e164'],
+                'is_valid': row['is_valid'],
+                # This would integrate with WhatsApp validation API
+                'is_whatsapp_user': row['is_valid'],  # Mock WhatsApp check
+                'country_code': row['country_code'],
+                'is_duplicate': bool(is_duplicate),
+                'in_contact_lists': row['e164'] in existing
             })
 
         return Response({'results': results})
 
-    def _extract_country_code(self, number):
-        """Extract country code from phone number"""
-        # Simple country code extraction logic
-        if number.startswith('+91'):
-            return 'IN'
-        elif number.startswith('+1'):
-            return 'US'
-        elif number.startswith('+44'):
-            return 'GB'
-        else:
-            return 'Unknown'
-
 
 class MessageCampaignViewSet(viewsets.ModelViewSet):
     """ViewSet for message campaigns"""
@@ -202,64 +200,25 @@ class MessageCampaignViewSet(viewsets.ModelViewSet):
         return MessageCampaign.objects.filter(created_by=self.request.user)
 
     def create(self, request, *args, **kwargs):
-        """Create campaign and prepare messages"""
+        """Create campaign; its messages are prepared by a background job"""
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        campaign = serializer.save(created_by=request.user)
-
-        # Create individual messages for each contact
-        contact_list = campaign.contact_list
-        contacts = contact_list.contacts.filter(
-            status='whatsapp_valid',
-            whatsapp_status=True
-        )
-
-        messages_created = 0
-        for contact in contacts:
-            # Personalize message content
-            personalized_content = self._personalize_message(
-                campaign.message_content,
-                contact
-            )
+        campaign = serializer.save(created_by=request.user, messages_prepared=False)
 
-            Message.objects.create(
-                campaign=campaign,
-                contact=contact,
-                content=personalized_content,
-                attachment_url=campaign.attachment_url,
-                attachment_file=campaign.attachment_file
-            )
-            messages_created += 1
+        # Expected message count, so progress can be reported while messages are prepared
+        campaign.total_messages = campaign_contacts(campaign).count()
+        campaign.save(update_fields=['total_messages'])
 
-        # Update campaign statistics
-        campaign.total_messages = messages_created
-        campaign.pending_messages = messages_created
-        campaign.save()
+        job = materialize_campaign_task.delay(campaign.id)
+        MessageCampaign.objects.filter(id=campaign.id).update(preparation_job_id=job.id)
+        campaign.refresh_from_db()
 
         response_serializer = self.get_serializer(campaign)
-        return Response(response_serializer.data, status=status.HTTP_201_CREATED)
-
-    def _personalize_message(self, template_content, contact):
-        """Replace placeholders in message template"""
-        content = template_content
-
-        # Replace basic placeholders
-        replacements = {
-            '{{name}}': contact.name or 'Valued Customer',
-            '{{phone}}': contact.phone_number,
-            '{{email}}': contact.email or '',
-        }
-
-        # Replace custom field placeholders
-        for key, value in contact.custom_fields.items():
-            placeholder = f'{{{{{key}}}}}'
-            replacements[placeholder] = str(value)
-
-        for placeholder, value in replacements.items():
-            content = content.replace(placeholder, value)
-
-        return content
+        return Response(
+            {**response_serializer.data, 'job_id': job.id},
+            status=status.HTTP_202_ACCEPTED
+        )
 
     @action(detail=True, methods=['post'])
     def start(self, request, pk=None):
@@ -272,6 +231,12 @@ class MessageCampaignViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        if not campaign.messages_prepared:
+            return Response(
+                {'error': 'Campaign messages are still being prepared'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
         # Update campaign status
         campaign.status = 'running'
         campaign.save()